@@ -4,24 +4,37 @@ Consolidates all AI/ML services into a single Flask application
 Including: Animal Birth, Cow ID, Feed, Egg Hatch, Milk Market, Nutrition, and Cattle Disease Detection
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import joblib
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
-from tensorflow.keras import backend as K
-from tensorflow import keras
-from ultralytics import YOLO
-from PIL import Image
-import cv2
 import os
+import sys
+import argparse
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+# TensorFlow, Ultralytics, OpenCV and Pillow are imported lazily through
+# heavy_imports when a model or helper that needs them is first used.
+import diagnosis_cascade
+import egg_hatch_ensemble
+import feature_schema
+import heavy_imports
+import herd_birth_job
+import incubator_stream
+import keras_graph
+import model_warmup
+import numpy_mlp
+import replica_pool
+import result_cache
+import tabular_batch
+import tree_runtime
+from artifact_cache import ARTIFACT_CACHE
+from cattle_models import CATTLE_MODELS, register_cattle_models, register_vision_model
+from model_registry import MODEL_STATE_WARM, env_flag, get_registry
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
@@ -31,7 +44,6 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Import behavior system if available
 try:
-    import sys
     sys.path.append(os.path.join(os.path.dirname(__file__), 'cattle_disease_detection'))
     from behavior_data_manager import BehaviorDataCollector, BehaviorAnalyzer
     BEHAVIOR_AVAILABLE = True
@@ -42,18 +54,7 @@ except ImportError:
 # Cattle Disease Configuration
 class CattleDiseaseConfig:
     """Cattle Disease Detection Configuration"""
-    DENSENET_MODEL = "cattle_disease_detection/models/DenseNet121_Disease/best_model.h5"
-    YOLO_DISEASE_MODEL = "cattle_disease_detection/models/All_Cattle_Disease/best.pt"
-    YOLO_BEHAVIOR_MODEL = "cattle_disease_detection/models/All_Behaviore/best.pt"
-    
-    SEVERITY_MODEL = "cattle_disease_detection/models/Treatment_Severity/best_model_gradient_boosting.pkl"
-    SEVERITY_SCALER = "cattle_disease_detection/models/Treatment_Severity/scaler.pkl"
-    SEVERITY_ENCODERS = "cattle_disease_detection/models/Treatment_Severity/label_encoders.pkl"
-    
-    TREATMENT_MODEL = "cattle_disease_detection/models/Treatment_Recommendation/best_model_gradient_boosting.pkl"
-    TREATMENT_SCALER = "cattle_disease_detection/models/Treatment_Recommendation/scaler.pkl"
-    TREATMENT_ENCODERS = "cattle_disease_detection/models/Treatment_Recommendation/label_encoders.pkl"
-    
+    # Model artifacts are defined in cattle_models.py (shared with the standalone server)
     IMG_SIZE = (224, 224)
     ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
     
@@ -62,132 +63,205 @@ class CattleDiseaseConfig:
         'Lumpy Skin', 'Mastitis', 'Pediculosis', 'Ringworm'
     ]
     
-    SEVERITY_CLASSES = ['Mild', 'Moderate', 'Severe']
+    SEVERITY_CLASSES = diagnosis_cascade.SEVERITY_CLASSES
+
+# ==================== Model Registry ====================
+# Every model is registered with a loader and materialized on first use
+# (or at startup when listed in SMART_FARM_PRELOAD).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def model_path(relative_path):
+    """Resolve a model artifact path relative to the backend directory"""
+    return os.path.join(BASE_DIR, relative_path)
+
+# Shared with the cattle API server and the integrated diagnosis workflow when
+# they run in this process, so no artifact is loaded twice
+model_registry = get_registry()
 
 # ==================== Animal Birth Models ====================
-try:
-    animal_birth_model = joblib.load("animal_birth/clf.pkl")
-    print("✓ Animal Birth model loaded")
-except Exception as e:
-    print(f"✗ Animal Birth model failed: {e}")
-    animal_birth_model = None
+ANIMAL_BIRTH_MODEL = model_path("animal_birth/clf.pkl")
+
+model_registry.register(
+    "animal_birth", lambda: joblib.load(ANIMAL_BIRTH_MODEL),
+    service="animal_birth", paths=[ANIMAL_BIRTH_MODEL],
+    warmup=lambda model: model.predict(np.zeros((1, model.n_features_in_)))
+)
 
 # ==================== Cow Identification Models ====================
-try:
-    cow_identify_model = YOLO("cow_identify/best.pt")
-    print("✓ Cow Identification model loaded")
-except Exception as e:
-    print(f"✗ Cow Identification model failed: {e}")
-    cow_identify_model = None
+# Path and loader live in cattle_models.VISION_MODELS, shared with the vision worker
+register_vision_model(model_registry, "cow_identify")
 
 # ==================== Egg Hatch Models ====================
-try:
-    egg_hatch_scaler = joblib.load("egg_hatch/egg_hatch_scaler.joblib")
-    egg_hatch_nn = tf.keras.models.load_model("egg_hatch/egg_hatch_nn.h5")
-    egg_hatch_rf = joblib.load("egg_hatch/egg_hatch_rf_pipeline.joblib")
-    print("✓ Egg Hatch models loaded")
-except Exception as e:
-    print(f"✗ Egg Hatch models failed: {e}")
-    egg_hatch_scaler = None
-    egg_hatch_nn = None
-    egg_hatch_rf = None
+EGG_HATCH_SCALER = model_path("egg_hatch/egg_hatch_scaler.joblib")
+EGG_HATCH_NN = model_path("egg_hatch/egg_hatch_nn.h5")
+EGG_HATCH_RF = model_path("egg_hatch/egg_hatch_rf_pipeline.joblib")
+EGG_HATCH_FEATURES = [
+    "Temperature", "Humidity", "Egg_Weight", "Egg_Turning_Frequency", "Incubation_Duration"
+]
+
+model_registry.register(
+    "egg_hatch_scaler", lambda: joblib.load(EGG_HATCH_SCALER),
+    service="egg_hatch", paths=[EGG_HATCH_SCALER], warmup=model_warmup.warmup_sklearn
+)
+# Small dense MLP: evaluated in NumPy unless SMART_FARM_NUMPY_MODELS leaves it out
+model_registry.register(
+    "egg_hatch_nn",
+    numpy_mlp.loader(
+        "egg_hatch_nn", EGG_HATCH_NN,
+        replica_pool.pooled(
+            "egg_hatch_nn", lambda: ARTIFACT_CACHE.load_keras("egg_hatch_nn", EGG_HATCH_NN),
+            "tensorflow", model_warmup.warmup_keras
+        ),
+        default=True
+    ),
+    service="egg_hatch", paths=[EGG_HATCH_NN],
+    framework=numpy_mlp.framework("egg_hatch_nn", EGG_HATCH_NN, "tensorflow", default=True),
+    warmup=model_warmup.warmup_keras
+)
+model_registry.register(
+    "egg_hatch_rf", lambda: tree_runtime.compile_model(joblib.load(EGG_HATCH_RF)),
+    service="egg_hatch", paths=[EGG_HATCH_RF], warmup=model_warmup.warmup_sklearn
+)
+# NN, RF or both combined (SMART_FARM_EGG_HATCH_MODE, ?mode=)
+egg_hatch_models = egg_hatch_ensemble.EggHatchEnsemble(model_registry, EGG_HATCH_FEATURES)
+# One cache per mode, keyed by the generations of the models that mode uses
+EGG_HATCH_CACHES = {
+    mode: result_cache.for_service(
+        "egg_hatch" if mode == "nn" else f"egg_hatch_{mode}",
+        egg_hatch_models.required_models(mode), model_registry
+    )
+    for mode in egg_hatch_ensemble.MODES
+}
+# Per-tray incubator telemetry, rescored in micro-batches (incubator_stream.py)
+incubator_telemetry = incubator_stream.IncubatorStream(model_registry, EGG_HATCH_FEATURES)
 
 # ==================== Milk Market Models ====================
-try:
-    milk_market_model = joblib.load("milk_market_prediction/rf_milk_price_model.pkl")
-    print("✓ Milk Market model loaded")
-except Exception as e:
-    print(f"✗ Milk Market model failed: {e}")
-    milk_market_model = None
+MILK_MARKET_MODEL = model_path("milk_market_prediction/rf_milk_price_model.pkl")
+# Request field -> training column
+MILK_MARKET_COLUMNS = {
+    'current_price': 'Local_Milk_Price_LKR_per_Litre',
+    'monthly_milk_litres': 'Monthly_Milk_Litres',
+    'fat_percentage': 'Fat_Percentage',
+    'snf_percentage': 'SNF_Percentage',
+    'disease_stage': 'Disease_Stage',
+    'feed_quality': 'Feed_Quality_Encoded',
+    'lactation_month': 'Lactation_Month',
+    'month': 'Month'
+}
+MILK_MARKET_FIELDS = {column: key for key, column in MILK_MARKET_COLUMNS.items()}
+MILK_MARKET_DEFAULT_HORIZON = 6
+MILK_MARKET_MAX_HORIZON = int(os.environ.get("SMART_FARM_FORECAST_MAX_MONTHS", 24))
+
+model_registry.register(
+    "milk_market", lambda: tree_runtime.compile_model(joblib.load(MILK_MARKET_MODEL)),
+    service="milk_market", paths=[MILK_MARKET_MODEL], warmup=model_warmup.warmup_sklearn
+)
+MILK_MARKET_CACHE = result_cache.for_service("milk_market", ["milk_market"], model_registry)
 
 # ==================== Nutrition Models ====================
-try:
-    nutrition_model = joblib.load("nutrition_recommended/multi_output_nutrition_model.pkl")
-    print("✓ Nutrition model loaded")
-except Exception as e:
-    print(f"✗ Nutrition model failed: {e}")
-    print("⚠️  Note: If you see sklearn version errors, the model may need to be retrained with your current sklearn version")
-    print("⚠️  Run: pip install scikit-learn==1.6.1  OR retrain the model")
-    nutrition_model = None
+NUTRITION_MODEL = model_path("nutrition_recommended/multi_output_nutrition_model.pkl")
+
+def load_nutrition_model():
+    try:
+        return tree_runtime.compile_model(joblib.load(NUTRITION_MODEL))
+    except Exception:
+        print("⚠️  Note: If you see sklearn version errors, the model may need to be retrained with your current sklearn version")
+        print("⚠️  Run: pip install scikit-learn==1.6.1  OR retrain the model")
+        raise
+
+NUTRITION_COLUMNS = [
+    "Age_Months", "Weight_kg", "Breed", "Milk_Yield_L_per_day", "Health_Status", "Disease",
+    "Body_Condition_Score", "Location", "Energy_MJ_per_day", "Crude_Protein_g_per_day",
+    "Recommended_Feed_Type"
+]
+NUTRITION_CATEGORICAL = {"Breed", "Health_Status", "Disease", "Location", "Recommended_Feed_Type"}
+
+# Representative row for warm-up: the pipeline one-hot encodes the string columns
+NUTRITION_SAMPLE = {
+    "Age_Months": 48, "Weight_kg": 480, "Breed": "Friesian", "Milk_Yield_L_per_day": 18,
+    "Health_Status": "Healthy", "Disease": "None", "Body_Condition_Score": 3.0,
+    "Location": "Kurunegala", "Energy_MJ_per_day": 185, "Crude_Protein_g_per_day": 1600,
+    "Recommended_Feed_Type": "Mixed"
+}
+
+model_registry.register(
+    "nutrition", load_nutrition_model,
+    service="nutrition", paths=[NUTRITION_MODEL],
+    warmup=lambda model: model.predict(pd.DataFrame([NUTRITION_SAMPLE]))
+)
+# The pipeline one-hot encodes the strings as given, so their case is part of the key
+NUTRITION_CACHE = result_cache.for_service("nutrition", ["nutrition"], model_registry, text=str)
 
 # ==================== Cow Daily Feed Models ====================
 def dice_coef(y_true, y_pred, smooth=1e-6):
+    K = heavy_imports.keras_backend()
     y_true_f = K.flatten(y_true)
     y_pred_f = K.flatten(y_pred)
     intersection = K.sum(y_true_f * y_pred_f)
     return (2. * intersection + smooth) / (K.sum(y_true_f) + K.sum(y_pred_f) + smooth)
 
-try:
-    cow_feed_seg_model = load_model(
-        "cow_daily_feed/models/best_seg_model.h5",
-        custom_objects={"dice_coef": dice_coef}
-    )
-    cow_feed_reg_model = load_model("cow_daily_feed/models/best_reg_model.h5", compile=False)
-    cow_feed_model = joblib.load("cow_daily_feed/models/cow_feed_predictor.pkl")
-    cow_feed_breed_encoder = joblib.load("cow_daily_feed/models/breed_encoder.pkl")
-    cow_feed_activity_encoder = joblib.load("cow_daily_feed/models/activity_encoder.pkl")
-    print("✓ Cow Daily Feed models loaded")
-except Exception as e:
-    print(f"✗ Cow Daily Feed models failed: {e}")
-    cow_feed_seg_model = None
-    cow_feed_reg_model = None
-    cow_feed_model = None
-    cow_feed_breed_encoder = None
-    cow_feed_activity_encoder = None
+COW_FEED_SEG_MODEL = model_path("cow_daily_feed/models/best_seg_model.h5")
+COW_FEED_REG_MODEL = model_path("cow_daily_feed/models/best_reg_model.h5")
+COW_FEED_MODEL = model_path("cow_daily_feed/models/cow_feed_predictor.pkl")
+COW_FEED_BREED_ENCODER = model_path("cow_daily_feed/models/breed_encoder.pkl")
+COW_FEED_ACTIVITY_ENCODER = model_path("cow_daily_feed/models/activity_encoder.pkl")
+COW_FEED_COLUMNS = [
+    "Cow Breed", "Cow Age (months)", "Cow Weight (kg)", "Milk Yield (L/day)", "Activity Level"
+]
 
-IMG_SIZE = (224, 224)
+def cow_feed_row(cow_feed_model, values):
+    """Feed predictor input in training column order, without a DataFrame"""
+    return feature_schema.builder(
+        "cow_feed", feature_schema.columns_for(cow_feed_model, COW_FEED_COLUMNS)
+    ).fill(values)
 
-# ==================== Cattle Disease Detection Models ====================
-print("\n🐄 Loading Cattle Disease Detection Models...")
-
-# DenseNet121 for disease classification
-try:
-    cattle_densenet_model = keras.models.load_model(CattleDiseaseConfig.DENSENET_MODEL)
-    print("✓ Cattle DenseNet121 model loaded")
-except Exception as e:
-    print(f"✗ Cattle DenseNet121 failed: {e}")
-    cattle_densenet_model = None
-
-# YOLO models for disease and behavior
-try:
-    cattle_yolo_disease_model = YOLO(CattleDiseaseConfig.YOLO_DISEASE_MODEL)
-    print("✓ Cattle YOLO Disease model loaded")
-except Exception as e:
-    print(f"✗ Cattle YOLO Disease failed: {e}")
-    cattle_yolo_disease_model = None
-
-try:
-    cattle_yolo_behavior_model = YOLO(CattleDiseaseConfig.YOLO_BEHAVIOR_MODEL)
-    print("✓ Cattle YOLO Behavior model loaded")
-except Exception as e:
-    print(f"✗ Cattle YOLO Behavior failed: {e}")
-    cattle_yolo_behavior_model = None
+model_registry.register(
+    "cow_feed_seg",
+    replica_pool.pooled(
+        "cow_feed_seg",
+        lambda: keras_graph.compiled(ARTIFACT_CACHE.load_keras(
+            "cow_feed_seg", COW_FEED_SEG_MODEL, custom_objects={"dice_coef": dice_coef}
+        )),
+        "tensorflow", model_warmup.warmup_keras
+    ),
+    service="cow_feed_image", paths=[COW_FEED_SEG_MODEL], framework="tensorflow",
+    warmup=model_warmup.warmup_keras
+)
+model_registry.register(
+    "cow_feed_reg",
+    replica_pool.pooled(
+        "cow_feed_reg",
+        lambda: keras_graph.compiled(
+            ARTIFACT_CACHE.load_keras("cow_feed_reg", COW_FEED_REG_MODEL, compile=False)
+        ),
+        "tensorflow", model_warmup.warmup_keras
+    ),
+    service="cow_feed_image", paths=[COW_FEED_REG_MODEL], framework="tensorflow",
+    warmup=model_warmup.warmup_keras
+)
+model_registry.register(
+    "cow_feed", lambda: tree_runtime.compile_model(joblib.load(COW_FEED_MODEL)),
+    service="cow_feed", paths=[COW_FEED_MODEL], warmup=model_warmup.warmup_sklearn
+)
+model_registry.register(
+    "cow_feed_breed_encoder", lambda: joblib.load(COW_FEED_BREED_ENCODER),
+    service="cow_feed", paths=[COW_FEED_BREED_ENCODER]
+)
+model_registry.register(
+    "cow_feed_activity_encoder", lambda: joblib.load(COW_FEED_ACTIVITY_ENCODER),
+    service="cow_feed", paths=[COW_FEED_ACTIVITY_ENCODER]
+)
+COW_FEED_CACHE = result_cache.for_service(
+    "cow_feed", ["cow_feed", "cow_feed_breed_encoder", "cow_feed_activity_encoder"], model_registry
+)
 
-# Severity prediction model
-try:
-    cattle_severity_model = joblib.load(CattleDiseaseConfig.SEVERITY_MODEL)
-    cattle_severity_scaler = joblib.load(CattleDiseaseConfig.SEVERITY_SCALER)
-    cattle_severity_encoders = joblib.load(CattleDiseaseConfig.SEVERITY_ENCODERS)
-    print("✓ Cattle Severity model loaded")
-except Exception as e:
-    print(f"✗ Cattle Severity model failed: {e}")
-    cattle_severity_model = None
-    cattle_severity_scaler = None
-    cattle_severity_encoders = None
+IMG_SIZE = (224, 224)
 
-# Treatment recommendation model
-try:
-    cattle_treatment_model = joblib.load(CattleDiseaseConfig.TREATMENT_MODEL)
-    cattle_treatment_scaler = joblib.load(CattleDiseaseConfig.TREATMENT_SCALER)
-    cattle_treatment_encoders = joblib.load(CattleDiseaseConfig.TREATMENT_ENCODERS)
-    print("✓ Cattle Treatment model loaded")
-except Exception as e:
-    print(f"✗ Cattle Treatment model failed: {e}")
-    cattle_treatment_model = None
-    cattle_treatment_scaler = None
-    cattle_treatment_encoders = None
+# ==================== Cattle Disease Detection Models ====================
+# DenseNet121, the disease/behavior YOLO models and the severity/treatment bundles
+register_cattle_models(model_registry)
 
-# Behavior tracking system
+# Behavior tracking system (lightweight, no model artifacts)
 try:
     if BEHAVIOR_AVAILABLE:
         cattle_behavior_collector = BehaviorDataCollector()
@@ -201,14 +275,38 @@ except Exception as e:
     cattle_behavior_collector = None
     cattle_behavior_analyzer = None
 
+# Preload + optional warm-up (SMART_FARM_PRELOAD / SMART_FARM_WARMUP); readiness
+# is only reported once this has finished
+model_registry.start()
+
+# Models handed out during a request stay leased until it ends, so a hot
+# reload drains in-flight requests (e.g. video analyses) before dropping them
+@app.before_request
+def lease_request_models():
+    model_registry.begin_request()
+
+@app.teardown_request
+def release_request_models(exc):
+    model_registry.end_request()
+
+@app.errorhandler(tabular_batch.BatchError)
+def batch_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+@app.errorhandler(incubator_stream.StreamUnavailable)
+def incubator_stream_unavailable(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+
 # ==================== Helper Functions ====================
 def process_image(img_path):
+    image = heavy_imports.keras_image()
     img = image.load_img(img_path, target_size=IMG_SIZE)
     img_array = image.img_to_array(img) / 255.0
     return np.expand_dims(img_array, axis=0)
 
 def process_image_for_cattle_densenet(img_path):
     """Process image for Cattle DenseNet121"""
+    cv2 = heavy_imports.cv2()
     img = cv2.imread(img_path)
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     img = cv2.resize(img, CattleDiseaseConfig.IMG_SIZE)
@@ -244,6 +342,7 @@ def save_uploaded_video(file):
 
 def process_video_frames(video_path, frame_interval=30):
     """Extract frames from video at specified interval"""
+    cv2 = heavy_imports.cv2()
     frames = []
     cap = cv2.VideoCapture(video_path)
     
@@ -289,6 +388,20 @@ def home():
             "egg_hatch": "/egg-hatch/predict",
             "milk_market": "/milk-market/predict-income",
             "nutrition": "/nutrition/predict",
+            "batch": {
+                "animal_birth": "/animal-birth/predict-batch",
+                "cow_feed_manual": "/cow-feed/predict-manual-batch",
+                "egg_hatch": "/egg-hatch/predict-batch",
+                "milk_market": "/milk-market/predict-income-batch",
+                "nutrition": "/nutrition/predict-batch"
+            },
+            "milk_market_sweep": "/milk-market/sweep",
+            "milk_market_forecast": "/milk-market/forecast",
+            "egg_hatch_telemetry": "/egg-hatch/telemetry",
+            "egg_hatch_alerts": "/egg-hatch/alerts/stream",
+            "ready": "/ready",
+            "metrics": "/metrics",
+            "admin_reload": "/admin/models/<name>/reload",
             "cattle_disease": {
                 "health": "/api/health",
                 "models_status": "/api/models/status",
@@ -306,43 +419,135 @@ def home():
 
 @app.route("/health", methods=["GET"])
 def health():
+    # A service is up when its models are loaded or can still be loaded on demand
+    available = model_registry.is_available
     return jsonify({
         "status": "healthy",
+        "ready": model_registry.ready,
         "services": {
-            "animal_birth": animal_birth_model is not None,
-            "cow_identify": cow_identify_model is not None,
-            "egg_hatch": egg_hatch_nn is not None and egg_hatch_rf is not None,
-            "milk_market": milk_market_model is not None,
-            "nutrition": nutrition_model is not None,
-            "cow_feed": cow_feed_model is not None,
-            "cattle_disease_detection": cattle_densenet_model is not None,
-            "cattle_disease_yolo": cattle_yolo_disease_model is not None,
-            "cattle_behavior": cattle_yolo_behavior_model is not None
+            "animal_birth": available("animal_birth"),
+            "cow_identify": available("cow_identify"),
+            "egg_hatch": all(available(name) for name in egg_hatch_models.required_models()),
+            "milk_market": available("milk_market"),
+            "nutrition": available("nutrition"),
+            "cow_feed": available("cow_feed"),
+            "cattle_disease_detection": available("cattle_densenet"),
+            "cattle_disease_yolo": available("cattle_yolo_disease"),
+            "cattle_behavior": available("cattle_yolo_behavior")
+        },
+        "models": model_registry.status(),
+        "framework_import_seconds": {
+            name: round(seconds, 3) for name, seconds in heavy_imports.IMPORT_TIMES.items()
         }
     })
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe: 503 until preloading and warm-up have finished"""
+    if not model_registry.ready:
+        return jsonify({"ready": False}), 503
+    return jsonify({"ready": True})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    payload = model_registry.metrics()
+    payload["result_cache"] = result_cache.metrics()
+    payload["egg_hatch_ensemble"] = egg_hatch_models.status()
+    return jsonify(payload)
+
+# ==================== Model Administration ====================
+ADMIN_TOKEN = os.environ.get("SMART_FARM_ADMIN_TOKEN")
+
+def admin_authorized():
+    # Admin endpoints are open unless SMART_FARM_ADMIN_TOKEN is set
+    return not ADMIN_TOKEN or request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+
+@app.route("/admin/models/<name>", methods=["GET"])
+def admin_model_status(name):
+    if not admin_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    if name not in model_registry.names():
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+    return jsonify({"model": name, **model_registry.model_status(name)})
+
+@app.route("/admin/models/<name>/reload", methods=["POST"])
+def admin_reload_model(name):
+    """Hot reload one model from its artifact; ?wait=1 blocks until the swap and drain finish"""
+    if not admin_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    if name not in model_registry.names():
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+
+    wait = request.args.get("wait", "0").lower() in ("1", "true", "yes")
+    if not model_registry.reload(name, background=not wait):
+        return jsonify({"error": f"Reload of {name} already in progress"}), 409
+
+    status = model_registry.model_status(name)
+    if not wait:
+        return jsonify({"model": name, "reload": status["last_reload"]}), 202
+    code = 200 if status["last_reload"]["status"] == "completed" else 500
+    return jsonify({"model": name, "reload": status["last_reload"], "generation": status["generation"]}), code
+
 # ==================== Animal Birth Prediction ====================
 @app.route("/animal-birth/predict", methods=["POST"])
 def predict_animal_birth():
+    animal_birth_model = model_registry.get("animal_birth")
     if animal_birth_model is None:
         return jsonify({"error": "Animal birth model not loaded"}), 503
     
     try:
         data = request.get_json()
         features = np.array(data["features"]).reshape(1, -1)
-        predicted_days = float(animal_birth_model.predict(features)[0])
-        will_birth_2_days = "Yes" if predicted_days <= 2 else "No"
-        
-        return jsonify({
-            "Will Birth in Next 2 Days": will_birth_2_days,
-            "Estimated Days to Birth": round(predicted_days, 1)
-        })
+        predictions, probabilities = herd_birth_job.score(animal_birth_model, features, columns=None)
+        return jsonify(animal_birth_result(animal_birth_model, predictions[0], probabilities[0]))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def animal_birth_result(animal_birth_model, prediction, probability):
+    """
+    clf.pkl is the notebook's classifier (1 = birth within 2 days), read the
+    same way as herd_birth_job; a days-to-birth regressor is read as days.
+    """
+    result = {
+        "Will Birth in Next 2 Days": "Yes" if herd_birth_job.on_watchlist(animal_birth_model, prediction) else "No"
+    }
+    if not herd_birth_job.is_classifier(animal_birth_model):
+        result["Estimated Days to Birth"] = round(float(prediction), 1)
+    elif not np.isnan(probability):
+        result["Birth Probability"] = round(float(probability), 3)
+    return result
+
+@app.route("/animal-birth/predict-batch", methods=["POST"])
+def predict_animal_birth_batch():
+    animal_birth_model = model_registry.get("animal_birth")
+    if animal_birth_model is None:
+        return jsonify({"error": "Animal birth model not loaded"}), 503
+    
+    records = tabular_batch.parse_records(request.get_json(silent=True))
+    n_features = animal_birth_model.n_features_in_
+    
+    def build_row(record):
+        # Each record is a feature list, or {"features": [...]} like the single endpoint
+        features = record.get("features") if isinstance(record, dict) else record
+        if not isinstance(features, list) or len(features) != n_features:
+            raise ValueError(f"'features' must be a list of {n_features} numbers")
+        return [float(value) for value in features]
+    
+    rows, indices, errors = tabular_batch.build_rows(records, build_row)
+    features = np.array(rows, dtype=float).reshape(len(rows), n_features)
+    
+    def predict(features):
+        return list(zip(*herd_birth_job.score(animal_birth_model, features, columns=None)))
+    
+    outputs = tabular_batch.predict_rows(predict, features, indices, errors)
+    return jsonify(tabular_batch.respond(
+        len(records), outputs, errors, lambda index, output: animal_birth_result(animal_birth_model, *output)
+    ))
+
 # ==================== Cow Identification ====================
 @app.route("/cow-identify/detect", methods=["POST"])
 def detect_cow():
+    cow_identify_model = model_registry.get("cow_identify")
     if cow_identify_model is None:
         return jsonify({"error": "Cow identification model not loaded"}), 503
     
@@ -351,7 +556,7 @@ def detect_cow():
     
     try:
         file = request.files["image"]
-        pil_image = Image.open(file).convert("RGB")
+        pil_image = heavy_imports.pil_image().open(file).convert("RGB")
         image_np = np.array(pil_image)
         results = cow_identify_model.predict(source=image_np, conf=0.25)
         
@@ -375,7 +580,13 @@ def detect_cow():
 # ==================== Cow Daily Feed (From Image) ====================
 @app.route("/cow-feed/predict-from-image", methods=["POST"])
 def predict_cow_feed_from_image():
-    if cow_feed_model is None:
+    cow_feed_model = model_registry.get("cow_feed")
+    cow_feed_breed_encoder = model_registry.get("cow_feed_breed_encoder")
+    cow_feed_activity_encoder = model_registry.get("cow_feed_activity_encoder")
+    cow_feed_seg_model = model_registry.get("cow_feed_seg")
+    cow_feed_reg_model = model_registry.get("cow_feed_reg")
+    if None in (cow_feed_model, cow_feed_breed_encoder, cow_feed_activity_encoder,
+                cow_feed_seg_model, cow_feed_reg_model):
         return jsonify({"error": "Cow feed model not loaded"}), 503
     
     try:
@@ -400,8 +611,8 @@ def predict_cow_feed_from_image():
             }), 400
         
         # Encode
-        encoded_breed = cow_feed_breed_encoder.transform([cow_breed])[0]
-        encoded_activity = cow_feed_activity_encoder.transform([activity])[0]
+        encoded_breed = feature_schema.label_codes(cow_feed_breed_encoder)[cow_breed]
+        encoded_activity = feature_schema.label_codes(cow_feed_activity_encoder)[activity]
         
         # Segmentation
         input_image = process_image(img_path)
@@ -413,13 +624,13 @@ def predict_cow_feed_from_image():
         cow_weight = float(predicted_weight[0][0])
         
         # Feed prediction
-        feed_input = pd.DataFrame([{
+        feed_input = cow_feed_row(cow_feed_model, {
             "Cow Breed": encoded_breed,
             "Cow Age (months)": cow_age,
             "Cow Weight (kg)": cow_weight,
             "Milk Yield (L/day)": milk_yield,
             "Activity Level": encoded_activity
-        }])
+        })
         
         daily_feed = float(cow_feed_model.predict(feed_input)[0])
         
@@ -436,7 +647,13 @@ def predict_cow_feed_from_image():
 # ==================== Cow Daily Feed (Manual) ====================
 @app.route("/cow-feed/predict-manual", methods=["POST"])
 def predict_cow_feed_manual():
-    if cow_feed_model is None:
+    generations = {}
+    cow_feed_model, generations["cow_feed"] = model_registry.get_versioned("cow_feed")
+    cow_feed_breed_encoder, generations["cow_feed_breed_encoder"] = \
+        model_registry.get_versioned("cow_feed_breed_encoder")
+    cow_feed_activity_encoder, generations["cow_feed_activity_encoder"] = \
+        model_registry.get_versioned("cow_feed_activity_encoder")
+    if None in (cow_feed_model, cow_feed_breed_encoder, cow_feed_activity_encoder):
         return jsonify({"error": "Cow feed model not loaded"}), 503
     
     try:
@@ -459,130 +676,434 @@ def predict_cow_feed_manual():
                 "error": f"Invalid activity. Allowed: {list(cow_feed_activity_encoder.classes_)}"
             }), 400
         
-        # Encode
-        encoded_breed = cow_feed_breed_encoder.transform([cow_breed])[0]
-        encoded_activity = cow_feed_activity_encoder.transform([activity])[0]
-        
-        # Feed prediction
-        feed_input = pd.DataFrame([{
-            "Cow Breed": encoded_breed,
-            "Cow Age (months)": cow_age,
-            "Cow Weight (kg)": cow_weight,
-            "Milk Yield (L/day)": milk_yield,
-            "Activity Level": encoded_activity
-        }])
-        
-        daily_feed = float(cow_feed_model.predict(feed_input)[0])
+        def predict():
+            # Encode
+            encoded_breed = feature_schema.label_codes(cow_feed_breed_encoder)[cow_breed]
+            encoded_activity = feature_schema.label_codes(cow_feed_activity_encoder)[activity]
+            
+            # Feed prediction
+            feed_input = cow_feed_row(cow_feed_model, {
+                "Cow Breed": encoded_breed,
+                "Cow Age (months)": cow_age,
+                "Cow Weight (kg)": cow_weight,
+                "Milk Yield (L/day)": milk_yield,
+                "Activity Level": encoded_activity
+            })
+            
+            daily_feed = float(cow_feed_model.predict(feed_input)[0])
+            
+            return {
+                "mode": "manual",
+                "cow_weight_kg": round(cow_weight, 2),
+                "daily_feed_kg": round(daily_feed, 2)
+            }
         
-        return jsonify({
-            "mode": "manual",
-            "cow_weight_kg": round(cow_weight, 2),
-            "daily_feed_kg": round(daily_feed, 2)
-        })
+        return jsonify(COW_FEED_CACHE.get_or_compute(data, predict, generations))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/cow-feed/predict-manual-batch", methods=["POST"])
+def predict_cow_feed_manual_batch():
+    cow_feed_model = model_registry.get("cow_feed")
+    cow_feed_breed_encoder = model_registry.get("cow_feed_breed_encoder")
+    cow_feed_activity_encoder = model_registry.get("cow_feed_activity_encoder")
+    if None in (cow_feed_model, cow_feed_breed_encoder, cow_feed_activity_encoder):
+        return jsonify({"error": "Cow feed model not loaded"}), 503
+    
+    records = tabular_batch.parse_records(request.get_json(silent=True))
+    breeds = set(cow_feed_breed_encoder.classes_)
+    activities = set(cow_feed_activity_encoder.classes_)
+    
+    def build_row(record):
+        breed = tabular_batch.text(record, "breed").strip().title()
+        activity = tabular_batch.text(record, "activity").strip().title()
+        if breed not in breeds:
+            raise ValueError(f"Invalid breed. Allowed: {list(cow_feed_breed_encoder.classes_)}")
+        if activity not in activities:
+            raise ValueError(f"Invalid activity. Allowed: {list(cow_feed_activity_encoder.classes_)}")
+        return {
+            "Cow Breed": breed,
+            "Cow Age (months)": tabular_batch.number(record, "age"),
+            "Cow Weight (kg)": tabular_batch.number(record, "weight"),
+            "Milk Yield (L/day)": tabular_batch.number(record, "milk_yield"),
+            "Activity Level": activity
+        }
+    
+    def predict(feed_input):
+        # Encode whole columns at once
+        feed_input = feed_input.assign(**{
+            "Cow Breed": cow_feed_breed_encoder.transform(feed_input["Cow Breed"]),
+            "Activity Level": cow_feed_activity_encoder.transform(feed_input["Activity Level"])
+        })
+        return cow_feed_model.predict(feed_input)
+    
+    rows, indices, errors = tabular_batch.build_rows(records, build_row)
+    outputs = tabular_batch.predict_rows(predict, pd.DataFrame(rows), indices, errors)
+    return jsonify(tabular_batch.respond(len(records), outputs, errors, lambda index, feed: {
+        "mode": "manual",
+        "cow_weight_kg": round(float(records[index]["weight"]), 2),
+        "daily_feed_kg": round(float(feed), 2)
+    }))
+
 # ==================== Egg Hatch Prediction ====================
 @app.route("/egg-hatch/predict", methods=["POST"])
 def predict_egg_hatch():
-    if egg_hatch_nn is None or egg_hatch_rf is None:
-        return jsonify({"error": "Egg hatch model not loaded"}), 503
+    try:
+        mode, shed = egg_hatch_models.choose_mode(request.args.get("mode"))
+        models, generations = egg_hatch_models.models(mode)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except egg_hatch_ensemble.ModelUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     
     try:
         data = request.get_json()
         
-        df = pd.DataFrame([{
-            "Temperature": data["Temperature"],
-            "Humidity": data["Humidity"],
-            "Egg_Weight": data["Egg_Weight"],
-            "Egg_Turning_Frequency": data["Egg_Turning_Frequency"],
-            "Incubation_Duration": data["Incubation_Duration"]
-        }])
-        
-        scaled = egg_hatch_scaler.transform(df)
-        prob = float(egg_hatch_nn.predict(scaled, verbose=0)[0][0])
-        pred = 1 if prob >= 0.5 else 0
-        
-        return jsonify({
-            "hatch_probability": prob,
-            "predicted_class": pred
-        })
+        latencies = {}
+        
+        def predict():
+            row = feature_schema.builder("egg_hatch", EGG_HATCH_FEATURES).fill(data)
+            run = egg_hatch_models.predict(row, mode, models)
+            latencies.update({name: output["latency_ms"] for name, output in run["models"].items()})
+            return egg_hatch_result(float(run["probability"][0]), egg_hatch_details(run, 0, latency=False))
+        
+        result = EGG_HATCH_CACHES[mode].get_or_compute(data, predict, generations)
+        # Latency only when the models actually ran for this request, not on a cache hit
+        if latencies and "models" in result:
+            result = {**result, "models": {
+                name: {**output, "latency_ms": latencies[name]} for name, output in result["models"].items()
+            }}
+        if shed:
+            result = {**result, "mode": mode, "shed": True}
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def egg_hatch_result(prob, details=None):
+    result = {
+        "hatch_probability": prob,
+        "predicted_class": 1 if prob >= 0.5 else 0
+    }
+    result.update(details or {})
+    return result
+
+def egg_hatch_details(run, position, latency=True):
+    """Per-model probabilities (and latency) for RF and ensemble predictions"""
+    if run["mode"] == "nn":
+        return None
+    models = {}
+    for name, output in run["models"].items():
+        models[name] = {"hatch_probability": round(float(output["probability"][position]), 4)}
+        if latency:
+            models[name]["latency_ms"] = output["latency_ms"]
+    details = {"mode": run["mode"], "models": models}
+    if run["combine"]:
+        details["combine"] = run["combine"]
+    return details
+
+@app.route("/egg-hatch/predict-batch", methods=["POST"])
+def predict_egg_hatch_batch():
+    try:
+        mode, shed = egg_hatch_models.choose_mode(request.args.get("mode"))
+        models, _ = egg_hatch_models.models(mode)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except egg_hatch_ensemble.ModelUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    
+    records = tabular_batch.parse_records(request.get_json(silent=True))
+    rows, indices, errors = tabular_batch.build_rows(
+        records, lambda record: {feature: tabular_batch.number(record, feature) for feature in EGG_HATCH_FEATURES}
+    )
+    runs = []
+    
+    def predict(df):
+        # One pass per model for the whole batch (both models at once in ensemble mode)
+        run = egg_hatch_models.predict(df.to_numpy(dtype=np.float64), mode, models)
+        runs.append(run)
+        return [(position, run) for position in range(len(df))]
+    
+    outputs = tabular_batch.predict_rows(predict, pd.DataFrame(rows, columns=EGG_HATCH_FEATURES), indices, errors)
+    response = tabular_batch.respond(len(records), outputs, errors, lambda index, output: egg_hatch_result(
+        float(output[1]["probability"][output[0]]), egg_hatch_details(output[1], output[0], latency=False)
+    ))
+    if mode != "nn" or shed:
+        response["mode"] = mode
+        response["latency_ms"] = {
+            name: round(sum(run["models"][name]["latency_ms"] for run in runs), 3) for name in runs[0]["models"]
+        } if runs else {}
+    if shed:
+        response["shed"] = True
+    return jsonify(response)
+
+@app.route("/egg-hatch/telemetry", methods=["POST"])
+def ingest_egg_hatch_telemetry():
+    """NDJSON sensor readings, one {"tray_id": ..., <features>} per line"""
+    incubator_telemetry.check_available()
+    lines = request.get_data(as_text=True).splitlines()
+    if len(lines) > tabular_batch.max_records():
+        raise tabular_batch.BatchError(
+            f"Too many readings: {len(lines)} (max {tabular_batch.max_records()})", status=413
+        )
+    accepted, rejected = incubator_telemetry.ingest(lines)
+    if not accepted and not rejected:
+        return jsonify({"error": "No readings given"}), 400
+    return jsonify({
+        "accepted": accepted,
+        "rejected": rejected,
+        "trays": incubator_telemetry.status()["trays"]
+    }), 202 if accepted else 400
+
+@app.route("/egg-hatch/telemetry/status", methods=["GET"])
+def egg_hatch_telemetry_status():
+    incubator_telemetry.check_available()
+    return jsonify(incubator_telemetry.status())
+
+@app.route("/egg-hatch/trays/<tray_id>", methods=["GET"])
+def egg_hatch_tray(tray_id):
+    incubator_telemetry.check_available()
+    tray = incubator_telemetry.trays.describe(tray_id)
+    if tray is None:
+        return jsonify({"error": f"No telemetry for tray '{tray_id}'"}), 404
+    return jsonify(tray)
+
+@app.route("/egg-hatch/alerts", methods=["GET"])
+def egg_hatch_alerts():
+    incubator_telemetry.check_available()
+    return jsonify({"alerts": list(incubator_telemetry.alerts)})
+
+@app.route("/egg-hatch/alerts/stream", methods=["GET"])
+def egg_hatch_alert_stream():
+    """Server-sent events: an 'alert' event when a tray's hatch probability drops below the threshold"""
+    incubator_telemetry.check_available()
+    # Subscribed here, so a refused stream is a 503 rather than a started response
+    subscriber = incubator_telemetry.subscribe()
+    response = Response(incubator_telemetry.events(subscriber), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    # Also frees the slot when the client leaves before the stream started
+    response.call_on_close(lambda: incubator_telemetry.unsubscribe(subscriber))
+    return response
+
 # ==================== Milk Market Prediction ====================
 @app.route("/milk-market/predict-income", methods=["POST"])
 def predict_milk_market():
+    milk_market_model, generation = model_registry.get_versioned("milk_market")
     if milk_market_model is None:
         return jsonify({"error": "Milk market model not loaded"}), 503
     
     try:
         data = request.get_json()
         
-        input_df = pd.DataFrame([{
-            'Local_Milk_Price_LKR_per_Litre': data['current_price'],
-            'Monthly_Milk_Litres': data['monthly_milk_litres'],
-            'Fat_Percentage': data['fat_percentage'],
-            'SNF_Percentage': data['snf_percentage'],
-            'Disease_Stage': data['disease_stage'],
-            'Feed_Quality_Encoded': data['feed_quality'],
-            'Lactation_Month': data['lactation_month'],
-            'Month': data['month']
-        }])
-        
-        price_change = milk_market_model.predict(input_df)[0]
-        next_price = data['current_price'] + price_change
-        next_income = next_price * data['monthly_milk_litres']
+        def predict():
+            row = feature_schema.builder(
+                "milk_market", feature_schema.columns_for(milk_market_model, MILK_MARKET_COLUMNS.values()),
+                MILK_MARKET_FIELDS
+            ).fill(data)
+            
+            price_change = milk_market_model.predict(row)[0]
+            return milk_market_result(data, price_change)
         
-        return jsonify({
-            "predicted_price_change_lkr_per_litre": round(price_change, 2),
-            "predicted_next_month_price_lkr_per_litre": round(next_price, 2),
-            "predicted_next_month_income_lkr": round(next_income, 2)
-        })
+        return jsonify(MILK_MARKET_CACHE.get_or_compute(data, predict, {"milk_market": generation}))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+def milk_market_result(data, price_change):
+    next_price = data['current_price'] + price_change
+    next_income = next_price * data['monthly_milk_litres']
+    return {
+        "predicted_price_change_lkr_per_litre": round(price_change, 2),
+        "predicted_next_month_price_lkr_per_litre": round(next_price, 2),
+        "predicted_next_month_income_lkr": round(next_income, 2)
+    }
+
+@app.route("/milk-market/predict-income-batch", methods=["POST"])
+def predict_milk_market_batch():
+    milk_market_model = model_registry.get("milk_market")
+    if milk_market_model is None:
+        return jsonify({"error": "Milk market model not loaded"}), 503
+    
+    records = tabular_batch.parse_records(request.get_json(silent=True))
+    rows, indices, errors = tabular_batch.build_rows(records, lambda record: {
+        column: tabular_batch.number(record, key) for key, column in MILK_MARKET_COLUMNS.items()
+    })
+    outputs = tabular_batch.predict_rows(
+        milk_market_model.predict, pd.DataFrame(rows, columns=list(MILK_MARKET_COLUMNS.values())),
+        indices, errors
+    )
+    return jsonify(tabular_batch.respond(len(records), outputs, errors, lambda index, price_change: milk_market_result(
+        {key: float(records[index][key]) for key in ('current_price', 'monthly_milk_litres')},
+        float(price_change)
+    )))
+
+@app.route("/milk-market/sweep", methods=["POST"])
+def sweep_milk_market():
+    """What-if grid: every combination of the given input values, scored in one predict"""
+    milk_market_model = model_registry.get("milk_market")
+    if milk_market_model is None:
+        return jsonify({"error": "Milk market model not loaded"}), 503
+    
+    axes, inputs = tabular_batch.grid(request.get_json(silent=True), list(MILK_MARKET_COLUMNS))
+    swept = [key for key, values in axes.items() if len(values) > 1]
+    shape = [len(axes[key]) for key in swept]
+    
+    try:
+        features = feature_schema.stack(
+            feature_schema.columns_for(milk_market_model, MILK_MARKET_COLUMNS.values()),
+            {column: inputs[key] for key, column in MILK_MARKET_COLUMNS.items()}
+        )
+        price_change = np.asarray(milk_market_model.predict(features), dtype=np.float64)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    next_price = inputs["current_price"] + price_change
+    income = next_price * inputs["monthly_milk_litres"]
+    best = int(np.argmax(income))
+    
+    def surface(values):
+        return np.round(values, 2).reshape(shape).tolist()
+    
+    return jsonify({
+        "rows": len(income),
+        "inputs": {key: values.tolist() if key in swept else float(values[0]) for key, values in axes.items()},
+        "axes": swept,
+        "shape": shape,
+        "predicted_price_change_lkr_per_litre": surface(price_change),
+        "predicted_next_month_price_lkr_per_litre": surface(next_price),
+        "predicted_next_month_income_lkr": surface(income),
+        "best": {
+            **{key: float(inputs[key][best]) for key in swept},
+            **milk_market_result(
+                {key: float(inputs[key][best]) for key in ("current_price", "monthly_milk_litres")},
+                float(price_change[best])
+            )
+        }
+    })
+
+def milk_market_forecast(milk_market_model, inputs, horizon):
+    """
+    Month-by-month recurrence for many trajectories at once: each step scores
+    all of them in one predict, its predicted price becomes the next step's
+    current price, and month (wrapping after 12) and lactation month advance.
+    Returns {name: array of shape (horizon, trajectories)}.
+    """
+    columns = feature_schema.columns_for(milk_market_model, MILK_MARKET_COLUMNS.values())
+    state = {key: np.asarray(values, dtype=np.float64) for key, values in inputs.items()}
+    steps = {name: [] for name in ("month", "lactation_month", "price_change", "price", "income")}
+    for _ in range(horizon):
+        features = feature_schema.stack(
+            columns, {column: state[key] for key, column in MILK_MARKET_COLUMNS.items()}
+        )
+        price_change = np.asarray(milk_market_model.predict(features), dtype=np.float64)
+        state["current_price"] = state["current_price"] + price_change
+        state["month"] = state["month"] % 12 + 1
+        state["lactation_month"] = state["lactation_month"] + 1
+        steps["month"].append(state["month"])
+        steps["lactation_month"].append(state["lactation_month"])
+        steps["price_change"].append(price_change)
+        steps["price"].append(state["current_price"])
+        steps["income"].append(state["current_price"] * state["monthly_milk_litres"])
+    return {name: np.array(values) for name, values in steps.items()}
+
+@app.route("/milk-market/forecast", methods=["POST"])
+def forecast_milk_market():
+    """Price and income trajectories over the next `horizon` months for each record"""
+    milk_market_model = model_registry.get("milk_market")
+    if milk_market_model is None:
+        return jsonify({"error": "Milk market model not loaded"}), 503
+    
+    data = request.get_json(silent=True)
+    horizon = MILK_MARKET_DEFAULT_HORIZON
+    if isinstance(data, dict):
+        horizon = data.get("horizon", horizon)
+    if isinstance(horizon, bool) or not isinstance(horizon, int) or not 1 <= horizon <= MILK_MARKET_MAX_HORIZON:
+        raise tabular_batch.BatchError(f"horizon must be a whole number of months from 1 to {MILK_MARKET_MAX_HORIZON}")
+    
+    records = tabular_batch.parse_records(data)
+    rows, indices, errors = tabular_batch.build_rows(records, lambda record: {
+        key: tabular_batch.number(record, key) for key in MILK_MARKET_COLUMNS
+    })
+    if not indices:
+        return jsonify(tabular_batch.respond(len(records), {}, errors, None))
+    
+    try:
+        trajectories = milk_market_forecast(
+            milk_market_model, {key: [row[key] for row in rows] for key in MILK_MARKET_COLUMNS}, horizon
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    def trajectory(index, position):
+        months = [{
+            "month": int(trajectories["month"][step, position]),
+            "lactation_month": int(trajectories["lactation_month"][step, position]),
+            "predicted_price_change_lkr_per_litre": round(float(trajectories["price_change"][step, position]), 2),
+            "predicted_price_lkr_per_litre": round(float(trajectories["price"][step, position]), 2),
+            "predicted_income_lkr": round(float(trajectories["income"][step, position]), 2)
+        } for step in range(horizon)]
+        return {
+            "horizon": horizon,
+            "months": months,
+            "total_income_lkr": round(float(trajectories["income"][:, position].sum()), 2)
+        }
+    
+    outputs = {index: position for position, index in enumerate(indices)}
+    return jsonify(tabular_batch.respond(len(records), outputs, errors, trajectory))
+
 # ==================== Nutrition Recommendation ====================
 @app.route("/nutrition/predict", methods=["POST"])
 def predict_nutrition():
+    nutrition_model, generation = model_registry.get_versioned("nutrition")
     if nutrition_model is None:
         return jsonify({"error": "Nutrition model not loaded"}), 503
     
     try:
         data = request.get_json()
         
-        input_df = pd.DataFrame([{
-            "Age_Months": data["Age_Months"],
-            "Weight_kg": data["Weight_kg"],
-            "Breed": data["Breed"],
-            "Milk_Yield_L_per_day": data["Milk_Yield_L_per_day"],
-            "Health_Status": data["Health_Status"],
-            "Disease": data["Disease"],
-            "Body_Condition_Score": data["Body_Condition_Score"],
-            "Location": data["Location"],
-            "Energy_MJ_per_day": data["Energy_MJ_per_day"],
-            "Crude_Protein_g_per_day": data["Crude_Protein_g_per_day"],
-            "Recommended_Feed_Type": data["Recommended_Feed_Type"]
-        }])
-        
-        prediction = nutrition_model.predict(input_df)[0]
-        
-        result = {
-            "Dry_Matter_Intake_kg_per_day": round(float(prediction[0]), 2),
-            "Calcium_g_per_day": round(float(prediction[1]), 2),
-            "Phosphorus_g_per_day": round(float(prediction[2]), 2)
-        }
+        def predict():
+            input_df = pd.DataFrame([{column: data[column] for column in NUTRITION_COLUMNS}])
+            
+            prediction = nutrition_model.predict(input_df)[0]
+            
+            return {
+                "status": "success",
+                "prediction": nutrition_result(prediction)
+            }
         
-        return jsonify({
-            "status": "success",
-            "prediction": result
-        })
+        return jsonify(NUTRITION_CACHE.get_or_compute(data, predict, {"nutrition": generation}))
     except Exception as e:
         return jsonify({
             "status": "error",
             "message": str(e)
         })
 
+def nutrition_result(prediction):
+    return {
+        "Dry_Matter_Intake_kg_per_day": round(float(prediction[0]), 2),
+        "Calcium_g_per_day": round(float(prediction[1]), 2),
+        "Phosphorus_g_per_day": round(float(prediction[2]), 2)
+    }
+
+@app.route("/nutrition/predict-batch", methods=["POST"])
+def predict_nutrition_batch():
+    nutrition_model = model_registry.get("nutrition")
+    if nutrition_model is None:
+        return jsonify({"error": "Nutrition model not loaded"}), 503
+    
+    records = tabular_batch.parse_records(request.get_json(silent=True))
+    rows, indices, errors = tabular_batch.build_rows(records, lambda record: {
+        column: (tabular_batch.text(record, column) if column in NUTRITION_CATEGORICAL
+                 else tabular_batch.number(record, column))
+        for column in NUTRITION_COLUMNS
+    })
+    outputs = tabular_batch.predict_rows(
+        nutrition_model.predict, pd.DataFrame(rows, columns=NUTRITION_COLUMNS), indices, errors
+    )
+    return jsonify(tabular_batch.respond(
+        len(records), outputs, errors, lambda index, prediction: {"prediction": nutrition_result(prediction)}
+    ))
+
 # ==================== Cattle Disease Detection Endpoints ====================
 
 @app.route('/api/health', methods=['GET'])
@@ -591,21 +1112,25 @@ def cattle_disease_health():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'models_loaded': cattle_densenet_model is not None,
+        'models_loaded': model_registry.state("cattle_densenet") == MODEL_STATE_WARM,
+        'ready': model_registry.ready,
         'version': '1.0'
     })
 
 @app.route('/api/models/status', methods=['GET'])
 def cattle_models_status():
     """Check status of cattle disease models"""
+    available = model_registry.is_available
     return jsonify({
-        'densenet121': cattle_densenet_model is not None,
-        'yolo_disease': cattle_yolo_disease_model is not None,
-        'yolo_behavior': cattle_yolo_behavior_model is not None,
-        'severity_model': cattle_severity_model is not None,
-        'treatment_model': cattle_treatment_model is not None,
+        'densenet121': available('cattle_densenet'),
+        'yolo_disease': available('cattle_yolo_disease'),
+        'yolo_behavior': available('cattle_yolo_behavior'),
+        'severity_model': available('cattle_severity'),
+        'treatment_model': available('cattle_treatment'),
         'behavior_system': BEHAVIOR_AVAILABLE,
-        'ultralytics': True
+        'ultralytics': True,
+        'models': model_registry.status(CATTLE_MODELS),
+        'artifact_cache': ARTIFACT_CACHE.status()
     })
 
 @app.route('/api/disease/detect', methods=['POST'])
@@ -625,6 +1150,7 @@ def detect_cattle_disease():
         result = {}
         
         # YOLO Detection (fast)
+        cattle_yolo_disease_model = model_registry.get("cattle_yolo_disease") if use_yolo else None
         if use_yolo and cattle_yolo_disease_model:
             yolo_results = cattle_yolo_disease_model(filepath, verbose=False)[0]
             
@@ -639,6 +1165,7 @@ def detect_cattle_disease():
                 }
         
         # DenseNet121 Detection (accurate)
+        cattle_densenet_model = model_registry.get("cattle_densenet")
         if cattle_densenet_model:
             img_array = process_image_for_cattle_densenet(filepath)
             predictions = cattle_densenet_model.predict(img_array, verbose=0)[0]
@@ -698,6 +1225,11 @@ def analyze_cattle_complete():
         result = {}
         
         # Step 1: Disease Detection
+        cattle_densenet_model = model_registry.get("cattle_densenet")
+        if cattle_densenet_model is None:
+            os.remove(filepath)
+            return jsonify({'error': 'DenseNet121 model not loaded'}), 503
+        
         img_array = process_image_for_cattle_densenet(filepath)
         predictions = cattle_densenet_model.predict(img_array, verbose=0)[0]
         
@@ -718,84 +1250,15 @@ def analyze_cattle_complete():
             os.remove(filepath)
             return jsonify(result)
         
-        # Step 2: Severity Assessment
-        if cattle_severity_model:
-            disease_encoded = cattle_severity_encoders['Disease'].transform([detected_disease])[0]
-            
-            if previous_disease and previous_disease != 'None':
-                try:
-                    prev_disease_encoded = cattle_severity_encoders['Previous_Disease'].transform([previous_disease])[0]
-                except:
-                    prev_disease_encoded = 0
-            else:
-                prev_disease_encoded = 0
-            
-            temp_deviation = temperature - 38.5
-            weight_age_ratio = weight / (age + 1)
-            has_history = 1 if prev_disease_encoded > 0 else 0
-            
-            severity_features = np.array([[
-                disease_encoded, weight, age, temperature, prev_disease_encoded,
-                temp_deviation, weight_age_ratio, has_history
-            ]])
-            
-            severity_features_scaled = cattle_severity_scaler.transform(severity_features)
-            severity_level = cattle_severity_model.predict(severity_features_scaled)[0]
-            severity_proba = cattle_severity_model.predict_proba(severity_features_scaled)[0]
-            severity_confidence = severity_proba[severity_level]
-            severity_name = CattleDiseaseConfig.SEVERITY_CLASSES[severity_level]
-            
-            result['severity'] = {
-                'level': severity_name,
-                'confidence': round(float(severity_confidence), 4),
-                'probabilities': {
-                    'Mild': round(float(severity_proba[0]), 4),
-                    'Moderate': round(float(severity_proba[1]), 4),
-                    'Severe': round(float(severity_proba[2]), 4)
-                }
-            }
-            
-            # Step 3: Treatment Recommendation
-            if cattle_treatment_model:
-                disease_encoded_treat = cattle_treatment_encoders['Disease'].transform([detected_disease])[0]
-                
-                if previous_disease and previous_disease != 'None':
-                    try:
-                        prev_disease_encoded_treat = cattle_treatment_encoders['Previous_Disease'].transform([previous_disease])[0]
-                    except:
-                        prev_disease_encoded_treat = 0
-                else:
-                    prev_disease_encoded_treat = 0
-                
-                severity_temp_interaction = severity_level * temp_deviation
-                
-                treatment_features = np.array([[
-                    disease_encoded_treat, severity_level, weight, age, temperature,
-                    prev_disease_encoded_treat, temp_deviation, weight_age_ratio,
-                    has_history, severity_temp_interaction
-                ]])
-                
-                treatment_features_scaled = cattle_treatment_scaler.transform(treatment_features)
-                treatment_idx = cattle_treatment_model.predict(treatment_features_scaled)[0]
-                treatment_proba = cattle_treatment_model.predict_proba(treatment_features_scaled)[0]
-                
-                treatment_name = cattle_treatment_encoders['Treatment'].classes_[treatment_idx]
-                treatment_confidence = treatment_proba[treatment_idx]
-                
-                top3_indices = np.argsort(treatment_proba)[-3:][::-1]
-                top3_treatments = [
-                    {
-                        'treatment': cattle_treatment_encoders['Treatment'].classes_[idx],
-                        'probability': round(float(treatment_proba[idx]), 4)
-                    }
-                    for idx in top3_indices
-                ]
-                
-                result['treatment'] = {
-                    'primary': treatment_name,
-                    'confidence': round(float(treatment_confidence), 4),
-                    'alternatives': top3_treatments
-                }
+        # Steps 2-3: Severity Assessment -> Treatment Recommendation
+        cattle_severity = model_registry.get("cattle_severity")
+        if cattle_severity:
+            cases = diagnosis_cascade.ClinicalCases(
+                [detected_disease], [weight], [age], [temperature], [previous_disease]
+            )
+            result.update(diagnosis_cascade.run(
+                cattle_severity, model_registry.get("cattle_treatment"), cases
+            )[0])
         
         os.remove(filepath)
         
@@ -816,6 +1279,7 @@ def analyze_cattle_complete():
 def quick_cattle_diagnosis():
     """Fast diagnosis using YOLO only"""
     try:
+        cattle_yolo_disease_model = model_registry.get("cattle_yolo_disease")
         if not cattle_yolo_disease_model:
             return jsonify({'error': 'YOLO model not available'}), 500
         
@@ -919,6 +1383,7 @@ def analyze_cattle_behavior(cow_id):
 def detect_cattle_behavior_from_video():
     """Detect behavior from uploaded video frame using YOLOv8s"""
     try:
+        cattle_yolo_behavior_model = model_registry.get("cattle_yolo_behavior")
         if not cattle_yolo_behavior_model:
             return jsonify({'error': 'YOLO behavior model not available'}), 500
         
@@ -978,10 +1443,14 @@ def analyze_cattle_video():
         
         frames = video_data['frames']
         fps = video_data['fps']
+        cv2 = heavy_imports.cv2()
         
         behavior_timeline = []
         disease_detections = []
         
+        cattle_yolo_behavior_model = model_registry.get("cattle_yolo_behavior") if detect_behavior_flag else None
+        cattle_yolo_disease_model = model_registry.get("cattle_yolo_disease") if detect_disease_flag else None
+        
         for idx, frame in enumerate(frames):
             timestamp = (idx * frame_interval) / fps if fps > 0 else idx
             
@@ -1112,7 +1581,20 @@ def analyze_cattle_video():
 
 # ==================== Run Application ====================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Farm AI Backend")
+    parser.add_argument("--import-report", action="store_true",
+                        help="Print an import-time report (python -X importtime) for app.py and exit")
+    parser.add_argument("--import-budget", type=float, default=None,
+                        help="With --import-report, exit non-zero if importing app.py takes longer (seconds)")
+    args = parser.parse_args()
+    
+    if args.import_report:
+        import startup_report
+        sys.exit(startup_report.run("app", budget=args.import_budget))
+    
     print("\n" + "="*60)
     print("🚀 Smart Farm AI Backend - Starting...")
     print("="*60 + "\n")
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Development server only; the debug reloader would load every model twice.
+    # Production: gunicorn -c gunicorn.conf.py app:app
+    app.run(host="0.0.0.0", port=5000, debug=env_flag("SMART_FARM_DEBUG"))
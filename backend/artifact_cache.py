@@ -0,0 +1,315 @@
+"""
+Precompiled Model Artifact Cache
+Converts Keras .h5 and YOLO .pt artifacts once into inference-optimized forms
+(a TensorFlow SavedModel with a fixed serving signature, an ultralytics
+TorchScript export) and loads those on later starts.
+
+Entries are keyed by the SHA-256 of the source file, so a retrained artifact
+invalidates its entry automatically. Any cache problem falls back to loading
+the original artifact. On a miss the original is served immediately and the
+conversion runs in the background for the next start, on a private copy
+loaded by the conversion thread (the served model is never exported) and
+written only inside the cache directory.
+
+Configuration:
+    SMART_FARM_ARTIFACT_CACHE=0          disable the cache
+    SMART_FARM_ARTIFACT_CACHE_DIR=path   cache location (default backend/.model_cache)
+
+Usage:
+    python artifact_cache.py --list
+    python artifact_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import heavy_imports
+import model_warmup
+
+CACHE_ENV = 'SMART_FARM_ARTIFACT_CACHE'
+CACHE_DIR_ENV = 'SMART_FARM_ARTIFACT_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.model_cache')
+
+META_FILE = 'meta.json'
+HASH_MANIFEST = 'hashes.json'
+
+
+# ==================== Cached Model Wrappers ====================
+class SavedModelPredictor:
+    """Keras-compatible predict() over a SavedModel serving signature"""
+
+    def __init__(self, loaded, meta):
+        self._loaded = loaded  # keeps the restored variables alive
+        self._serve = loaded.signatures['serving_default']
+        self.input_shape = tuple(meta['input_shape'])
+        self.output_shape = tuple(meta['output_shape'])
+
+    def serve(self, inputs):
+        """Output tensor for an input tensor (also usable inside a tf.function)"""
+        return next(iter(self._serve(inputs=inputs).values()))
+
+    def __call__(self, x, training=False):
+        tf = heavy_imports.tensorflow()
+        return self.serve(tf.convert_to_tensor(np.asarray(x, dtype=np.float32)))
+
+    def predict(self, x, verbose=0, batch_size=None):
+        return self(x).numpy()
+
+
+# ==================== Converters ====================
+# A converter gets the source path, the directory to write into and the loader
+# of the original. It loads a private copy: the model being served is never
+# touched by export/save, and nothing is written beside the source weights.
+def _convert_keras(path, target_dir, load_original):
+    tf = heavy_imports.tensorflow()
+    model = load_original()
+    input_shape = [None] + list(model.input_shape[1:])
+    spec = tf.TensorSpec(input_shape, tf.float32, name='inputs')
+    serve = tf.function(lambda inputs: model(inputs, training=False), input_signature=[spec])
+    tf.saved_model.save(model, target_dir, signatures={'serving_default': serve.get_concrete_function()})
+    return {
+        'format': 'savedmodel',
+        'input_shape': input_shape,
+        'output_shape': [None] + list(model.output_shape[1:])
+    }
+
+
+def _load_keras_cached(entry_dir, meta):
+    tf = heavy_imports.tensorflow()
+    return SavedModelPredictor(tf.saved_model.load(entry_dir), meta)
+
+
+def _convert_yolo(path, target_dir, load_original):
+    # ultralytics writes the export next to the weights it loaded, so load a
+    # copy that lives in the entry directory
+    source = os.path.join(target_dir, 'source.pt')
+    shutil.copyfile(path, source)
+    model = heavy_imports.yolo()(source)
+    imgsz = model_warmup.yolo_imgsz(model)
+    exported = model.export(format='torchscript', imgsz=imgsz)
+    os.replace(str(exported), os.path.join(target_dir, 'model.torchscript'))
+    os.remove(source)
+    return {'format': 'torchscript', 'task': model.task, 'imgsz': imgsz}
+
+
+def _load_yolo_cached(entry_dir, meta):
+    model = heavy_imports.yolo()(os.path.join(entry_dir, 'model.torchscript'), task=meta['task'])
+    # The export has a fixed input size; make every call use it
+    model.overrides['imgsz'] = meta['imgsz']
+    return model
+
+
+# ==================== Cache ====================
+class ArtifactCache:
+    """Content-hash keyed cache of converted model artifacts"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, enabled=True):
+        self.root = root
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._converter = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifact-cache')
+        self._status = {}
+
+    @classmethod
+    def from_env(cls):
+        enabled = os.environ.get(CACHE_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        return cls(os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR), enabled=enabled)
+
+    # ---------- Hashing ----------
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.root, HASH_MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        # Per-process temp file: gunicorn workers may rewrite the manifest at the same time
+        fd, tmp_path = tempfile.mkstemp(prefix=HASH_MANIFEST + '.', suffix='.tmp', dir=self.root)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, os.path.join(self.root, HASH_MANIFEST))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def file_hash(self, path):
+        """SHA-256 of a file; reused while its size and mtime are unchanged"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            manifest = self._read_manifest()
+            known = manifest.get(path)
+            if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                return known['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        with self._lock:
+            manifest = self._read_manifest()
+            manifest[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+            self._write_manifest(manifest)
+        return sha256
+
+    def entry_dir(self, name, sha256, fmt):
+        return os.path.join(self.root, f"{name}-{fmt}-{sha256[:16]}")
+
+    # ---------- Loading ----------
+    def load(self, name, path, fmt, load_original, convert, load_cached):
+        """Load from the cache when a valid entry exists, else the original (and convert later)"""
+        if not self.enabled:
+            return load_original()
+
+        try:
+            sha256 = self.file_hash(path)
+        except OSError:
+            return load_original()  # missing source: let the original loader raise
+
+        entry_dir = self.entry_dir(name, sha256, fmt)
+        meta_path = os.path.join(entry_dir, META_FILE)
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                model = load_cached(entry_dir, meta)
+                self._status[name] = {'source': 'cache', 'format': fmt, 'sha256': sha256, 'error': None}
+                print(f"⚡ {name} loaded from artifact cache ({fmt})")
+                return model
+            except Exception as e:
+                print(f"⚠️ {name} cache entry unusable, falling back to original: {e}")
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                self._status[name] = {'source': 'original', 'format': fmt, 'sha256': sha256, 'error': str(e)}
+
+        model = load_original()
+        self._status.setdefault(name, {'source': 'original', 'format': fmt, 'sha256': sha256, 'error': None})
+        self._schedule_conversion(name, sha256, fmt, path, load_original, convert)
+        return model
+
+    def _schedule_conversion(self, name, sha256, fmt, path, load_original, convert):
+        key = (name, sha256, fmt)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._status[name]['conversion'] = 'pending'
+        self._converter.submit(self._convert, name, sha256, fmt, path, load_original, convert)
+
+    def _convert(self, name, sha256, fmt, path, load_original, convert):
+        entry_dir = self.entry_dir(name, sha256, fmt)
+        meta_path = os.path.join(entry_dir, META_FILE)
+        tmp_dir = None
+        try:
+            if os.path.exists(meta_path):
+                # Another worker process converted it first
+                self._status[name]['conversion'] = 'done'
+                return
+            os.makedirs(self.root, exist_ok=True)
+            # Unique per conversion, so workers missing the same artifact never share a directory
+            # (the leading dot keeps it out of _prune's reach)
+            tmp_dir = tempfile.mkdtemp(prefix=f".tmp-{name}-{fmt}-", dir=self.root)
+            meta = convert(path, tmp_dir, load_original)
+            meta.update({'name': name, 'source_sha256': sha256, 'created_at': datetime.now().isoformat()})
+            with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+                json.dump(meta, f, indent=2)
+            if os.path.exists(meta_path):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            else:
+                # Leftovers of an interrupted conversion (no meta.json) are replaced
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                try:
+                    os.replace(tmp_dir, entry_dir)
+                except OSError:
+                    if not os.path.exists(meta_path):
+                        raise
+                    shutil.rmtree(tmp_dir, ignore_errors=True)  # lost the race to another worker
+                self._prune(name, fmt, keep=entry_dir)
+            self._status[name]['conversion'] = 'done'
+            print(f"⚡ {name} converted to {fmt} for faster loading")
+        except Exception as e:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            self._status[name]['conversion'] = f"failed: {e}"
+            print(f"⚠️ {name} conversion to {fmt} failed (original artifact keeps being used): {e}")
+        finally:
+            with self._lock:
+                self._pending.discard((name, sha256, fmt))
+
+    def _prune(self, name, fmt, keep):
+        """Remove entries for older versions of the same source artifact"""
+        prefix = f"{name}-{fmt}-"
+        for entry in os.listdir(self.root):
+            full_path = os.path.join(self.root, entry)
+            if entry.startswith(prefix) and full_path != keep and os.path.isdir(full_path):
+                shutil.rmtree(full_path, ignore_errors=True)
+
+    def wait(self):
+        """Block until queued conversions have finished"""
+        self._converter.shutdown(wait=True)
+        self._converter = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifact-cache')
+
+    # ---------- Convenience loaders ----------
+    def load_keras(self, name, path, custom_objects=None, compile=True):
+        """Keras .h5 model, served from a SavedModel once converted"""
+        def load_original():
+            return heavy_imports.keras().models.load_model(
+                path, custom_objects=custom_objects, compile=compile
+            )
+        return self.load(name, path, 'savedmodel', load_original, _convert_keras, _load_keras_cached)
+
+    def load_yolo(self, name, path):
+        """Ultralytics .pt model, served from a TorchScript export once converted"""
+        return self.load(
+            name, path, 'torchscript',
+            lambda: heavy_imports.yolo()(path), _convert_yolo, _load_yolo_cached
+        )
+
+    # ---------- Status ----------
+    def status(self):
+        return {'enabled': self.enabled, 'root': self.root, 'models': dict(self._status)}
+
+    def entries(self):
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for entry in sorted(os.listdir(self.root)):
+            meta_path = os.path.join(self.root, entry, META_FILE)
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    entries.append(json.load(f))
+        return entries
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+ARTIFACT_CACHE = ArtifactCache.from_env()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or clear the model artifact cache")
+    parser.add_argument('--list', action='store_true', help="List cached entries")
+    parser.add_argument('--clear', action='store_true', help="Delete the whole cache")
+    args = parser.parse_args()
+
+    if args.clear:
+        ARTIFACT_CACHE.clear()
+        print(f"🗑️ Cleared {ARTIFACT_CACHE.root}")
+    else:
+        for meta in ARTIFACT_CACHE.entries():
+            print(f"{meta['name']:<24} {meta['format']:<12} {meta['source_sha256'][:16]}  {meta['created_at']}")
@@ -0,0 +1,262 @@
+"""
+Thread Configuration Benchmark
+Sweeps thread pool sizes, CPU affinity files and worker counts for the image
+endpoints and reports throughput and tail latency for each combination.
+
+Every combination runs against a fresh server (gunicorn.conf.py), because
+TensorFlow and PyTorch fix their thread pools when they start. The endpoint
+models are preloaded and warmed up before timing starts.
+
+Usage:
+    python benchmark.py --image cow.jpg
+    python benchmark.py --image cow.jpg --threads 1,2,4 --inter-op 1,2 --workers 1,2
+    python benchmark.py --image cow.jpg --thread-config pin_a.json pin_b.json
+    python benchmark.py --image cow.jpg --url http://localhost:5000    # running server, no sweep
+"""
+
+import argparse
+import itertools
+import json
+import mimetypes
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import thread_config
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Image endpoints: name -> (path, extra form fields, models to preload)
+ENDPOINTS = {
+    'cow_identify': ('/cow-identify/detect', {}, ['cow_identify']),
+    'cow_feed_image': (
+        '/cow-feed/predict-from-image',
+        {'breed': 'Friesian', 'age': '48', 'milk_yield': '18', 'activity': 'High'},
+        ['cow_feed_image', 'cow_feed']
+    ),
+    'disease_detect': ('/api/disease/detect', {'use_yolo': 'true'}, ['cattle_densenet', 'cattle_yolo_disease']),
+    'disease_analyze': (
+        '/api/disease/analyze', {'weight': '450', 'age': '40', 'temperature': '39.5'},
+        ['cattle_densenet', 'cattle_severity', 'cattle_treatment']
+    ),
+    'quick_diagnosis': ('/api/quick-diagnosis', {}, ['cattle_yolo_disease'])
+}
+
+
+# ==================== HTTP ====================
+def multipart_body(image_path, fields):
+    """multipart/form-data body with the image and form fields"""
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+    parts = []
+    for key, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode()
+        )
+    with open(image_path, 'rb') as f:
+        image = f.read()
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; '
+        f'filename="{os.path.basename(image_path)}"\r\nContent-Type: {content_type}\r\n\r\n'.encode()
+        + image + b'\r\n'
+    )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def post(url, body, content_type, timeout=300):
+    """POST and return (status, seconds)"""
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - start
+
+
+def wait_ready(base_url, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + '/ready', timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.HTTPError, OSError):
+            pass
+        time.sleep(1)
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+
+# ==================== Measurement ====================
+def measure_endpoint(base_url, name, image_path, requests, concurrency):
+    """Throughput and latency percentiles of one endpoint under concurrent load"""
+    path, fields, _ = ENDPOINTS[name]
+    body, content_type = multipart_body(image_path, fields)
+    url = base_url + path
+    post(url, body, content_type)  # first request outside the timing
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: post(url, body, content_type), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([seconds for status, seconds in results if status == 200])
+    errors = sum(1 for status, _ in results if status != 200)
+    return {
+        'endpoint': name,
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 1) if len(latencies) else None,
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 1) if len(latencies) else None
+    }
+
+
+def start_server(settings, endpoints, port, log_file):
+    """Fresh gunicorn server with the given thread settings, models preloaded and warmed up"""
+    preload = sorted({model for name in endpoints for model in ENDPOINTS[name][2]})
+    env = dict(os.environ)
+    env.update({
+        'SMART_FARM_BIND': f'127.0.0.1:{port}',
+        'SMART_FARM_WORKERS': str(settings['workers']),
+        'SMART_FARM_PRELOAD': ','.join(preload),
+        'SMART_FARM_WARMUP': '1',
+        'SMART_FARM_BACKGROUND_STARTUP': '0',
+        thread_config.TF_INTRA_OP_ENV: str(settings['threads']),
+        thread_config.TF_INTER_OP_ENV: str(settings['inter_op']),
+        thread_config.TORCH_THREADS_ENV: str(settings['threads']),
+        thread_config.SKLEARN_THREADS_ENV: str(settings['threads']),
+        'OMP_NUM_THREADS': str(settings['threads'])
+    })
+    if settings['thread_config']:
+        env[thread_config.THREAD_CONFIG_ENV] = os.path.abspath(settings['thread_config'])
+    else:
+        env.pop(thread_config.THREAD_CONFIG_ENV, None)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def sweep(args, endpoints):
+    combinations = [
+        {'threads': threads, 'inter_op': inter_op, 'workers': workers, 'thread_config': config_file}
+        for threads, inter_op, workers, config_file in itertools.product(
+            args.threads, args.inter_op, args.workers, args.thread_config or [None]
+        )
+    ]
+    rows = []
+    for index, settings in enumerate(combinations, 1):
+        label = (f"threads={settings['threads']} inter_op={settings['inter_op']} "
+                 f"workers={settings['workers']} config={settings['thread_config'] or '-'}")
+        print(f"\n[{index}/{len(combinations)}] {label}")
+        with tempfile.TemporaryFile() as log_file:
+            process = start_server(settings, endpoints, args.port, log_file)
+            try:
+                wait_ready(f'http://127.0.0.1:{args.port}', process, args.startup_timeout)
+                for name in endpoints:
+                    result = measure_endpoint(
+                        f'http://127.0.0.1:{args.port}', name, args.image, args.requests, args.concurrency
+                    )
+                    rows.append({**settings, **result})
+                    print_row(rows[-1])
+            except RuntimeError as e:
+                log_file.seek(0)
+                print(f"✗ {e}\n{log_file.read().decode(errors='replace')[-2000:]}")
+            finally:
+                stop_server(process)
+    return rows
+
+
+def print_row(row):
+    settings = ''
+    if 'threads' in row:
+        settings = f"t={row['threads']:<3} io={row['inter_op']:<3} w={row['workers']:<3} "
+    print(f"  {settings}{row['endpoint']:<18} {row['throughput_rps'] or 0:>8.2f} req/s  "
+          f"p50 {row['p50_ms'] or 0:>8.1f} ms  p99 {row['p99_ms'] or 0:>8.1f} ms  errors {row['errors']}")
+
+
+def print_summary(rows):
+    print("\n" + "=" * 60)
+    print("⚡ Best configuration per endpoint (throughput, then p99)")
+    print("=" * 60)
+    for name in dict.fromkeys(row['endpoint'] for row in rows):
+        candidates = [row for row in rows if row['endpoint'] == name and row['throughput_rps']]
+        if not candidates:
+            print(f"  {name:<18} no successful requests")
+            continue
+        best = max(candidates, key=lambda row: (row['throughput_rps'], -(row['p99_ms'] or 0)))
+        print_row(best)
+        if best.get('thread_config'):
+            print(f"    thread config: {best['thread_config']}")
+    print("=" * 60 + "\n")
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+if __name__ == '__main__':
+    cores = os.cpu_count() or 1
+    default_threads = ','.join(str(n) for n in (1, 2, 4, 8, 16) if n <= cores) or '1'
+
+    parser = argparse.ArgumentParser(description="Benchmark thread settings for the image endpoints")
+    parser.add_argument('--image', required=True, help="Image sent with every request")
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help=f"Comma separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--requests', type=int, default=50, help="Timed requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=4, help="Concurrent clients")
+    parser.add_argument('--threads', type=int_list, default=int_list(default_threads),
+                        help="Intra-op/torch/BLAS thread counts to sweep (default: powers of two up to the cores)")
+    parser.add_argument('--inter-op', type=int_list, default=[1], help="TF inter-op thread counts to sweep")
+    parser.add_argument('--workers', type=int_list, default=[1], help="gunicorn worker counts to sweep")
+    parser.add_argument('--thread-config', nargs='*', default=None,
+                        help="thread_config JSON files (CPU affinity variants) to sweep")
+    parser.add_argument('--url', default=None, help="Benchmark a running server once instead of sweeping")
+    parser.add_argument('--port', type=int, default=5055, help="Port for the servers started by the sweep")
+    parser.add_argument('--startup-timeout', type=int, default=600, help="Seconds to wait for /ready")
+    parser.add_argument('--output', default=None, help="Write all results to this JSON file")
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    if args.url:
+        rows = []
+        for name in endpoints:
+            rows.append(measure_endpoint(args.url.rstrip('/'), name, args.image, args.requests, args.concurrency))
+            print_row(rows[-1])
+    else:
+        rows = sweep(args, endpoints)
+        print_summary(rows)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results written to {args.output}")
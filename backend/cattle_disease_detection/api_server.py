@@ -27,11 +27,22 @@ import pandas as pd
 import joblib
 import os
 import cv2
+import math
+import threading
 from datetime import datetime
 import json
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+# Shared backend utilities (model warm-up) live one directory up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import diagnosis_cascade
+import model_warmup
+from artifact_cache import ARTIFACT_CACHE
+from cattle_models import CATTLE_MODELS, register_cattle_models
+from model_registry import MODEL_STATE_WARM, get_registry
+
 # Import behavior system
 try:
     from behavior_data_manager import BehaviorDataCollector, BehaviorAnalyzer
@@ -56,18 +67,11 @@ CORS(app)  # Enable CORS for frontend access
 class APIConfig:
     """API Configuration"""
     
-    # Model paths
-    DENSENET_MODEL = "models/DenseNet121_Disease/best_model.h5"
-    YOLO_DISEASE_MODEL = "models/All_Cattle_Disease/best.pt"
-    YOLO_BEHAVIOR_MODEL = "models/All_Behaviore/best.pt"
-    
-    SEVERITY_MODEL = "models/Treatment_Severity/best_model_gradient_boosting.pkl"
-    SEVERITY_SCALER = "models/Treatment_Severity/scaler.pkl"
-    SEVERITY_ENCODERS = "models/Treatment_Severity/label_encoders.pkl"
+    # Model artifacts are defined in ../cattle_models.py (shared with the unified backend)
     
-    TREATMENT_MODEL = "models/Treatment_Recommendation/best_model_gradient_boosting.pkl"
-    TREATMENT_SCALER = "models/Treatment_Recommendation/scaler.pkl"
-    TREATMENT_ENCODERS = "models/Treatment_Recommendation/label_encoders.pkl"
+    # Warm-up: run synthetic inputs through every loaded model before serving
+    WARMUP = os.environ.get('SMART_FARM_WARMUP', '').lower() in ('1', 'true', 'yes', 'on')
+    DEBUG = os.environ.get('SMART_FARM_DEBUG', '').lower() in ('1', 'true', 'yes', 'on')
     
     # Image settings
     IMG_SIZE = (224, 224)
@@ -81,7 +85,7 @@ class APIConfig:
         'Lumpy Skin', 'Mastitis', 'Pediculosis', 'Ringworm'
     ]
     
-    SEVERITY_CLASSES = ['Mild', 'Moderate', 'Severe']
+    SEVERITY_CLASSES = diagnosis_cascade.SEVERITY_CLASSES
 
 # Create upload folder
 os.makedirs(APIConfig.UPLOAD_FOLDER, exist_ok=True)
@@ -91,83 +95,69 @@ os.makedirs(APIConfig.UPLOAD_FOLDER, exist_ok=True)
 # ============================================================================
 
 class ModelLoader:
-    """Load and manage all models"""
+    """
+    Per-model lifecycle on top of the shared model registry.
+    
+    Each model is cold (unloaded), loading, warm (ready) or failed. Loads run
+    in the background, so requests never wait for them: a model that is not
+    ready yet answers 503, and a failed one is retried with exponential
+    backoff instead of on every request.
+    """
     
     def __init__(self):
-        self.densenet_model = None
-        self.yolo_disease_model = None
-        self.yolo_behavior_model = None
-        self.severity_model = None
-        self.severity_scaler = None
-        self.severity_encoders = None
-        self.treatment_model = None
-        self.treatment_scaler = None
-        self.treatment_encoders = None
+        self.registry = get_registry()
         self.behavior_collector = None
         self.behavior_analyzer = None
-        
-        self.models_loaded = False
+        self.behavior_error = None
+        
+        self.models_loaded = False  # background startup has been kicked off
+        self.ready = False
+        self._start_lock = threading.Lock()
+        self._register_models()
+    
+    def _register_models(self):
+        # Shared process-wide registry: models already registered (and loaded)
+        # by the unified backend or the integrated workflow are reused
+        register_cattle_models(self.registry)
+        if not YOLO_AVAILABLE:
+            print("⚠️ Ultralytics not installed")
+    
+    def model(self, name):
+        """The model if it is ready, else None (a background load is started if due)"""
+        if name not in self.registry.names():
+            return None
+        return self.registry.get_nowait(name)
     
     def load_all_models(self):
-        """Load all models at startup"""
-        print("\n🔄 Loading models...")
+        """Start loading every model in the background; returns immediately"""
+        with self._start_lock:
+            if self.models_loaded:
+                return
+            self.models_loaded = True
         
-        try:
-            # Load DenseNet121
-            if os.path.exists(APIConfig.DENSENET_MODEL):
-                self.densenet_model = keras.models.load_model(APIConfig.DENSENET_MODEL)
-                print("✅ DenseNet121 loaded")
-            else:
-                print("⚠️ DenseNet121 not found")
-            
-            # Load YOLO models
-            if YOLO_AVAILABLE:
-                if os.path.exists(APIConfig.YOLO_DISEASE_MODEL):
-                    self.yolo_disease_model = YOLO(APIConfig.YOLO_DISEASE_MODEL)
-                    print("✅ YOLOv8x Disease model loaded")
-                else:
-                    print("⚠️ YOLO Disease model not found")
-                
-                if os.path.exists(APIConfig.YOLO_BEHAVIOR_MODEL):
-                    self.yolo_behavior_model = YOLO(APIConfig.YOLO_BEHAVIOR_MODEL)
-                    print("✅ YOLOv8s Behavior model loaded")
-                else:
-                    print("⚠️ YOLO Behavior model not found")
-            else:
-                print("⚠️ Ultralytics not installed")
-            
-            # Load Severity model
-            if os.path.exists(APIConfig.SEVERITY_MODEL):
-                self.severity_model = joblib.load(APIConfig.SEVERITY_MODEL)
-                self.severity_scaler = joblib.load(APIConfig.SEVERITY_SCALER)
-                self.severity_encoders = joblib.load(APIConfig.SEVERITY_ENCODERS)
-                print("✅ Severity model loaded")
-            else:
-                print("⚠️ Severity model not found")
-            
-            # Load Treatment model
-            if os.path.exists(APIConfig.TREATMENT_MODEL):
-                self.treatment_model = joblib.load(APIConfig.TREATMENT_MODEL)
-                self.treatment_scaler = joblib.load(APIConfig.TREATMENT_SCALER)
-                self.treatment_encoders = joblib.load(APIConfig.TREATMENT_ENCODERS)
-                print("✅ Treatment model loaded")
-            else:
-                print("⚠️ Treatment model not found")
-            
-            # Load Behavior system
-            if BEHAVIOR_AVAILABLE:
+        # Load Behavior system (plain Python, no model artifacts)
+        if BEHAVIOR_AVAILABLE:
+            try:
                 self.behavior_collector = BehaviorDataCollector()
                 self.behavior_analyzer = BehaviorAnalyzer(self.behavior_collector)
                 print("✅ Behavior system loaded")
-            else:
-                print("⚠️ Behavior system not available")
-            
-            self.models_loaded = True
-            print("✅ All available models loaded successfully!\n")
-            
-        except Exception as e:
-            print(f"❌ Error loading models: {str(e)}")
-            self.models_loaded = False
+            except Exception as e:
+                self.behavior_error = str(e)
+                print(f"❌ Behavior system failed: {e}")
+        else:
+            print("⚠️ Behavior system not available")
+        
+        threading.Thread(target=self._startup, name='model-startup', daemon=True).start()
+    
+    def _startup(self):
+        print("\n🔄 Loading models...")
+        names = CATTLE_MODELS
+        self.registry.preload(names, max_workers=min(4, os.cpu_count() or 1))
+        if APIConfig.WARMUP:
+            print("🔥 Warming up models...")
+            self.registry.warmup_all(names)
+        self.ready = True
+
 
 # Initialize model loader
 model_loader = ModelLoader()
@@ -193,6 +183,21 @@ def process_image_for_densenet(img_path):
     img_array = img_array / 255.0
     return img_array
 
+def model_unavailable(name, label):
+    """Fail fast with 503 while a model is loading, or backing off after a failed load"""
+    body = {'error': f'{label} not available'}
+    retry_after = None
+    if name in model_loader.registry.names():
+        status = model_loader.registry.model_status(name)
+        body['state'] = status['state']
+        if status['error']:
+            body['detail'] = status['error']
+        retry_after = model_loader.registry.retry_after(name)
+    response = jsonify(body)
+    response.status_code = 503
+    response.headers['Retry-After'] = str(math.ceil(retry_after) if retry_after else 5)
+    return response
+
 def save_uploaded_file(file):
     """Save uploaded file and return path"""
     if file and allowed_file(file.filename):
@@ -264,21 +269,38 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'models_loaded': model_loader.models_loaded,
+        'models_loaded': model_loader.ready,
+        'ready': model_loader.ready,
         'version': '1.0'
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until models are loaded and warmed up"""
+    if not model_loader.ready:
+        return jsonify({'ready': False}), 503
+    return jsonify({'ready': True})
+
 @app.route('/api/models/status', methods=['GET'])
 def models_status():
     """Check status of all models"""
+    status = model_loader.registry.status(CATTLE_MODELS)
+    ready = lambda name: name in status and status[name]['state'] == MODEL_STATE_WARM
     return jsonify({
-        'densenet121': model_loader.densenet_model is not None,
-        'yolo_disease': model_loader.yolo_disease_model is not None,
-        'yolo_behavior': model_loader.yolo_behavior_model is not None,
-        'severity_model': model_loader.severity_model is not None,
-        'treatment_model': model_loader.treatment_model is not None,
-        'behavior_system': BEHAVIOR_AVAILABLE,
-        'ultralytics': YOLO_AVAILABLE
+        'densenet121': ready('cattle_densenet'),
+        'yolo_disease': ready('cattle_yolo_disease'),
+        'yolo_behavior': ready('cattle_yolo_behavior'),
+        'severity_model': ready('cattle_severity'),
+        'treatment_model': ready('cattle_treatment'),
+        'behavior_system': BEHAVIOR_AVAILABLE and model_loader.behavior_collector is not None,
+        'ultralytics': YOLO_AVAILABLE,
+        'models': status,
+        'load_times': {name: item['load_time_seconds'] for name, item in status.items()
+                       if item['load_time_seconds'] is not None},
+        'load_errors': {name: item['error'] for name, item in status.items() if item['error']},
+        'warmup_times': {name: item['warmup_seconds'] for name, item in status.items()
+                         if item['warmup_seconds'] is not None},
+        'artifact_cache': ARTIFACT_CACHE.status()
     })
 
 @app.route('/api/disease/detect', methods=['POST'])
@@ -309,15 +331,17 @@ def detect_disease():
             return jsonify({'error': 'Invalid file format'}), 400
         
         result = {}
+        yolo_disease_model = model_loader.model('cattle_yolo_disease') if use_yolo else None
+        densenet_model = model_loader.model('cattle_densenet')
         
         # YOLO Detection (fast)
-        if use_yolo and model_loader.yolo_disease_model:
-            yolo_results = model_loader.yolo_disease_model(filepath, verbose=False)[0]
+        if use_yolo and yolo_disease_model:
+            yolo_results = yolo_disease_model(filepath, verbose=False)[0]
             
             if hasattr(yolo_results, 'probs') and yolo_results.probs is not None:
                 top_class_id = int(yolo_results.probs.top1)
                 top_confidence = float(yolo_results.probs.top1conf)
-                predicted_class = model_loader.yolo_disease_model.names[top_class_id]
+                predicted_class = yolo_disease_model.names[top_class_id]
                 
                 result['yolo'] = {
                     'disease': predicted_class,
@@ -325,9 +349,9 @@ def detect_disease():
                 }
         
         # DenseNet121 Detection (accurate)
-        if model_loader.densenet_model:
+        if densenet_model:
             img_array = process_image_for_densenet(filepath)
-            predictions = model_loader.densenet_model.predict(img_array, verbose=0)[0]
+            predictions = densenet_model.predict(img_array, verbose=0)[0]
             
             top_class_id = int(np.argmax(predictions))
             top_confidence = float(predictions[top_class_id])
@@ -358,7 +382,7 @@ def detect_disease():
             result['disease'] = result['yolo']['disease']
             result['confidence'] = result['yolo']['confidence']
         else:
-            return jsonify({'error': 'No models available'}), 500
+            return model_unavailable('cattle_densenet', 'DenseNet121 model')
         
         result['timestamp'] = datetime.now().isoformat()
         
@@ -398,6 +422,16 @@ def analyze_complete():
         temperature = float(request.form.get('temperature', 38.5))
         previous_disease = request.form.get('previous_disease', None)
         
+        densenet_model = model_loader.model('cattle_densenet')
+        if densenet_model is None:
+            return model_unavailable('cattle_densenet', 'DenseNet121 model')
+        severity = model_loader.model('cattle_severity')
+        if severity is None:
+            return model_unavailable('cattle_severity', 'Severity model')
+        treatment = model_loader.model('cattle_treatment')
+        if treatment is None:
+            return model_unavailable('cattle_treatment', 'Treatment model')
+        
         # Save file
         filepath = save_uploaded_file(file)
         if not filepath:
@@ -407,7 +441,7 @@ def analyze_complete():
         
         # Step 1: Disease Detection
         img_array = process_image_for_densenet(filepath)
-        predictions = model_loader.densenet_model.predict(img_array, verbose=0)[0]
+        predictions = densenet_model.predict(img_array, verbose=0)[0]
         
         top_class_id = int(np.argmax(predictions))
         disease_confidence = float(predictions[top_class_id])
@@ -426,106 +460,11 @@ def analyze_complete():
             os.remove(filepath)
             return jsonify(result)
         
-        # Step 2: Severity Assessment
-        if model_loader.severity_model:
-            # Encode disease
-            disease_encoded = model_loader.severity_encoders['Disease'].transform([detected_disease])[0]
-            
-            # Encode previous disease
-            if previous_disease and previous_disease != 'None':
-                try:
-                    prev_disease_encoded = model_loader.severity_encoders['Previous_Disease'].transform([previous_disease])[0]
-                except:
-                    prev_disease_encoded = 0
-            else:
-                prev_disease_encoded = 0
-            
-            # Calculate features
-            temp_deviation = temperature - 38.5
-            weight_age_ratio = weight / (age + 1)
-            has_history = 1 if prev_disease_encoded > 0 else 0
-            
-            # Prepare features
-            severity_features = np.array([[
-                disease_encoded,
-                weight,
-                age,
-                temperature,
-                prev_disease_encoded,
-                temp_deviation,
-                weight_age_ratio,
-                has_history
-            ]])
-            
-            # Predict severity
-            severity_features_scaled = model_loader.severity_scaler.transform(severity_features)
-            severity_level = model_loader.severity_model.predict(severity_features_scaled)[0]
-            severity_proba = model_loader.severity_model.predict_proba(severity_features_scaled)[0]
-            severity_confidence = severity_proba[severity_level]
-            
-            severity_name = APIConfig.SEVERITY_CLASSES[severity_level]
-            
-            result['severity'] = {
-                'level': severity_name,
-                'confidence': round(float(severity_confidence), 4),
-                'probabilities': {
-                    'Mild': round(float(severity_proba[0]), 4),
-                    'Moderate': round(float(severity_proba[1]), 4),
-                    'Severe': round(float(severity_proba[2]), 4)
-                }
-            }
-            
-            # Step 3: Treatment Recommendation
-            if model_loader.treatment_model:
-                # Encode for treatment model
-                disease_encoded_treat = model_loader.treatment_encoders['Disease'].transform([detected_disease])[0]
-                
-                if previous_disease and previous_disease != 'None':
-                    try:
-                        prev_disease_encoded_treat = model_loader.treatment_encoders['Previous_Disease'].transform([previous_disease])[0]
-                    except:
-                        prev_disease_encoded_treat = 0
-                else:
-                    prev_disease_encoded_treat = 0
-                
-                severity_temp_interaction = severity_level * temp_deviation
-                
-                treatment_features = np.array([[
-                    disease_encoded_treat,
-                    severity_level,
-                    weight,
-                    age,
-                    temperature,
-                    prev_disease_encoded_treat,
-                    temp_deviation,
-                    weight_age_ratio,
-                    has_history,
-                    severity_temp_interaction
-                ]])
-                
-                # Predict treatment
-                treatment_features_scaled = model_loader.treatment_scaler.transform(treatment_features)
-                treatment_idx = model_loader.treatment_model.predict(treatment_features_scaled)[0]
-                treatment_proba = model_loader.treatment_model.predict_proba(treatment_features_scaled)[0]
-                
-                treatment_name = model_loader.treatment_encoders['Treatment'].classes_[treatment_idx]
-                treatment_confidence = treatment_proba[treatment_idx]
-                
-                # Get top 3 treatments
-                top3_indices = np.argsort(treatment_proba)[-3:][::-1]
-                top3_treatments = [
-                    {
-                        'treatment': model_loader.treatment_encoders['Treatment'].classes_[idx],
-                        'probability': round(float(treatment_proba[idx]), 4)
-                    }
-                    for idx in top3_indices
-                ]
-                
-                result['treatment'] = {
-                    'primary': treatment_name,
-                    'confidence': round(float(treatment_confidence), 4),
-                    'alternatives': top3_treatments
-                }
+        # Steps 2-3: Severity Assessment -> Treatment Recommendation
+        cases = diagnosis_cascade.ClinicalCases(
+            [detected_disease], [weight], [age], [temperature], [previous_disease]
+        )
+        result.update(diagnosis_cascade.run(severity, treatment, cases)[0])
         
         # Clean up
         os.remove(filepath)
@@ -557,8 +496,9 @@ def quick_diagnosis():
         - top3: Top 3 predictions
     """
     try:
-        if not YOLO_AVAILABLE or not model_loader.yolo_disease_model:
-            return jsonify({'error': 'YOLO model not available'}), 500
+        yolo_disease_model = model_loader.model('cattle_yolo_disease')
+        if not yolo_disease_model:
+            return model_unavailable('cattle_yolo_disease', 'YOLO model')
         
         if 'image' not in request.files:
             return jsonify({'error': 'No image uploaded'}), 400
@@ -569,12 +509,12 @@ def quick_diagnosis():
             return jsonify({'error': 'Invalid file format'}), 400
         
         # YOLO prediction
-        results = model_loader.yolo_disease_model(filepath, verbose=False)[0]
+        results = yolo_disease_model(filepath, verbose=False)[0]
         
         if hasattr(results, 'probs') and results.probs is not None:
             top_class_id = int(results.probs.top1)
             top_confidence = float(results.probs.top1conf)
-            predicted_class = model_loader.yolo_disease_model.names[top_class_id]
+            predicted_class = yolo_disease_model.names[top_class_id]
             
             # Get top 3
             top5_indices = results.probs.top5
@@ -582,7 +522,7 @@ def quick_diagnosis():
             
             top3 = []
             for i in range(min(3, len(top5_indices))):
-                cls_name = model_loader.yolo_disease_model.names[top5_indices[i]]
+                cls_name = yolo_disease_model.names[top5_indices[i]]
                 conf = float(top5_conf[i])
                 top3.append({'disease': cls_name, 'confidence': round(conf, 4)})
             
@@ -700,8 +640,9 @@ def detect_behavior_from_video():
         - count: Number of detections
     """
     try:
-        if not YOLO_AVAILABLE or not model_loader.yolo_behavior_model:
-            return jsonify({'error': 'YOLO behavior model not available'}), 500
+        yolo_behavior_model = model_loader.model('cattle_yolo_behavior')
+        if not yolo_behavior_model:
+            return model_unavailable('cattle_yolo_behavior', 'YOLO behavior model')
         
         if 'image' not in request.files:
             return jsonify({'error': 'No image uploaded'}), 400
@@ -712,14 +653,14 @@ def detect_behavior_from_video():
             return jsonify({'error': 'Invalid file format'}), 400
         
         # Run YOLO detection
-        results = model_loader.yolo_behavior_model(filepath, verbose=False)[0]
+        results = yolo_behavior_model(filepath, verbose=False)[0]
         
         behaviors = []
         if hasattr(results, 'boxes') and results.boxes is not None:
             for box in results.boxes:
                 cls_id = int(box.cls[0])
                 confidence = float(box.conf[0])
-                class_name = model_loader.yolo_behavior_model.names[cls_id]
+                class_name = yolo_behavior_model.names[cls_id]
                 
                 behaviors.append({
                     'behavior': class_name,
@@ -764,6 +705,14 @@ def analyze_video():
         detect_disease_flag = request.form.get('detect_disease', 'true').lower() == 'true'
         detect_behavior_flag = request.form.get('detect_behavior', 'true').lower() == 'true'
         
+        # Fail fast before reading the video if a requested model is not ready
+        yolo_behavior_model = model_loader.model('cattle_yolo_behavior') if detect_behavior_flag else None
+        if detect_behavior_flag and not yolo_behavior_model:
+            return model_unavailable('cattle_yolo_behavior', 'YOLO behavior model')
+        yolo_disease_model = model_loader.model('cattle_yolo_disease') if detect_disease_flag else None
+        if detect_disease_flag and not yolo_disease_model:
+            return model_unavailable('cattle_yolo_disease', 'YOLO model')
+        
         # Save video file
         video_path = save_uploaded_video(file)
         if not video_path:
@@ -788,11 +737,11 @@ def analyze_video():
             timestamp = (idx * frame_interval) / fps if fps > 0 else idx
             
             # Detect behavior
-            if detect_behavior_flag and model_loader.yolo_behavior_model:
+            if detect_behavior_flag and yolo_behavior_model:
                 try:
                     # Convert RGB to BGR for YOLO
                     frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                    results = model_loader.yolo_behavior_model(frame_bgr, verbose=False)
+                    results = yolo_behavior_model(frame_bgr, verbose=False)
                     
                     behaviors = []
                     for result in results:
@@ -831,11 +780,11 @@ def analyze_video():
                     print(f"Behavior detection error at frame {idx}: {str(e)}")
             
             # Detect disease
-            if detect_disease_flag and model_loader.yolo_disease_model:
+            if detect_disease_flag and yolo_disease_model:
                 try:
                     # Convert RGB to BGR for YOLO
                     frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                    results = model_loader.yolo_disease_model(frame_bgr, verbose=False)
+                    results = yolo_disease_model(frame_bgr, verbose=False)
                     
                     for result in results:
                         if hasattr(result, 'probs') and result.probs is not None:
@@ -934,7 +883,7 @@ def analyze_video():
 
 @app.before_request
 def load_models_once():
-    """Load models before first request"""
+    """Start background model loading on the first request (never blocks it)"""
     if not model_loader.models_loaded:
         model_loader.load_all_models()
 
@@ -963,5 +912,5 @@ if __name__ == '__main__':
     # Load models at startup
     model_loader.load_all_models()
     
-    # Run server
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Run server (the debug reloader would load every model twice)
+    app.run(host='0.0.0.0', port=5000, debug=APIConfig.DEBUG)
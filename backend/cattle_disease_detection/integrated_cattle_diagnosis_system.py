@@ -17,25 +17,24 @@ Models Used:
 
 import numpy as np
 import pandas as pd
-import joblib
+import os
+import sys
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+# The model registry is shared with the API servers and lives one directory up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import diagnosis_cascade
+from cattle_models import register_cattle_models
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 class Config:
     """System configuration"""
-    # Model paths
-    DENSENET121_PATH = 'models/DenseNet121_Disease/best_model.h5'
-    SEVERITY_MODEL_PATH = 'models/Treatment_Severity/best_model_gradient_boosting.pkl'
-    SEVERITY_SCALER_PATH = 'models/Treatment_Severity/scaler.pkl'
-    SEVERITY_ENCODERS_PATH = 'models/Treatment_Severity/label_encoders.pkl'
-    TREATMENT_MODEL_PATH = 'models/Treatment_Recommendation/best_model_gradient_boosting.pkl'
-    TREATMENT_SCALER_PATH = 'models/Treatment_Recommendation/scaler.pkl'
-    TREATMENT_ENCODERS_PATH = 'models/Treatment_Recommendation/label_encoders.pkl'
+    # Model paths: see ../cattle_models.py (absolute, shared with the API servers)
     
     # Thresholds
     YOLO_CONFIDENCE_THRESHOLD = 0.75  # Disease detection threshold
@@ -48,7 +47,7 @@ class Config:
     BEHAVIOR_MIN_DATA_POINTS = 12  # Minimum 12 data points (12 hours minimum)
     
     # Normal ranges (Sri Lankan context)
-    NORMAL_TEMP = 38.5  # °C
+    NORMAL_TEMP = diagnosis_cascade.NORMAL_TEMP  # °C
     NORMAL_TEMP_RANGE = (37.5, 39.5)
     
     # Disease detection
@@ -59,44 +58,49 @@ class Config:
 # ============================================================================
 
 class ModelLoader:
-    """Load all models once at startup"""
+    """
+    Models from the process-wide registry shared with app.py and api_server.py.
+    
+    Each artifact is loaded once per process, under the registry's per-model
+    lock, no matter which entry point (or how many concurrent callers) asks
+    for it first.
+    """
     
     def __init__(self):
-        self.models_loaded = False
-        self.densenet121 = None
-        self.severity_model = None
-        self.severity_scaler = None
-        self.severity_encoders = None
-        self.treatment_model = None
-        self.treatment_scaler = None
-        self.treatment_encoders = None
-        
+        self.registry = register_cattle_models()
+    
+    @property
+    def models_loaded(self):
+        return all(self.registry.is_available(name) for name in ('cattle_severity', 'cattle_treatment'))
+    
+    @property
+    def densenet121(self):
+        return self.registry.get('cattle_densenet')
+    
+    def bundle(self, name):
+        """Severity/treatment bundle (model, scaler, label encoders, feature names), loaded on first use"""
+        bundle = self.registry.get(name)
+        if bundle is None:
+            raise RuntimeError(f"{name} not loaded: {self.registry.model_status(name)['error']}")
+        return bundle
+    
     def load_all_models(self):
         """Load all models into memory"""
         try:
             print("🔄 Loading models...")
             
-            # Load DenseNet121 (optional - only if using)
-            try:
-                from tensorflow import keras
-                self.densenet121 = keras.models.load_model(Config.DENSENET121_PATH)
+            # DenseNet121 is optional - only if using
+            if self.densenet121 is not None:
                 print("✅ DenseNet121 loaded")
-            except Exception as e:
-                print(f"⚠️ DenseNet121 not loaded: {e}")
+            else:
+                print(f"⚠️ DenseNet121 not loaded: {self.registry.model_status('cattle_densenet')['error']}")
             
-            # Load Severity Model
-            self.severity_model = joblib.load(Config.SEVERITY_MODEL_PATH)
-            self.severity_scaler = joblib.load(Config.SEVERITY_SCALER_PATH)
-            self.severity_encoders = joblib.load(Config.SEVERITY_ENCODERS_PATH)
+            self.bundle('cattle_severity')
             print("✅ Severity model loaded")
             
-            # Load Treatment Model
-            self.treatment_model = joblib.load(Config.TREATMENT_MODEL_PATH)
-            self.treatment_scaler = joblib.load(Config.TREATMENT_SCALER_PATH)
-            self.treatment_encoders = joblib.load(Config.TREATMENT_ENCODERS_PATH)
+            self.bundle('cattle_treatment')
             print("✅ Treatment model loaded")
             
-            self.models_loaded = True
             print("✅ All models loaded successfully!\n")
             
         except Exception as e:
@@ -380,46 +384,16 @@ def assess_severity(disease, weight, age, temperature, previous_disease=None):
     print(f"⚕️ STEP 3: Severity Assessment")
     print("=" * 60)
     
-    if not MODEL_LOADER.models_loaded:
-        MODEL_LOADER.load_all_models()
-    
-    # Encode disease
-    try:
-        disease_encoded = MODEL_LOADER.severity_encoders['Disease'].transform([disease])[0]
-    except:
+    severity_bundle = MODEL_LOADER.bundle('cattle_severity')
+    if disease not in severity_bundle['encoders']['Disease'].classes_:
         print(f"⚠️ Unknown disease '{disease}', using first category")
-        disease_encoded = 0
     
-    # Encode previous disease
-    if previous_disease is None or previous_disease == 'None':
-        prev_disease_encoded = 0
-    else:
-        try:
-            prev_disease_encoded = MODEL_LOADER.severity_encoders['Previous_Disease'].transform([previous_disease])[0]
-        except:
-            prev_disease_encoded = 0
-    
-    # Create features
-    temp_deviation = temperature - Config.NORMAL_TEMP
-    weight_age_ratio = weight / (age + 1)
-    has_history = 1 if prev_disease_encoded > 0 else 0
-    
-    features = np.array([[
-        disease_encoded,
-        weight,
-        age,
-        temperature,
-        prev_disease_encoded,
-        temp_deviation,
-        weight_age_ratio,
-        has_history
-    ]])
-    
-    # Scale and predict
-    features_scaled = MODEL_LOADER.severity_scaler.transform(features)
-    severity_level = MODEL_LOADER.severity_model.predict(features_scaled)[0]
-    probabilities = MODEL_LOADER.severity_model.predict_proba(features_scaled)[0]
+    # Derive features, scale and predict (shared with the API servers)
+    cases = diagnosis_cascade.ClinicalCases([disease], [weight], [age], [temperature], [previous_disease])
+    levels, probabilities = diagnosis_cascade.assess_severity(severity_bundle, cases, unknown_disease=0)
+    severity_level, probabilities = levels[0], probabilities[0]
     confidence = probabilities[severity_level]
+    temp_deviation = cases.temp_deviation[0]
     
     # Map to name
     severity_names = {0: 'Mild', 1: 'Moderate', 2: 'Severe'}
@@ -475,57 +449,26 @@ def recommend_treatment(disease, severity, weight, age, temperature, previous_di
     print(f"💊 STEP 4: Treatment Recommendation")
     print("=" * 60)
     
-    if not MODEL_LOADER.models_loaded:
-        MODEL_LOADER.load_all_models()
-    
-    # Encode disease
-    try:
-        disease_encoded = MODEL_LOADER.treatment_encoders['Disease'].transform([disease])[0]
-    except:
+    treatment_bundle = MODEL_LOADER.bundle('cattle_treatment')
+    treatment_encoders = treatment_bundle['encoders']
+    if disease not in treatment_encoders['Disease'].classes_:
         print(f"⚠️ Unknown disease '{disease}', using first category")
-        disease_encoded = 0
     
-    # Encode previous disease
-    if previous_disease is None or previous_disease == 'None':
-        prev_disease_encoded = 0
-    else:
-        try:
-            prev_disease_encoded = MODEL_LOADER.treatment_encoders['Previous_Disease'].transform([previous_disease])[0]
-        except:
-            prev_disease_encoded = 0
-    
-    # Create features (same as training)
-    temp_deviation = temperature - Config.NORMAL_TEMP
-    weight_age_ratio = weight / (age + 1)
-    has_history = 1 if prev_disease_encoded > 0 else 0
-    severity_temp_interaction = severity * temp_deviation
-    
-    features = np.array([[
-        disease_encoded,
-        severity,
-        weight,
-        age,
-        temperature,
-        prev_disease_encoded,
-        temp_deviation,
-        weight_age_ratio,
-        has_history,
-        severity_temp_interaction
-    ]])
-    
-    # Scale and predict
-    features_scaled = MODEL_LOADER.treatment_scaler.transform(features)
-    treatment_idx = MODEL_LOADER.treatment_model.predict(features_scaled)[0]
-    probabilities = MODEL_LOADER.treatment_model.predict_proba(features_scaled)[0]
+    # Derive features (same as training), scale and predict
+    cases = diagnosis_cascade.ClinicalCases([disease], [weight], [age], [temperature], [previous_disease])
+    labels, probabilities, top = diagnosis_cascade.recommend_treatment(
+        treatment_bundle, cases, [severity], unknown_disease=0
+    )
+    treatment_idx, probabilities = labels[0], probabilities[0]
     
     # Get treatment name
-    treatment = MODEL_LOADER.treatment_encoders['Treatment'].classes_[treatment_idx]
+    treatment = treatment_encoders['Treatment'].classes_[treatment_idx]
     confidence = probabilities[treatment_idx]
     
     # Get top 3 treatments
-    top_3_idx = np.argsort(probabilities)[-3:][::-1]
+    top_3_idx = top[0]
     top_3_treatments = [
-        (MODEL_LOADER.treatment_encoders['Treatment'].classes_[idx], probabilities[idx])
+        (treatment_encoders['Treatment'].classes_[idx], probabilities[idx])
         for idx in top_3_idx
     ]
     
@@ -0,0 +1,97 @@
+"""
+Cattle Disease Models
+The cattle disease artifacts (DenseNet121, the disease and behavior YOLO
+models, and the severity/treatment bundles) registered on the process-wide
+model registry.
+
+app.py, cattle_disease_detection/api_server.py and
+cattle_disease_detection/integrated_cattle_diagnosis_system.py all call
+register_cattle_models(). Paths are absolute, so every entry point names the
+same files, and the first registration wins, so each artifact is loaded at
+most once per process whichever entry point asks for it first.
+"""
+
+import os
+
+import joblib
+
+import keras_graph
+import model_warmup
+import tree_runtime
+import vision_worker
+from artifact_cache import ARTIFACT_CACHE
+from model_registry import get_registry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BACKEND_DIR, 'cattle_disease_detection', 'models')
+
+DENSENET_MODEL = os.path.join(MODELS_DIR, 'DenseNet121_Disease', 'best_model.h5')
+YOLO_DISEASE_MODEL = os.path.join(MODELS_DIR, 'All_Cattle_Disease', 'best.pt')
+YOLO_BEHAVIOR_MODEL = os.path.join(MODELS_DIR, 'All_Behaviore', 'best.pt')
+COW_IDENTIFY_MODEL = os.path.join(BACKEND_DIR, 'cow_identify', 'best.pt')
+
+# DenseNet/YOLO models, also the table the vision worker serves:
+# name -> (service, artifact path, framework)
+VISION_MODELS = {
+    'cattle_densenet': ('cattle_disease', DENSENET_MODEL, 'tensorflow'),
+    'cattle_yolo_disease': ('cattle_disease', YOLO_DISEASE_MODEL, 'ultralytics'),
+    'cattle_yolo_behavior': ('cattle_behavior', YOLO_BEHAVIOR_MODEL, 'ultralytics'),
+    'cow_identify': ('cow_identify', COW_IDENTIFY_MODEL, 'ultralytics'),
+}
+
+# Bundles: (model, scaler, label encoders, feature names)
+SEVERITY_FILES = tuple(os.path.join(MODELS_DIR, 'Treatment_Severity', f) for f in (
+    'best_model_gradient_boosting.pkl', 'scaler.pkl', 'label_encoders.pkl', 'feature_names.txt'
+))
+TREATMENT_FILES = tuple(os.path.join(MODELS_DIR, 'Treatment_Recommendation', f) for f in (
+    'best_model_gradient_boosting.pkl', 'scaler.pkl', 'label_encoders.pkl', 'feature_names.txt'
+))
+
+CATTLE_MODELS = [
+    'cattle_densenet', 'cattle_yolo_disease', 'cattle_yolo_behavior',
+    'cattle_severity', 'cattle_treatment'
+]
+
+
+def load_bundle(model_file, scaler_file, encoders_file, features_file):
+    """Severity/treatment models are only usable with their scaler, label encoders and column order"""
+    return {
+        'model': tree_runtime.compile_model(joblib.load(model_file)),
+        'scaler': joblib.load(scaler_file),
+        'encoders': joblib.load(encoders_file),
+        'features': model_warmup.read_feature_names(features_file)
+    }
+
+
+def _register_bundle(registry, name, files):
+    model_file, scaler_file, encoders_file, features_file = files
+    registry.register(
+        name, lambda: load_bundle(model_file, scaler_file, encoders_file, features_file),
+        service='cattle_disease', paths=[model_file, scaler_file, encoders_file, features_file],
+        warmup=lambda bundle: model_warmup.warmup_bundle(bundle, bundle['features'])
+    )
+
+
+def vision_loader(name):
+    """(loader, warmup) that build a VISION_MODELS entry in the calling process"""
+    _, path, framework = VISION_MODELS[name]
+    if framework == 'tensorflow':
+        return (lambda: keras_graph.compiled(ARTIFACT_CACHE.load_keras(name, path))), model_warmup.warmup_keras
+    return (lambda: ARTIFACT_CACHE.load_yolo(name, path)), model_warmup.warmup_yolo
+
+
+def register_vision_model(registry, name):
+    """Register a VISION_MODELS entry, served by the vision worker when enabled"""
+    service, path, framework = VISION_MODELS[name]
+    loader, warmup = vision_loader(name)
+    vision_worker.register_model(registry, name, loader, service, path, framework, warmup)
+
+
+def register_cattle_models(registry=None):
+    """Register the cattle models (idempotent) and return the registry"""
+    registry = registry or get_registry()
+    for name in ('cattle_densenet', 'cattle_yolo_disease', 'cattle_yolo_behavior'):
+        register_vision_model(registry, name)
+    _register_bundle(registry, 'cattle_severity', SEVERITY_FILES)
+    _register_bundle(registry, 'cattle_treatment', TREATMENT_FILES)
+    return registry
@@ -0,0 +1,136 @@
+"""
+Severity → Treatment Cascade
+The clinical half of a cattle diagnosis, shared by app.py, the standalone
+cattle API server and the integrated diagnosis workflow: encode the disease
+and previous disease, derive temperature deviation, weight/age ratio and
+history, predict severity, add the severity × temperature interaction and
+predict treatment with its top alternatives.
+
+Cases are processed as arrays. Each stage makes one scaler.transform and one
+model call for all cases (severity/treatment bundles, cattle_models.py),
+with the features stacked in the bundle's feature_names.txt order.
+
+    cases = ClinicalCases(['Mastitis', 'FMD'], weights=[450, 380], ages=[40, 30],
+                          temperatures=[39.6, 40.2], previous_diseases=[None, 'FMD'])
+    results = run(severity_bundle, treatment_bundle, cases)
+"""
+
+import numpy as np
+
+import feature_schema
+import tree_runtime
+
+NORMAL_TEMP = 38.5
+SEVERITY_CLASSES = ['Mild', 'Moderate', 'Severe']
+TOP_TREATMENTS = 3
+
+
+def _missing(label):
+    return label is None or label in ('', 'None')
+
+
+def encode(encoder, labels, unknown=None):
+    """
+    Label codes for a column. No label (None/'None') is code 0; an unseen
+    label is `unknown`, or a ValueError if unknown is None.
+    """
+    codes = feature_schema.label_codes(encoder)
+    encoded = np.zeros(len(labels), dtype=np.float64)
+    for position, label in enumerate(labels):
+        if _missing(label):
+            continue
+        code = codes.get(label, unknown)
+        if code is None:
+            raise ValueError(f"Unknown label {label!r}, expected one of {[str(c) for c in encoder.classes_]}")
+        encoded[position] = code
+    return encoded
+
+
+class ClinicalCases:
+    """N clinical cases as arrays, with the derived features both stages use"""
+
+    def __init__(self, diseases, weights, ages, temperatures, previous_diseases=None):
+        self.diseases = list(diseases)
+        self.weight = np.asarray(weights, dtype=np.float64).reshape(-1)
+        self.age = np.asarray(ages, dtype=np.float64).reshape(-1)
+        self.temperature = np.asarray(temperatures, dtype=np.float64).reshape(-1)
+        if previous_diseases is None:
+            previous_diseases = [None] * len(self.diseases)
+        self.previous_diseases = [None if _missing(label) else label for label in previous_diseases]
+        if not (len(self.diseases) == len(self.weight) == len(self.age) == len(self.temperature)
+                == len(self.previous_diseases)):
+            raise ValueError('All clinical case columns must have the same length')
+
+        self.temp_deviation = self.temperature - NORMAL_TEMP
+        self.weight_age_ratio = self.weight / (self.age + 1)
+
+    def __len__(self):
+        return len(self.diseases)
+
+    def columns(self, encoders, unknown_disease=None):
+        """Feature columns shared by both stages, encoded with a bundle's own encoders"""
+        previous = encode(encoders['Previous_Disease'], self.previous_diseases, unknown=0)
+        return {
+            'Disease_Encoded': encode(encoders['Disease'], self.diseases, unknown_disease),
+            'Weight': self.weight,
+            'Age': self.age,
+            'Temperature': self.temperature,
+            'Previous_Disease_Encoded': previous,
+            'Temp_Deviation': self.temp_deviation,
+            'Weight_Age_Ratio': self.weight_age_ratio,
+            'Has_History': (previous > 0).astype(np.float64)
+        }
+
+
+def _predict(bundle, columns, top_k=1):
+    features = feature_schema.stack(bundle['features'], columns)
+    return tree_runtime.classify(bundle['model'], bundle['scaler'].transform(features), top_k)
+
+
+def assess_severity(bundle, cases, unknown_disease=None):
+    """Severity stage: (levels, probabilities) for all cases"""
+    levels, probabilities, _ = _predict(bundle, cases.columns(bundle['encoders'], unknown_disease))
+    return levels, probabilities
+
+
+def recommend_treatment(bundle, cases, severity_levels, top_k=TOP_TREATMENTS, unknown_disease=None):
+    """
+    Treatment stage: (treatment indices, probabilities, top-k indices) for
+    all cases; indices are into bundle['encoders']['Treatment'].classes_.
+    """
+    columns = cases.columns(bundle['encoders'], unknown_disease)
+    severity = np.asarray(severity_levels, dtype=np.float64).reshape(-1)
+    columns['Severity'] = severity
+    columns['Severity_Temp_Interaction'] = severity * cases.temp_deviation
+    return _predict(bundle, columns, top_k)
+
+
+def run(severity_bundle, treatment_bundle, cases, top_k=TOP_TREATMENTS):
+    """
+    Both stages for all cases. Returns one {'severity': ..., 'treatment': ...}
+    per case, shaped like the /api/disease/analyze response ('treatment' only
+    when a treatment bundle is given).
+    """
+    levels, severity_proba = assess_severity(severity_bundle, cases)
+    results = [{
+        'severity': {
+            'level': SEVERITY_CLASSES[level],
+            'confidence': round(float(proba[level]), 4),
+            'probabilities': {name: round(float(p), 4) for name, p in zip(SEVERITY_CLASSES, proba)}
+        }
+    } for level, proba in zip(levels, severity_proba)]
+    if treatment_bundle is None:
+        return results
+
+    treatments, treatment_proba, top = recommend_treatment(treatment_bundle, cases, levels, top_k)
+    names = treatment_bundle['encoders']['Treatment'].classes_
+    for result, treatment, proba, alternatives in zip(results, treatments, treatment_proba, top):
+        result['treatment'] = {
+            'primary': names[treatment],
+            'confidence': round(float(proba[treatment]), 4),
+            'alternatives': [
+                {'treatment': names[index], 'probability': round(float(proba[index]), 4)}
+                for index in alternatives
+            ]
+        }
+    return results
@@ -0,0 +1,185 @@
+"""
+Egg Hatch Ensemble
+Egg hatch probability from the neural network (scaler + egg_hatch_nn), the
+random forest pipeline (egg_hatch_rf, which scales its own input) or both.
+In ensemble mode the RF scores the batch on a worker thread while the NN
+scores it on the request thread, and the two probabilities are combined:
+
+    mean       (nn + rf) / 2
+    weighted   w * nn + (1 - w) * rf, w = SMART_FARM_EGG_HATCH_NN_WEIGHT
+    min / max  the more pessimistic / optimistic of the two
+
+Each call reports both probabilities and each model's latency. Under load
+(SMART_FARM_EGG_HATCH_SHED_AT or more egg hatch predictions already running) only
+the cheaper model runs, the one with the lower recent latency.
+
+Configuration:
+    SMART_FARM_EGG_HATCH_MODE        nn (default) | rf | ensemble; ?mode= overrides per request
+    SMART_FARM_EGG_HATCH_COMBINE     mean (default) | weighted | min | max
+    SMART_FARM_EGG_HATCH_NN_WEIGHT   NN weight for "weighted" (default 0.5)
+    SMART_FARM_EGG_HATCH_SHED_AT     predictions in flight at which ensemble requests shed
+                                     to one model (default 4, 0 = never shed)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import feature_schema
+
+MODE_ENV = 'SMART_FARM_EGG_HATCH_MODE'
+COMBINE_ENV = 'SMART_FARM_EGG_HATCH_COMBINE'
+NN_WEIGHT_ENV = 'SMART_FARM_EGG_HATCH_NN_WEIGHT'
+SHED_AT_ENV = 'SMART_FARM_EGG_HATCH_SHED_AT'
+
+MODES = ('nn', 'rf', 'ensemble')
+DEFAULT_SHED_AT = 4
+# Weight of the newest call in the running latency average
+LATENCY_SMOOTHING = 0.2
+
+COMBINE_RULES = {
+    'mean': lambda nn, rf, weight: (nn + rf) / 2,
+    'weighted': lambda nn, rf, weight: weight * nn + (1 - weight) * rf,
+    'min': lambda nn, rf, weight: np.minimum(nn, rf),
+    'max': lambda nn, rf, weight: np.maximum(nn, rf)
+}
+
+
+class ModelUnavailable(RuntimeError):
+    """A model the requested mode needs is not loaded"""
+
+
+class EggHatchEnsemble:
+    """NN / RF / combined egg hatch probabilities for a batch of feature rows"""
+
+    def __init__(self, registry, columns):
+        self.registry = registry
+        self.columns = list(columns)
+        self.combine = os.environ.get(COMBINE_ENV, 'mean')
+        if self.combine not in COMBINE_RULES:
+            raise ValueError(f"{COMBINE_ENV} must be one of {sorted(COMBINE_RULES)}, got {self.combine!r}")
+        self.nn_weight = float(os.environ.get(NN_WEIGHT_ENV, 0.5))
+        self.shed_at = int(os.environ.get(SHED_AT_ENV, DEFAULT_SHED_AT))
+        self.latency_ms = {}
+        self.in_flight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                            thread_name_prefix='egg-hatch-rf')
+
+    def default_mode(self):
+        mode = os.environ.get(MODE_ENV, 'nn')
+        return mode if mode in MODES else 'nn'
+
+    def required_models(self, mode=None):
+        mode = mode or self.default_mode()
+        names = []
+        if mode in ('nn', 'ensemble'):
+            names += ['egg_hatch_scaler', 'egg_hatch_nn']
+        if mode in ('rf', 'ensemble'):
+            names.append('egg_hatch_rf')
+        return names
+
+    def cheaper(self):
+        """The model with the lower recent latency (the NN until both have been timed)"""
+        with self._lock:
+            nn, rf = self.latency_ms.get('nn'), self.latency_ms.get('rf')
+        return 'rf' if nn is not None and rf is not None and rf < nn else 'nn'
+
+    def choose_mode(self, requested=None):
+        """(mode to run, shed): the requested or default mode, one model if overloaded"""
+        mode = requested or self.default_mode()
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {list(MODES)}, got {mode!r}")
+        if mode == 'ensemble' and self.shed_at and self.in_flight >= self.shed_at:
+            with self._lock:
+                self.shed += 1
+            return self.cheaper(), True
+        return mode, False
+
+    # ---------- Models ----------
+    def _ordered(self, rows, model):
+        order = [self.columns.index(column) for column in feature_schema.columns_for(model, self.columns)]
+        return rows[:, order]
+
+    def _nn(self, scaler, nn, rows):
+        return np.asarray(nn.predict(scaler.transform(self._ordered(rows, scaler)), verbose=0),
+                          dtype=np.float64)[:, 0]
+
+    def _rf(self, rf, rows):
+        proba = rf.predict_proba(self._ordered(rows, rf))
+        return np.asarray(proba[:, list(rf.classes_).index(1)], dtype=np.float64)
+
+    def _timed(self, name, function, *args):
+        start = time.perf_counter()
+        probabilities = function(*args)
+        latency = (time.perf_counter() - start) * 1000
+        with self._lock:
+            previous = self.latency_ms.get(name)
+            self.latency_ms[name] = latency if previous is None else (
+                (1 - LATENCY_SMOOTHING) * previous + LATENCY_SMOOTHING * latency)
+        return probabilities, latency
+
+    def models(self, mode):
+        """({name: model}, {name: generation}) for the mode, leased for the request"""
+        models, generations = {}, {}
+        for name in self.required_models(mode):
+            models[name], generations[name] = self.registry.get_versioned(name)
+        missing = [name for name, model in models.items() if model is None]
+        if missing:
+            raise ModelUnavailable(f"Egg hatch model not loaded: {', '.join(missing)}")
+        return models, generations
+
+    def predict(self, rows, mode, models=None):
+        """
+        Probabilities for feature rows (self.columns order) with the given mode
+        (from choose_mode) and its models (from models(), fetched if not given).
+        Returns {'probability': array, 'models': {name: {'probability': array,
+        'latency_ms': float}}, 'mode', 'combine'}.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        if models is None:
+            # Fetched on the request thread, so they are leased for the request
+            models = self.models(mode)[0]
+        with self._lock:
+            self.in_flight += 1
+        try:
+            results = {}
+            if mode == 'ensemble':
+                rf_future = self._executor.submit(self._timed, 'rf', self._rf, models['egg_hatch_rf'], rows)
+                results['nn'] = self._timed('nn', self._nn, models['egg_hatch_scaler'], models['egg_hatch_nn'], rows)
+                results['rf'] = rf_future.result()
+            elif mode == 'rf':
+                results['rf'] = self._timed('rf', self._rf, models['egg_hatch_rf'], rows)
+            else:
+                results['nn'] = self._timed('nn', self._nn, models['egg_hatch_scaler'], models['egg_hatch_nn'], rows)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        if mode == 'ensemble':
+            probability = COMBINE_RULES[self.combine](results['nn'][0], results['rf'][0], self.nn_weight)
+        else:
+            probability = results[mode][0]
+        return {
+            'probability': np.clip(probability, 0.0, 1.0),
+            'models': {name: {'probability': probabilities, 'latency_ms': round(latency, 3)}
+                       for name, (probabilities, latency) in results.items()},
+            'mode': mode,
+            'combine': self.combine if mode == 'ensemble' else None
+        }
+
+    def status(self):
+        with self._lock:
+            return {
+                'default_mode': self.default_mode(),
+                'combine': self.combine,
+                'nn_weight': self.nn_weight if self.combine == 'weighted' else None,
+                'shed_at': self.shed_at,
+                'in_flight': self.in_flight,
+                'shed_total': self.shed,
+                'latency_ms': {name: round(value, 3) for name, value in self.latency_ms.items()}
+            }
@@ -0,0 +1,109 @@
+"""
+Feature Schema
+Single-row inference for the numeric tabular models without building a
+pandas DataFrame per request. A RowBuilder is compiled once per service from
+the model's training column order (feature_names_in_) and an input mapping,
+and fills a preallocated per-thread buffer directly. stack() does the same
+for a batch of column arrays (the severity/treatment cascade).
+
+    columns = feature_schema.columns_for(model, fallback=EGG_HATCH_FEATURES)
+    row = feature_schema.builder("egg_hatch", columns).fill(data)
+    model.predict(row)
+
+The mapping says where each column comes from: a request key, a callable
+taking the record, or (by default) the column name itself. Compiling fails
+if a column has no mapping, so the filled row always has every training
+column, in training order.
+
+The buffer is reused by the next fill on the same thread: pass it straight to
+the model and don't keep it. Pipelines that one-hot encode string columns by
+name (nutrition) still need a DataFrame.
+"""
+
+import threading
+
+import numpy as np
+
+_builders = {}
+_builders_lock = threading.Lock()
+
+
+def columns_for(model, fallback=None):
+    """Training column order: the model's feature_names_in_, else the fallback list"""
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None:
+        return [str(name) for name in names]
+    if fallback is None:
+        raise ValueError(f"{type(model).__name__} has no feature_names_in_ and no fallback column list")
+    return list(fallback)
+
+
+def label_codes(encoder):
+    """LabelEncoder classes -> codes, without a transform() call per request"""
+    return {label: code for code, label in enumerate(encoder.classes_)}
+
+
+def _getter(column, source):
+    if callable(source):
+        return source
+    key = column if source is None else source
+
+    def get(record):
+        if key not in record:
+            raise KeyError(f"missing field '{key}'")
+        return float(record[key])
+    return get
+
+
+class RowBuilder:
+    """Compiled column mapping that fills a reusable (1, n_features) array"""
+
+    def __init__(self, name, columns, mapping=None, dtype=np.float32):
+        self.name = name
+        self.columns = tuple(columns)
+        self.dtype = np.dtype(dtype)
+        mapping = mapping or {}
+        if mapping:
+            unmapped = [column for column in self.columns if column not in mapping]
+            if unmapped:
+                raise ValueError(f"{name}: no input mapped for columns {unmapped}")
+        self._getters = [_getter(column, mapping.get(column)) for column in self.columns]
+        self._local = threading.local()
+
+    def buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.columns)), dtype=self.dtype)
+        return buffer
+
+    def fill(self, record):
+        """The row for one record, in training column order"""
+        buffer = self.buffer()
+        row = buffer[0]
+        for position, get in enumerate(self._getters):
+            row[position] = get(record)
+        return buffer
+
+
+def builder(name, columns, mapping=None, dtype=np.float32):
+    """
+    Compiled RowBuilder for a service, reused while the columns stay the same
+    (a reloaded model with a different column order compiles a new one).
+    The mapping must not change between calls for the same name.
+    """
+    key = (name, tuple(columns), np.dtype(dtype))
+    row_builder = _builders.get(key)
+    if row_builder is None:
+        with _builders_lock:
+            row_builder = _builders.get(key)
+            if row_builder is None:
+                row_builder = _builders[key] = RowBuilder(name, columns, mapping, dtype)
+    return row_builder
+
+
+def stack(columns, values, dtype=np.float64):
+    """Rows for a batch from {column: array of values}, in training column order"""
+    missing = [column for column in columns if column not in values]
+    if missing:
+        raise KeyError(f"no values for columns {missing}")
+    return np.column_stack([np.asarray(values[column], dtype=dtype) for column in columns])
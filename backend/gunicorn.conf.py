@@ -0,0 +1,93 @@
+"""
+Production launcher for the unified backend.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master imports app.py once and preloads only fork-safe artifacts
+(sklearn/joblib models and NumPy-served MLPs listed in SMART_FARM_PRELOAD).
+Workers are forked from it and share those weights copy-on-write; TensorFlow
+and YOLO models are loaded inside each worker. Every worker's BLAS/OpenMP and
+TF/torch thread pools get an equal share of the cores.
+
+Configuration:
+    SMART_FARM_WORKERS          worker processes (default: number of cores)
+    SMART_FARM_WORKER_THREADS   request threads per worker (default 2)
+    SMART_FARM_BIND             listen address (default 0.0.0.0:5000)
+    SMART_FARM_TIMEOUT          request timeout in seconds (default 300, video analysis is slow)
+
+With SMART_FARM_VISION_WORKER=1 the vision worker (vision_worker.py) is
+started next to the master and owns DenseNet121 and the YOLO models.
+"""
+
+import gc
+import os
+import secrets
+import subprocess
+import sys
+
+# Read by the model registry when app.py is imported in the master
+os.environ.setdefault("SMART_FARM_FORK_SAFE_PRELOAD", "1")
+
+_cores = os.cpu_count() or 1
+
+bind = os.environ.get("SMART_FARM_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("SMART_FARM_WORKERS", _cores))
+# The actual count, for code that only works in a single worker (incubator_stream.py)
+os.environ["SMART_FARM_WORKERS"] = str(workers)
+
+# Split the cores between workers. This file is read before preload_app imports
+# app.py (and with it numpy/sklearn), which matters for the BLAS/OpenMP pools:
+# they read their variables once, at import, and workers inherit the master's.
+# The SMART_FARM_* values are read later, when TF/torch are imported in a
+# worker, and by thread_config.configure_sklearn() (threadpoolctl) in each worker.
+_per_worker = str(max(1, _cores // workers))
+for _name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+              "SMART_FARM_TF_INTRA_OP_THREADS", "SMART_FARM_TORCH_THREADS", "SMART_FARM_SKLEARN_THREADS"):
+    os.environ.setdefault(_name, _per_worker)
+os.environ.setdefault("SMART_FARM_TF_INTER_OP_THREADS", "1")
+worker_class = "gthread"
+threads = int(os.environ.get("SMART_FARM_WORKER_THREADS", 2))
+timeout = int(os.environ.get("SMART_FARM_TIMEOUT", 300))
+preload_app = True
+accesslog = "-"
+
+
+_vision_process = None
+
+
+def on_starting(server):
+    global _vision_process
+    import vision_worker
+    if vision_worker.enabled():
+        # A fresh secret per launch, inherited by the vision worker and the forked web workers
+        os.environ.setdefault(vision_worker.AUTHKEY_ENV, secrets.token_hex(32))
+        _vision_process = subprocess.Popen(
+            [sys.executable, "vision_worker.py"], cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        server.log.info("Started vision worker (pid %s)", _vision_process.pid)
+
+
+def on_exit(server):
+    if _vision_process is not None:
+        _vision_process.terminate()
+        _vision_process.wait(timeout=30)
+
+
+def when_ready(server):
+    # Everything allocated while preloading is moved to a permanent generation,
+    # so the garbage collector never writes to (and un-shares) those pages
+    gc.collect()
+    gc.freeze()
+    server.log.info("Froze %d objects before forking %d workers", gc.get_freeze_count(), workers)
+
+
+def post_worker_init(worker):
+    import app
+    from model_registry import process_memory
+
+    app.model_registry.start_worker()
+    memory = process_memory()
+    worker.log.info(
+        "Worker %s ready: %s MB private, %s MB shared with the master (PSS %s MB)",
+        memory["pid"], memory.get("private_mb"), memory.get("shared_mb"), memory.get("pss_mb")
+    )
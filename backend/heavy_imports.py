@@ -0,0 +1,81 @@
+"""
+Deferred Heavy Imports
+TensorFlow, Ultralytics, OpenCV and Pillow are imported only when a model or
+helper that needs them is first used, so workers serving tabular endpoints
+never pay their import cost.
+
+Thread pools are sized on first import (thread_config.py), so each forked
+worker of the gunicorn launcher gets its share of the cores.
+"""
+
+import importlib
+import threading
+import time
+
+import thread_config
+
+# Seconds spent importing each heavy framework (filled on first import)
+IMPORT_TIMES = {}
+
+_import_lock = threading.Lock()
+
+
+def _configure_tensorflow(tf):
+    thread_config.configure_tensorflow(tf)
+
+
+def _configure_torch(_ultralytics):
+    thread_config.configure_torch()
+
+
+_CONFIGURE = {
+    'tensorflow': _configure_tensorflow,
+    'ultralytics': _configure_torch
+}
+
+
+def _import(module_name):
+    """Import a module once and record how long the first import took"""
+    if module_name in IMPORT_TIMES:
+        return importlib.import_module(module_name)
+    with _import_lock:
+        if module_name not in IMPORT_TIMES:
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            if module_name in _CONFIGURE:
+                _CONFIGURE[module_name](module)
+            IMPORT_TIMES[module_name] = time.perf_counter() - start
+            print(f"⏱️ Imported {module_name} in {IMPORT_TIMES[module_name]:.2f}s")
+            return module
+    return importlib.import_module(module_name)
+
+
+def tensorflow():
+    return _import('tensorflow')
+
+
+def keras():
+    return tensorflow().keras
+
+
+def keras_backend():
+    return keras().backend
+
+
+def keras_image():
+    """tensorflow.keras.preprocessing.image"""
+    return keras().preprocessing.image
+
+
+def yolo():
+    """The ultralytics YOLO class"""
+    return _import('ultralytics').YOLO
+
+
+def cv2():
+    return _import('cv2')
+
+
+def pil_image():
+    """PIL.Image"""
+    return _import('PIL.Image')
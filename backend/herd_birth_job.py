@@ -0,0 +1,203 @@
+"""
+Herd Birth Forecast Job
+Scores a whole herd sheet (shaped like animal_birth/dataset_animal.xlsx) with
+the animal birth model and writes the "birth within 2 days" watchlist, in
+one vectorized predict instead of an /animal-birth/predict call per cow.
+
+The sheet is parsed once and cached as NumPy columns (.npz), reused until the
+sheet file changes. Predictions are kept between runs keyed by a hash of
+each row's model inputs, so a daily run only scores rows that are new or
+changed; replacing the model rescores everything.
+
+clf.pkl is a classifier (1 = birth within 2 days, see animal_birth.ipynb):
+its class 1 rows are the watchlist, with the class probability. A
+days-to-birth regressor works too; then the watchlist is days <= 2.
+
+Configuration:
+    SMART_FARM_HERD_CACHE_DIR=path   sheet/prediction cache (default backend/.herd_cache)
+
+Usage:
+    python herd_birth_job.py animal_birth/dataset_animal.xlsx
+    python herd_birth_job.py herd.xlsx --watchlist watchlist.csv
+    python herd_birth_job.py herd.xlsx --full          # ignore earlier predictions
+"""
+
+import argparse
+import hashlib
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import tree_runtime
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(BACKEND_DIR, 'animal_birth', 'clf.pkl')
+CACHE_DIR_ENV = 'SMART_FARM_HERD_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join(BACKEND_DIR, '.herd_cache')
+
+ID_COLUMN = 'Cow_ID'
+# Training columns, in training order (animal_birth.ipynb)
+HERD_FEATURES = ['Age_Months', 'Parity', 'Body_Temp_C', 'Milk_Yield_kg', 'Weight_kg']
+WATCH_DAYS = 2
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def cache_path(cache_dir, sheet_path, kind):
+    stem = os.path.splitext(os.path.basename(sheet_path))[0]
+    digest = hashlib.sha256(os.path.abspath(sheet_path).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{stem}-{digest}.{kind}.npz")
+
+
+def _save_npz(path, **arrays):
+    # Written next to the target and renamed, so a crashed run leaves no half file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _load_npz(path):
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+    except (OSError, ValueError):
+        return None
+
+
+# ==================== Herd Sheet ====================
+def load_herd(sheet_path, cache_dir):
+    """
+    (cow ids, feature matrix in HERD_FEATURES order, source) for a herd
+    sheet; source is 'cache' when the columns came from the .npz cache.
+    """
+    signature = file_signature(sheet_path)
+    path = cache_path(cache_dir, sheet_path, 'columns')
+    cached = _load_npz(path)
+    if cached is not None and str(cached['signature']) == signature:
+        return cached['ids'], cached['features'], 'cache'
+
+    if sheet_path.lower().endswith('.csv'):
+        frame = pd.read_csv(sheet_path)
+    else:
+        frame = pd.read_excel(sheet_path)
+    missing = [column for column in [ID_COLUMN] + HERD_FEATURES if column not in frame.columns]
+    if missing:
+        raise ValueError(f"{sheet_path}: missing columns {missing}")
+    ids = frame[ID_COLUMN].astype(str).to_numpy(dtype=str)
+    features = frame[HERD_FEATURES].to_numpy(dtype=np.float64)
+    _save_npz(path, signature=np.array(signature), ids=ids, features=features)
+    return ids, features, 'sheet'
+
+
+def row_hashes(features):
+    """Hash of each row's model inputs"""
+    rows = np.ascontiguousarray(features, dtype=np.float64)
+    return np.array([hashlib.blake2b(row.tobytes(), digest_size=8).hexdigest() for row in rows])
+
+
+# ==================== Scoring ====================
+def is_classifier(model):
+    return hasattr(model, 'classes_')
+
+
+def score(model, features, columns=HERD_FEATURES):
+    """
+    (predictions, probability of class 1 or NaN) for a feature matrix; with
+    columns=None the matrix goes to the model as is.
+    """
+    frame = features if columns is None else pd.DataFrame(features, columns=columns)
+    if is_classifier(model) and hasattr(model, 'predict_proba'):
+        proba = model.predict_proba(frame)
+        classes = list(model.classes_)
+        predictions = np.asarray(classes, dtype=np.float64)[np.argmax(proba, axis=1)]
+        positive = proba[:, classes.index(1)] if 1 in classes else np.full(len(frame), np.nan)
+        return predictions, positive
+    return np.asarray(model.predict(frame), dtype=np.float64), np.full(len(frame), np.nan)
+
+
+def on_watchlist(model, predictions):
+    if is_classifier(model):
+        return predictions == 1
+    return predictions <= WATCH_DAYS
+
+
+def run(sheet_path, model_path=DEFAULT_MODEL, cache_dir=None, full=False):
+    """
+    Score the herd, reusing the previous run's predictions for unchanged rows.
+    Returns a summary dict and the watchlist DataFrame.
+    """
+    cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+    start = time.perf_counter()
+    ids, features, source = load_herd(sheet_path, cache_dir)
+    load_seconds = time.perf_counter() - start
+
+    model = tree_runtime.compile_model(joblib.load(model_path))
+    model_signature = f"{os.path.abspath(model_path)}:{file_signature(model_path)}"
+    hashes = row_hashes(features)
+
+    predictions = np.full(len(ids), np.nan)
+    probabilities = np.full(len(ids), np.nan)
+    state_path = cache_path(cache_dir, sheet_path, 'predictions')
+    previous = None if full else _load_npz(state_path)
+    if previous is not None and str(previous['model']) == model_signature:
+        known = {key: position for position, key in enumerate(previous['hashes'])}
+        for position, key in enumerate(hashes):
+            old = known.get(key)
+            if old is not None:
+                predictions[position] = previous['predictions'][old]
+                probabilities[position] = previous['probabilities'][old]
+
+    stale = np.flatnonzero(np.isnan(predictions))
+    step = time.perf_counter()
+    if len(stale):
+        predictions[stale], probabilities[stale] = score(model, features[stale])
+    score_seconds = time.perf_counter() - step
+    _save_npz(state_path, model=np.array(model_signature), hashes=hashes,
+              predictions=predictions, probabilities=probabilities)
+
+    watch = on_watchlist(model, predictions)
+    watchlist = pd.DataFrame(features[watch], columns=HERD_FEATURES)
+    watchlist.insert(0, ID_COLUMN, ids[watch])
+    if is_classifier(model):
+        watchlist['Birth_Probability'] = np.round(probabilities[watch], 3)
+    else:
+        watchlist['Estimated_Days_to_Birth'] = np.round(predictions[watch], 1)
+
+    summary = {
+        'rows': len(ids),
+        'sheet_source': source,
+        'rescored': len(stale),
+        'reused': len(ids) - len(stale),
+        'watchlist': int(watch.sum()),
+        'load_seconds': round(load_seconds, 3),
+        'score_seconds': round(score_seconds, 3),
+        'total_seconds': round(time.perf_counter() - start, 3)
+    }
+    return summary, watchlist
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Birth-within-2-days watchlist for a herd sheet")
+    parser.add_argument('sheet', help="herd .xlsx (or .csv) with Cow_ID and the model's feature columns")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--cache-dir', help=f"default ${CACHE_DIR_ENV} or {DEFAULT_CACHE_DIR}")
+    parser.add_argument('--watchlist', help="write the watchlist to this .csv (default: print it)")
+    parser.add_argument('--full', action='store_true', help="rescore every row")
+    args = parser.parse_args()
+
+    summary, watchlist = run(args.sheet, args.model, args.cache_dir, full=args.full)
+    print(f"✓ {summary['rows']} animals (sheet from {summary['sheet_source']} in {summary['load_seconds']}s), "
+          f"{summary['rescored']} scored in {summary['score_seconds']}s, {summary['reused']} unchanged")
+    print(f"⚠️ {summary['watchlist']} expected to give birth within {WATCH_DAYS} days")
+    if args.watchlist:
+        watchlist.to_csv(args.watchlist, index=False)
+        print(f"✓ Watchlist written to {args.watchlist}")
+    else:
+        print(watchlist.to_string(index=False))
@@ -0,0 +1,352 @@
+"""
+Incubator Telemetry Stream
+Streaming egg hatch scoring for incubators that report sensor readings every
+few seconds for many trays. Readings arrive as NDJSON, one object per line:
+
+    {"tray_id": "A-12", "Temperature": 37.6, "Humidity": 55.2}
+    {"tray_id": "A-13", "Egg_Weight": 58.1, "Egg_Turning_Frequency": 24, "Incubation_Duration": 12}
+
+A reading may carry any subset of the egg hatch features; the latest value
+of each is kept per tray. Ingestion only updates that state. A scorer thread
+rescores, on a fixed cadence, the trays that changed since the last pass and
+have every feature, as one micro-batch through egg_hatch_scaler and the NN.
+When a tray's hatch probability falls below the threshold an alert is
+published (once, until the tray recovers) to the recent-alerts list and to
+every SSE subscriber.
+
+Memory is bounded: tray state is a fixed-size array (the least recently
+updated tray is dropped when a new one needs a slot), and the alert history
+and each subscriber's queue have fixed lengths (a slow subscriber loses its
+oldest alerts).
+
+Tray state, the scorer and the subscribers live in one process, so the
+stream only runs in a single-worker deployment (SMART_FARM_WORKERS=1, set by
+gunicorn.conf.py); with several workers the endpoints answer 503. Run a
+dedicated one-worker service for telemetry next to the multi-worker API.
+Each SSE subscriber holds a request thread for as long as it is connected,
+so subscribers are capped below the worker's thread count and extra ones get
+a 503.
+
+Configuration:
+    SMART_FARM_INCUBATOR_MAX_TRAYS         trays kept in memory (default 2000)
+    SMART_FARM_INCUBATOR_INTERVAL          seconds between scoring passes (default 5)
+    SMART_FARM_HATCH_ALERT_THRESHOLD       alert below this probability (default 0.5)
+    SMART_FARM_INCUBATOR_MAX_SUBSCRIBERS   open alert streams (default: request threads - 1)
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+import feature_schema
+
+MAX_TRAYS_ENV = 'SMART_FARM_INCUBATOR_MAX_TRAYS'
+INTERVAL_ENV = 'SMART_FARM_INCUBATOR_INTERVAL'
+THRESHOLD_ENV = 'SMART_FARM_HATCH_ALERT_THRESHOLD'
+MAX_SUBSCRIBERS_ENV = 'SMART_FARM_INCUBATOR_MAX_SUBSCRIBERS'
+WORKERS_ENV = 'SMART_FARM_WORKERS'
+WORKER_THREADS_ENV = 'SMART_FARM_WORKER_THREADS'
+
+DEFAULT_MAX_TRAYS = 2000
+DEFAULT_INTERVAL = 5.0
+DEFAULT_THRESHOLD = 0.5
+ALERT_HISTORY = 200
+SUBSCRIBER_QUEUE = 100
+HEARTBEAT_SECONDS = 15.0
+
+
+class StreamUnavailable(RuntimeError):
+    """The stream can't serve this request (multi-worker deployment, subscriber cap)"""
+
+
+def default_max_subscribers():
+    # Leave one request thread (gunicorn.conf.py default: 2) for the other endpoints
+    return max(1, int(os.environ.get(WORKER_THREADS_ENV, 2)) - 1)
+
+
+# ==================== Tray State ====================
+class TrayState:
+    """Latest features, probability and alert flag per tray, in fixed-size arrays"""
+
+    def __init__(self, columns, max_trays):
+        self.columns = list(columns)
+        self.max_trays = max_trays
+        self.features = np.full((max_trays, len(self.columns)), np.nan)
+        self.updated = np.zeros(max_trays)
+        self.scored = np.zeros(max_trays)
+        self.dirty = np.zeros(max_trays, dtype=bool)
+        self.probability = np.full(max_trays, np.nan)
+        self.alerting = np.zeros(max_trays, dtype=bool)
+        self.ids = [None] * max_trays
+        self.slots = {}
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def _slot(self, tray_id):
+        slot = self.slots.get(tray_id)
+        if slot is not None:
+            return slot
+        if len(self.slots) < self.max_trays:
+            slot = len(self.slots)
+        else:
+            # Full: reuse the slot of the tray that reported least recently
+            slot = int(np.argmin(self.updated))
+            del self.slots[self.ids[slot]]
+            self.evicted += 1
+        self.slots[tray_id] = slot
+        self.ids[slot] = tray_id
+        self.features[slot] = np.nan
+        self.probability[slot] = np.nan
+        self.alerting[slot] = False
+        self.scored[slot] = 0
+        return slot
+
+    def update(self, tray_id, values):
+        """Merge one reading ({column: value}) into the tray's state"""
+        with self.lock:
+            slot = self._slot(tray_id)
+            for position, column in enumerate(self.columns):
+                if column in values:
+                    self.features[slot, position] = values[column]
+            self.updated[slot] = time.time()
+            self.dirty[slot] = True
+
+    def take_pending(self):
+        """(slots, feature rows) of complete trays changed since the last pass; clears their flag"""
+        with self.lock:
+            slots = np.flatnonzero(self.dirty & ~np.isnan(self.features).any(axis=1))
+            self.dirty[slots] = False
+            return slots, self.features[slots].copy(), [self.ids[slot] for slot in slots]
+
+    def mark_dirty(self, tray_ids):
+        with self.lock:
+            for tray_id in tray_ids:
+                slot = self.slots.get(tray_id)
+                if slot is not None:
+                    self.dirty[slot] = True
+
+    def describe(self, tray_id):
+        with self.lock:
+            slot = self.slots.get(tray_id)
+            if slot is None:
+                return None
+            probability = self.probability[slot]
+            return {
+                'tray_id': tray_id,
+                'features': {column: (None if np.isnan(value) else float(value))
+                             for column, value in zip(self.columns, self.features[slot])},
+                'hatch_probability': None if np.isnan(probability) else round(float(probability), 4),
+                'alerting': bool(self.alerting[slot]),
+                'pending': bool(self.dirty[slot]),
+                'updated_at': datetime.fromtimestamp(self.updated[slot]).isoformat(),
+                'scored_at': datetime.fromtimestamp(self.scored[slot]).isoformat() if self.scored[slot] else None
+            }
+
+
+# ==================== Stream ====================
+def parse_reading(line, columns):
+    """(tray_id, {column: value}) from one NDJSON line"""
+    reading = json.loads(line)
+    if not isinstance(reading, dict):
+        raise ValueError('reading must be an object')
+    tray_id = reading.get('tray_id')
+    if isinstance(tray_id, bool) or not isinstance(tray_id, (str, int)) or tray_id == '':
+        raise ValueError("missing field 'tray_id'")
+    values = {}
+    for column in columns:
+        if column in reading:
+            value = reading[column]
+            try:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise TypeError
+                number = float(value)  # OverflowError for integers beyond float range
+            except (OverflowError, TypeError, ValueError):
+                number = None
+            if number is None or not np.isfinite(number):
+                raise ValueError(f"field '{column}' must be a number, got {value!r}")
+            values[column] = number
+    if not values:
+        raise ValueError(f"reading has none of {columns}")
+    return str(tray_id), values
+
+
+class IncubatorStream:
+    """Tray state, the micro-batch scorer thread and alert fan-out"""
+
+    def __init__(self, registry, columns, max_trays=None, interval=None, threshold=None,
+                 scaler_name='egg_hatch_scaler', model_name='egg_hatch_nn', max_subscribers=None):
+        self.registry = registry
+        self.columns = list(columns)
+        self.trays = TrayState(self.columns, max_trays or int(os.environ.get(MAX_TRAYS_ENV, DEFAULT_MAX_TRAYS)))
+        self.interval = interval or float(os.environ.get(INTERVAL_ENV, DEFAULT_INTERVAL))
+        self.threshold = threshold if threshold is not None else float(
+            os.environ.get(THRESHOLD_ENV, DEFAULT_THRESHOLD))
+        self.scaler_name = scaler_name
+        self.model_name = model_name
+        self.max_subscribers = max_subscribers or int(
+            os.environ.get(MAX_SUBSCRIBERS_ENV, default_max_subscribers()))
+        self.alerts = deque(maxlen=ALERT_HISTORY)
+        self.subscribers = set()
+        self.readings = 0
+        self.passes = 0
+        self.scored = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def check_available(self):
+        """Raise StreamUnavailable unless this process is the only worker"""
+        workers = int(os.environ.get(WORKERS_ENV, 1))
+        if workers > 1:
+            raise StreamUnavailable(
+                f"Incubator telemetry needs a single-worker deployment ({WORKERS_ENV}=1), "
+                f"this one runs {workers}: tray state and alerts are kept per process"
+            )
+
+    def ingest(self, lines):
+        """Apply NDJSON lines; returns (accepted count, [{'line': n, 'error': ...}])"""
+        accepted, rejected = 0, []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                tray_id, values = parse_reading(line, self.columns)
+            except ValueError as e:
+                rejected.append({'line': number, 'error': str(e)})
+                continue
+            self.trays.update(tray_id, values)
+            accepted += 1
+        with self._lock:
+            self.readings += accepted
+        self.start()
+        return accepted, rejected
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='incubator-scorer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.score_pending()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Incubator scoring failed: {e}")
+
+    def score_pending(self):
+        """One micro-batch: rescore changed trays and publish alerts. Returns the alerts."""
+        slots, rows, tray_ids = self.trays.take_pending()
+        if not len(slots):
+            return []
+        try:
+            with self.registry.use(self.scaler_name) as scaler, self.registry.use(self.model_name) as model:
+                if scaler is None or model is None:
+                    raise RuntimeError('Egg hatch model not loaded')
+                order = [self.columns.index(column) for column in feature_schema.columns_for(scaler, self.columns)]
+                probabilities = np.asarray(
+                    model.predict(scaler.transform(rows[:, order]), verbose=0), dtype=np.float64
+                )[:, 0]
+        except Exception:
+            # Retried on the next pass
+            self.trays.mark_dirty(tray_ids)
+            raise
+
+        now = time.time()
+        alerts = []
+        with self.trays.lock:
+            for slot, tray_id, probability in zip(slots, tray_ids, probabilities):
+                if self.trays.ids[slot] != tray_id:
+                    continue  # slot reused while scoring
+                self.trays.probability[slot] = probability
+                self.trays.scored[slot] = now
+                low = probability < self.threshold
+                if low and not self.trays.alerting[slot]:
+                    alerts.append({
+                        'tray_id': tray_id,
+                        'hatch_probability': round(float(probability), 4),
+                        'threshold': self.threshold,
+                        'features': dict(zip(self.columns, map(float, self.trays.features[slot]))),
+                        'at': datetime.fromtimestamp(now).isoformat()
+                    })
+                self.trays.alerting[slot] = low
+        with self._lock:
+            self.passes += 1
+            self.scored += len(slots)
+            self.last_error = None
+        for alert in alerts:
+            self.publish(alert)
+        return alerts
+
+    # ---------- Alerts ----------
+    def publish(self, alert):
+        with self._lock:
+            self.alerts.append(alert)
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(alert)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                raise StreamUnavailable(f"Too many alert streams open (max {self.max_subscribers})")
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def events(self, subscriber=None):
+        """
+        Server-sent events: one 'alert' event per alert, a comment as heartbeat.
+        Subscribe first (subscribe()) to be refused before the response starts.
+        """
+        subscriber = subscriber or self.subscribe()
+        try:
+            yield ': connected\n\n'
+            while True:
+                try:
+                    alert = subscriber.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield f"event: alert\ndata: {json.dumps(alert)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def status(self):
+        with self._lock, self.trays.lock:
+            return {
+                'trays': len(self.trays.slots),
+                'max_trays': self.trays.max_trays,
+                'trays_evicted': self.trays.evicted,
+                'alerting': int(self.trays.alerting.sum()),
+                'pending': int(self.trays.dirty.sum()),
+                'interval_seconds': self.interval,
+                'threshold': self.threshold,
+                'readings_total': self.readings,
+                'scoring_passes_total': self.passes,
+                'trays_scored_total': self.scored,
+                'subscribers': len(self.subscribers),
+                'max_subscribers': self.max_subscribers,
+                'last_error': self.last_error
+            }
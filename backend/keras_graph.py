@@ -0,0 +1,152 @@
+"""
+Keras Graph Functions
+Single-image inference for the Keras CNNs (DenseNet121, the cow feed
+segmentation and regression models) without Model.predict(). predict() sets
+up a data adapter, callbacks and a step function on every call, which for a
+batch of one costs more than the convolutions on small inputs.
+
+A GraphPredictor traces the model once per batch size into a concrete
+tf.function with a fixed input signature and calls it directly. Other batch
+sizes are padded with zeros up to the next traced size (larger batches are
+split), so a request never triggers a retrace. Each size is traced on first
+use; the warm-up pass traces size 1. Models restored from the artifact
+cache (SavedModelPredictor) are traced around their serving signature.
+
+Configuration:
+    SMART_FARM_KERAS_GRAPH=0             use Model.predict() as before
+    SMART_FARM_KERAS_BATCH_SIZES=1,2,4,8 traced batch sizes (default)
+
+Usage (latency of Model.predict() against the graph function):
+    python keras_graph.py cattle_disease_detection/models/DenseNet121_Disease/best_model.h5
+    python keras_graph.py model.h5 --batch-sizes 1,4 --runs 100
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+import heavy_imports
+import model_warmup
+from artifact_cache import SavedModelPredictor
+from model_registry import env_flag
+
+KERAS_GRAPH_ENV = 'SMART_FARM_KERAS_GRAPH'
+BATCH_SIZES_ENV = 'SMART_FARM_KERAS_BATCH_SIZES'
+DEFAULT_BATCH_SIZES = (1, 2, 4, 8)
+
+
+def configured_batch_sizes():
+    value = os.environ.get(BATCH_SIZES_ENV, '')
+    sizes = {int(item) for item in value.split(',') if item.strip()}
+    return sorted(sizes or DEFAULT_BATCH_SIZES)
+
+
+class GraphPredictor:
+    """Keras-compatible predict() through fixed-signature graph functions"""
+
+    def __init__(self, model, batch_sizes=None):
+        self.model = model
+        self.batch_sizes = sorted(batch_sizes or configured_batch_sizes())
+        self.input_shape = tuple(model.input_shape)
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        # output_shape, layers, ... of the wrapped model
+        if attr == 'model':
+            raise AttributeError(attr)
+        return getattr(self.model, attr)
+
+    def _function(self, size):
+        function = self._functions.get(size)
+        if function is None:
+            with self._lock:
+                function = self._functions.get(size)
+                if function is None:
+                    tf = heavy_imports.tensorflow()
+                    model = self.model
+                    if isinstance(model, SavedModelPredictor):
+                        call = model.serve
+                    else:
+                        call = lambda x: model(x, training=False)
+                    spec = tf.TensorSpec([size] + list(self.input_shape[1:]), tf.float32)
+                    function = tf.function(call, input_signature=[spec]).get_concrete_function()
+                    self._functions[size] = function
+        return function
+
+    def predict(self, x, verbose=0, batch_size=None):
+        x = np.asarray(x, dtype=np.float32)
+        if len(x) == 0:
+            return np.empty((0,) + tuple(self.model.output_shape[1:]), dtype=np.float32)
+        largest = self.batch_sizes[-1]
+        outputs = []
+        for start in range(0, len(x), largest):
+            chunk = x[start:start + largest]
+            count = len(chunk)
+            size = next(size for size in self.batch_sizes if size >= count)
+            if size > count:
+                padding = np.zeros((size - count,) + chunk.shape[1:], dtype=np.float32)
+                chunk = np.concatenate([chunk, padding])
+            output = self._function(size)(chunk)
+            outputs.append(output.numpy()[:count])
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def __call__(self, x, training=False):
+        return self.predict(x)
+
+    def traced_batch_sizes(self):
+        return sorted(self._functions)
+
+
+def compiled(model):
+    """GraphPredictor for a single-input, single-output model (else the model itself)"""
+    if not env_flag(KERAS_GRAPH_ENV, True):
+        return model
+    if isinstance(model.input_shape, list) or isinstance(getattr(model, 'output_shape', None), list):
+        print("⚠️ Multi-input/output Keras model, using Model.predict()")
+        return model
+    return GraphPredictor(model)
+
+
+# ==================== Benchmark ====================
+def _latency_ms(call, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def benchmark(path, batch_sizes, runs, custom_objects=None):
+    keras = heavy_imports.keras()
+    model = keras.models.load_model(path, custom_objects=custom_objects, compile=False)
+    graph = GraphPredictor(model, batch_sizes)
+    print(f"\n⚡ {os.path.basename(path)}  input {model.input_shape}  ({runs} runs per size)")
+    print(f"{'batch':>6}  {'predict p50':>12}  {'predict p99':>12}  {'graph p50':>10}  {'graph p99':>10}  {'speedup':>8}")
+    for size in batch_sizes:
+        x = model_warmup.keras_input_batch(model, batch_size=size)
+        x += np.random.default_rng(0).random(x.shape, dtype=np.float32)
+        # Outside the timing: tracing, kernel selection
+        model.predict(x, verbose=0)
+        graph.predict(x)
+        np.testing.assert_allclose(graph.predict(x), model.predict(x, verbose=0), rtol=1e-4, atol=1e-5)
+        predict_p50, predict_p99 = _latency_ms(lambda: model.predict(x, verbose=0), runs)
+        graph_p50, graph_p99 = _latency_ms(lambda: graph.predict(x), runs)
+        print(f"{size:>6}  {predict_p50:>10.2f}ms  {predict_p99:>10.2f}ms  {graph_p50:>8.2f}ms  "
+              f"{graph_p99:>8.2f}ms  {predict_p50 / graph_p50:>7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Model.predict() vs graph function latency")
+    parser.add_argument('models', nargs='+', help="Keras .h5 files")
+    parser.add_argument('--batch-sizes', default=','.join(str(size) for size in DEFAULT_BATCH_SIZES))
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+    sizes = sorted({int(item) for item in args.batch_sizes.split(',') if item.strip()})
+    for model_path in args.models:
+        # The segmentation model was trained with a custom metric
+        benchmark(model_path, sizes, args.runs, custom_objects={'dice_coef': lambda y_true, y_pred: 0.0})
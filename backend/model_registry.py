@@ -0,0 +1,903 @@
+"""
+Model Registry
+Lazy, on-demand loading of the model artifacts served by the unified backend.
+
+Every artifact is registered with a loader callable and only materialized the
+first time a request needs it, or at startup when listed in the preload
+configuration (SMART_FARM_PRELOAD, e.g. "nutrition,milk_market" or "all").
+Preloaded models can optionally be warmed up (SMART_FARM_WARMUP=1) before the
+registry reports itself ready.
+
+Loaded models can be hot reloaded: the new artifact is loaded and warmed up
+next to the old one, the reference is swapped atomically, and requests still
+holding the old generation drain before it is released.
+
+With a memory budget (SMART_FARM_MODEL_MEMORY_BUDGET_MB) the least recently
+used models are evicted to stay under it and reloaded transparently on their
+next use. Models listed in SMART_FARM_PINNED_MODELS are never evicted.
+
+Under the pre-forking gunicorn launcher (gunicorn.conf.py) only fork-safe
+sklearn/joblib artifacts are preloaded in the master, where workers share
+them copy-on-write; TensorFlow and YOLO models are preloaded in each worker
+after the fork (start_worker).
+
+All entry points in a process share one registry (get_registry()).
+"""
+
+import gc
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import heavy_imports
+import thread_config
+
+# ==================== Model States ====================
+MODEL_STATE_COLD = 'cold'
+MODEL_STATE_LOADING = 'loading'
+MODEL_STATE_WARM = 'warm'
+MODEL_STATE_FAILED = 'failed'
+MODEL_STATE_EVICTED = 'evicted'
+
+PRELOAD_ENV = 'SMART_FARM_PRELOAD'
+LOAD_WORKERS_ENV = 'SMART_FARM_LOAD_WORKERS'
+WARMUP_ENV = 'SMART_FARM_WARMUP'
+BACKGROUND_STARTUP_ENV = 'SMART_FARM_BACKGROUND_STARTUP'
+DRAIN_TIMEOUT_ENV = 'SMART_FARM_RELOAD_DRAIN_TIMEOUT'
+WATCH_ENV = 'SMART_FARM_WATCH_MODELS'
+WATCH_INTERVAL_ENV = 'SMART_FARM_WATCH_INTERVAL'
+MEMORY_BUDGET_ENV = 'SMART_FARM_MODEL_MEMORY_BUDGET_MB'
+PINNED_ENV = 'SMART_FARM_PINNED_MODELS'
+FORK_SAFE_PRELOAD_ENV = 'SMART_FARM_FORK_SAFE_PRELOAD'
+RETRY_BASE_ENV = 'SMART_FARM_RETRY_BASE_SECONDS'
+RETRY_MAX_ENV = 'SMART_FARM_RETRY_MAX_SECONDS'
+
+DEFAULT_RETRY_BASE = 5.0
+DEFAULT_RETRY_MAX = 300.0
+
+# Frameworks that may be loaded in a master process before fork() (unlike TensorFlow/torch)
+FORK_SAFE_FRAMEWORKS = ('sklearn', 'numpy')
+
+DEFAULT_DRAIN_TIMEOUT = 300.0
+DEFAULT_WATCH_INTERVAL = 10.0
+
+
+def current_rss_bytes():
+    """Resident set size of this process in bytes, or None if unknown"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+
+
+def process_memory():
+    """RSS, PSS and shared/private memory of this process in MB (Linux smaps_rollup)"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])  # kB
+    except OSError:
+        rss = current_rss_bytes()
+        return {'pid': os.getpid(), 'rss_mb': round(rss / 1024 / 1024, 1) if rss else None}
+    shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return {
+        'pid': os.getpid(),
+        'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+        'shared_mb': round(shared / 1024, 1),
+        'private_mb': round(private / 1024, 1)
+    }
+
+
+def default_load_workers():
+    """Size of the startup loading pool (SMART_FARM_LOAD_WORKERS, default min(4, cores))"""
+    configured = os.environ.get(LOAD_WORKERS_ENV)
+    if configured:
+        return max(1, int(configured))
+    return min(4, os.cpu_count() or 1)
+
+
+def env_flag(name, default=False):
+    """Read a boolean environment flag ('1', 'true', 'yes', 'on')"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def memory_budget_from_env():
+    """Model memory budget in bytes (SMART_FARM_MODEL_MEMORY_BUDGET_MB), None if unlimited"""
+    configured = os.environ.get(MEMORY_BUDGET_ENV)
+    if not configured:
+        return None
+    return int(float(configured) * 1024 * 1024)
+
+
+def parse_name_list(value):
+    """Split a comma separated configuration value into clean names"""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class ModelSpec:
+    """How to load one model artifact (or an inseparable bundle of them)"""
+
+    def __init__(self, name, loader, service, paths=None, framework='sklearn', warmup=None):
+        self.name = name
+        self.loader = loader
+        self.service = service
+        self.paths = list(paths or [])
+        self.framework = framework
+        self.warmup = warmup
+
+    def artifacts_present(self):
+        """True when every artifact file backing this model exists"""
+        return all(os.path.exists(path) for path in self.paths)
+
+    def artifact_signature(self):
+        """(mtime, size) of every artifact file, used to detect replaced files"""
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    @property
+    def fork_safe(self):
+        """Safe to load in a master process before forking workers"""
+        return self.framework in FORK_SAFE_FRAMEWORKS
+
+    def artifact_bytes(self):
+        """Total on-disk size of the artifact files"""
+        return sum(os.path.getsize(path) for path in self.paths if os.path.exists(path))
+
+
+class _ModelEntry:
+    """Runtime state of a registered model"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.state = MODEL_STATE_COLD
+        self.model = None
+        self.error = None
+        self.load_time = None
+        self.memory_bytes = None
+        self.memory_measured = False
+        self.loaded_at = None
+        self.last_used = None
+        # Failed loads are retried with exponential backoff
+        self.failures = 0
+        self.retry_at = None
+        self.warmup_time = None
+        self.warmup_error = None
+        self.warmed_up = False
+        self.lock = threading.Lock()
+        # Hot reload: each swap bumps the generation; leases count in-flight users
+        self.generation = 0
+        self.in_flight = {}
+        self.refs = threading.Condition()
+        self.signature = None
+        self.reloading = False
+        self.reload_count = 0
+        self.reload_failures = 0
+        self.reload_seconds_total = 0.0
+        self.last_reload = None
+        # Residency under the memory budget
+        self.load_count = 0
+        self.evictions = 0
+
+    def footprint_bytes(self):
+        """Memory attributed to this model for the budget"""
+        # The RSS delta is only trusted for loads that ran alone and did not
+        # import a framework; otherwise fall back to the artifact size
+        if self.memory_measured and self.memory_bytes:
+            size = self.memory_bytes
+        else:
+            size = self.spec.artifact_bytes()
+        # Replica pools (replica_pool.py) hold several copies of the model
+        replica_count = getattr(self.model, 'replica_count', None)
+        return size * replica_count() if replica_count else size
+
+    def in_use(self):
+        return sum(self.in_flight.values()) > 0
+
+    def retry_due(self):
+        return self.retry_at is not None and time.time() >= self.retry_at
+
+
+class _ReloadError(Exception):
+    """A reload step failed; the previous generation keeps serving"""
+
+
+class ModelRegistry:
+    """Registry of lazily loaded models with per-model state tracking"""
+
+    def __init__(self, memory_budget_bytes=None, pinned=None):
+        self._entries = {}
+        self._register_lock = threading.Lock()
+        self.ready = False
+        self.startup_error = None
+        self._scope = threading.local()
+        self._watcher = None
+        self.memory_budget_bytes = memory_budget_from_env() if memory_budget_bytes is None else memory_budget_bytes
+        self._pinned = parse_name_list(os.environ.get(PINNED_ENV, '')) if pinned is None else list(pinned)
+        self._budget_lock = threading.Lock()
+        self._deferred = []
+        self._async_loads = set()
+        self._async_lock = threading.Lock()
+        self.retry_base = float(os.environ.get(RETRY_BASE_ENV, DEFAULT_RETRY_BASE))
+        self.retry_max = float(os.environ.get(RETRY_MAX_ENV, DEFAULT_RETRY_MAX))
+        self._loads_running = 0
+        self._counter_lock = threading.Lock()
+
+    # ---------- Registration ----------
+    def register(self, name, loader, service, paths=None, framework='sklearn', warmup=None):
+        """
+        Register a model; nothing is loaded until it is first requested.
+        The first registration of a name wins, so entry points sharing the
+        registry can all declare the models they need.
+        """
+        with self._register_lock:
+            if name in self._entries:
+                return self._entries[name].spec
+            spec = ModelSpec(name, loader, service, paths=paths, framework=framework, warmup=warmup)
+            self._entries[name] = _ModelEntry(spec)
+            return spec
+
+    def names(self):
+        return list(self._entries)
+
+    def service_models(self, service):
+        """Names of all models belonging to a service"""
+        return [name for name, entry in self._entries.items() if entry.spec.service == service]
+
+    def resolve(self, names):
+        """Expand service names and 'all' into model names"""
+        resolved = []
+        for name in names:
+            if name == 'all':
+                candidates = self.names()
+            elif name in self._entries:
+                candidates = [name]
+            else:
+                candidates = self.service_models(name)
+                if not candidates:
+                    print(f"⚠️ Unknown model or service in preload list: {name}")
+            for candidate in candidates:
+                if candidate not in resolved:
+                    resolved.append(candidate)
+        return resolved
+
+    # ---------- Loading ----------
+    def get(self, name):
+        """
+        Return the loaded model, loading it on first use; None if it failed
+        (a failed model is retried once its backoff has expired).
+        
+        Inside a request scope (begin_request/end_request) the returned
+        generation is leased until the request ends, so a hot reload waits
+        for the request before releasing the old model.
+        """
+        return self.get_versioned(name)[0]
+
+    def get_versioned(self, name):
+        """
+        (model, generation) like get(): the generation the returned model was
+        loaded as, for keys that must match the model actually used (result
+        caches), even if a reload finishes right after.
+        """
+        entry = self._entries[name]
+        leases = getattr(self._scope, 'leases', None)
+        model, generation = self._acquire(entry, lease=leases is not None)
+        if model is not None and leases is not None:
+            leases.append((entry, generation))
+            self._pin_request_thread(entry.spec)
+        return model, generation
+
+    @contextmanager
+    def use(self, name):
+        """Lease a model for the duration of a with-block"""
+        entry = self._entries[name]
+        model, generation = self._acquire(entry, lease=True)
+        try:
+            with thread_config.pinned(entry.spec.name, entry.spec.framework):
+                yield model
+        finally:
+            if model is not None:
+                self._release(entry, generation)
+
+    def _acquire(self, entry, lease):
+        """Load if needed and check the model out; retries if it was evicted in between"""
+        while True:
+            if entry.state != MODEL_STATE_WARM:
+                self._load(entry)
+            entry.last_used = time.time()
+            model, generation = self._checkout(entry, lease)
+            if model is not None or entry.state == MODEL_STATE_FAILED:
+                return model, generation
+
+    def get_nowait(self, name):
+        """
+        Return the model only if it is already loaded. Otherwise start loading
+        it in the background (unless a failed load is still backing off) and
+        return None, so request threads never block on a load.
+        """
+        entry = self._entries[name]
+        if entry.state == MODEL_STATE_WARM:
+            entry.last_used = time.time()
+            leases = getattr(self._scope, 'leases', None)
+            model, generation = self._checkout(entry, lease=leases is not None)
+            if model is not None:
+                if leases is not None:
+                    leases.append((entry, generation))
+                    self._pin_request_thread(entry.spec)
+                return model
+        self.load_async(name)
+        return None
+
+    def load_async(self, name):
+        """Load a model on a background thread if it is not loaded, loading or backing off"""
+        entry = self._entries[name]
+        if entry.state in (MODEL_STATE_WARM, MODEL_STATE_LOADING):
+            return
+        if entry.state == MODEL_STATE_FAILED and not entry.retry_due():
+            return
+        with self._async_lock:
+            if name in self._async_loads:
+                return
+            self._async_loads.add(name)
+
+        def load():
+            try:
+                self._load(entry)
+            finally:
+                with self._async_lock:
+                    self._async_loads.discard(name)
+
+        threading.Thread(target=load, name=f'model-load-{name}', daemon=True).start()
+
+    def retry_after(self, name):
+        """Seconds until a failed model is retried (None unless failed)"""
+        entry = self._entries[name]
+        if entry.state != MODEL_STATE_FAILED or entry.retry_at is None:
+            return None
+        return max(0.0, entry.retry_at - time.time())
+
+    def _checkout(self, entry, lease):
+        with entry.refs:
+            model, generation = entry.model, entry.generation
+            if lease and model is not None:
+                entry.in_flight[generation] = entry.in_flight.get(generation, 0) + 1
+        return model, generation
+
+    def _release(self, entry, generation):
+        with entry.refs:
+            remaining = entry.in_flight.get(generation, 0) - 1
+            if remaining > 0:
+                entry.in_flight[generation] = remaining
+            else:
+                entry.in_flight.pop(generation, None)
+            entry.refs.notify_all()
+
+    # ---------- Request Scope ----------
+    def begin_request(self):
+        """Start leasing every model handed out on this thread"""
+        self._scope.leases = []
+        self._scope.affinity = None
+
+    def end_request(self):
+        """Release the leases taken since begin_request()"""
+        leases = getattr(self._scope, 'leases', None)
+        self._scope.leases = None
+        for entry, generation in leases or []:
+            self._release(entry, generation)
+        thread_config.restore_current_thread(getattr(self._scope, 'affinity', None))
+        self._scope.affinity = None
+
+    def _pin_request_thread(self, spec):
+        """Run the rest of the request on the model's CPU set (thread_config.py)"""
+        previous = thread_config.pin_current_thread(spec.name, spec.framework)
+        if previous is not None and getattr(self._scope, 'affinity', None) is None:
+            self._scope.affinity = previous
+
+    def _load(self, entry):
+        with entry.lock:
+            # Another thread may have finished (or failed) while we waited
+            if entry.state == MODEL_STATE_WARM:
+                return
+            if entry.state == MODEL_STATE_FAILED and not entry.retry_due():
+                return
+
+            spec = entry.spec
+            self._make_room(spec.artifact_bytes(), exclude=entry)
+            entry.state = MODEL_STATE_LOADING
+            with self._counter_lock:
+                self._loads_running += 1
+                alone = self._loads_running == 1
+            frameworks_before = len(heavy_imports.IMPORT_TIMES)
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            try:
+                with thread_config.pinned(spec.name, spec.framework):
+                    model = spec.loader()
+                thread_config.apply_model_threads(model, spec.name, spec.framework)
+            except Exception as e:
+                entry.state = MODEL_STATE_FAILED
+                entry.error = str(e)
+                entry.load_time = time.perf_counter() - start
+                entry.failures += 1
+                delay = min(self.retry_base * 2 ** (entry.failures - 1), self.retry_max)
+                entry.retry_at = time.time() + delay
+                print(f"✗ {spec.name} failed: {e} (retry in {delay:.0f}s)")
+                return
+            finally:
+                with self._counter_lock:
+                    alone = alone and self._loads_running == 1
+                    self._loads_running -= 1
+
+            entry.load_time = time.perf_counter() - start
+            rss_after = current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                entry.memory_bytes = max(rss_after - rss_before, 0)
+                entry.memory_measured = alone and len(heavy_imports.IMPORT_TIMES) == frameworks_before
+            with entry.refs:
+                entry.model = model
+                entry.generation += 1
+            entry.signature = spec.artifact_signature()
+            entry.error = None
+            entry.failures = 0
+            entry.retry_at = None
+            entry.loaded_at = datetime.now().isoformat()
+            entry.load_count += 1
+            entry.state = MODEL_STATE_WARM
+            print(f"✓ {spec.name} loaded in {entry.load_time:.2f}s")
+        self._make_room(0, exclude=entry)
+
+    def preload(self, names, max_workers=None):
+        """
+        Load the given models (or services) up front on a bounded thread pool.
+        
+        Loading is mostly file I/O and deserialization, so artifacts overlap
+        well. Each load is isolated: a failing artifact is marked failed and
+        never blocks or aborts the others.
+        """
+        names = self.resolve(names)
+        if not names:
+            return {}
+        workers = min(max_workers or default_load_workers(), len(names))
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='model-loader') as pool:
+            list(pool.map(self.get, names))
+        elapsed = time.perf_counter() - start
+        
+        status = self.status(names)
+        warm = [name for name in names if status[name]['state'] == MODEL_STATE_WARM]
+        serial_time = sum(item['load_time_seconds'] or 0 for item in status.values())
+        print(f"✓ Loaded {len(warm)}/{len(names)} models in {elapsed:.2f}s "
+              f"({workers} workers, {serial_time:.2f}s of load work)")
+        for name in names:
+            if name not in warm:
+                print(f"  ✗ {name}: {status[name]['error']}")
+        return status
+
+    # ---------- Memory Budget ----------
+    def pinned(self):
+        """Model names that are never evicted"""
+        return set(self.resolve(self._pinned)) if self._pinned else set()
+
+    def resident_bytes(self):
+        return sum(
+            entry.footprint_bytes() for entry in self._entries.values()
+            if entry.state == MODEL_STATE_WARM
+        )
+
+    def _make_room(self, incoming_bytes, exclude=None):
+        """Evict least recently used models until resident + incoming fits the budget"""
+        if self.memory_budget_bytes is None:
+            return
+        with self._budget_lock:
+            pinned = self.pinned()
+            while self.resident_bytes() + incoming_bytes > self.memory_budget_bytes:
+                candidates = [
+                    entry for name, entry in self._entries.items()
+                    if entry.state == MODEL_STATE_WARM and entry is not exclude
+                    and name not in pinned and not entry.reloading and not entry.in_use()
+                ]
+                if not candidates:
+                    print(f"⚠️ Model memory budget exceeded "
+                          f"({self.resident_bytes() / 1024 / 1024:.1f}MB resident, "
+                          f"{self.memory_budget_bytes / 1024 / 1024:.1f}MB budget); nothing evictable")
+                    return
+                self._evict(min(candidates, key=lambda entry: entry.last_used or 0))
+
+    def _evict(self, entry):
+        with entry.refs:
+            # A request may have leased it since the candidate list was built
+            if entry.in_use() or entry.state != MODEL_STATE_WARM:
+                return
+            footprint = entry.footprint_bytes()
+            entry.model = None
+            entry.state = MODEL_STATE_EVICTED
+            entry.warmed_up = False
+            entry.evictions += 1
+        gc.collect()
+        print(f"♻️ Evicted {entry.spec.name} ({footprint / 1024 / 1024:.0f}MB, least recently used)")
+
+    def evict(self, name):
+        """Drop a model from memory now; it reloads on next use"""
+        self._evict(self._entries[name])
+        return self._entries[name].state == MODEL_STATE_EVICTED
+
+    # ---------- Warm-up ----------
+    def warmup(self, name):
+        """Run the model's synthetic warm-up pass once; returns the latency in seconds"""
+        entry = self._entries[name]
+        if entry.state != MODEL_STATE_WARM or entry.spec.warmup is None:
+            return None
+        start = time.perf_counter()
+        try:
+            with thread_config.pinned(name, entry.spec.framework):
+                entry.spec.warmup(entry.model)
+            entry.warmup_error = None
+        except Exception as e:
+            # A failed warm-up leaves the model usable; the first request just pays the setup
+            entry.warmup_error = str(e)
+            print(f"⚠️ {name} warm-up failed: {e}")
+        entry.warmup_time = time.perf_counter() - start
+        entry.warmed_up = entry.warmup_error is None
+        if entry.warmed_up:
+            print(f"🔥 {name} warmed up in {entry.warmup_time:.2f}s")
+        return entry.warmup_time
+
+    def warmup_all(self, names):
+        """Warm up the given loaded models one after another (they compete for the same cores)"""
+        for name in self.resolve(names):
+            self.warmup(name)
+
+    # ---------- Hot Reload ----------
+    def reload(self, name, background=True, drain_timeout=None):
+        """
+        Reload one model from its artifact without interrupting traffic.
+        
+        The new artifact is loaded and warmed up while the old generation
+        keeps serving, then swapped in atomically. The old generation is
+        released once its in-flight requests finish (or drain_timeout
+        passes). If loading or warm-up fails the old model stays in place.
+        Returns False if a reload of this model is already running.
+        """
+        entry = self._entries[name]
+        with entry.refs:
+            if entry.reloading:
+                return False
+            entry.reloading = True
+            entry.last_reload = {
+                'status': 'running',
+                'started_at': datetime.now().isoformat(),
+                'error': None
+            }
+        if drain_timeout is None:
+            drain_timeout = float(os.environ.get(DRAIN_TIMEOUT_ENV, DEFAULT_DRAIN_TIMEOUT))
+        if background:
+            threading.Thread(
+                target=self._reload, args=(entry, drain_timeout),
+                name=f'model-reload-{name}', daemon=True
+            ).start()
+        else:
+            self._reload(entry, drain_timeout)
+        return True
+
+    def _reload(self, entry, drain_timeout):
+        spec = entry.spec
+        report = entry.last_reload
+        start = time.perf_counter()
+        signature = spec.artifact_signature()
+        print(f"🔄 Reloading {spec.name}...")
+        try:
+            step = time.perf_counter()
+            try:
+                with thread_config.pinned(spec.name, spec.framework):
+                    model = spec.loader()
+                thread_config.apply_model_threads(model, spec.name, spec.framework)
+            except Exception as e:
+                raise _ReloadError(f"load failed: {e}")
+            report['load_seconds'] = round(time.perf_counter() - step, 3)
+
+            warmup_time = None
+            if spec.warmup is not None:
+                step = time.perf_counter()
+                try:
+                    with thread_config.pinned(spec.name, spec.framework):
+                        spec.warmup(model)
+                except Exception as e:
+                    raise _ReloadError(f"warm-up failed: {e}")
+                warmup_time = time.perf_counter() - step
+                report['warmup_seconds'] = round(warmup_time, 3)
+
+            with entry.lock:
+                with entry.refs:
+                    old_generation = entry.generation
+                    entry.model = model
+                    entry.generation += 1
+                    report['generation'] = entry.generation
+                entry.signature = signature
+                entry.state = MODEL_STATE_WARM
+                entry.error = None
+                entry.failures = 0
+                entry.retry_at = None
+                entry.load_time = report['load_seconds']
+                entry.loaded_at = datetime.now().isoformat()
+                entry.warmup_time = warmup_time
+                entry.warmed_up = warmup_time is not None
+                entry.warmup_error = None
+                entry.load_count += 1
+            del model
+
+            # Drain: the old model is dropped as soon as nobody holds a lease on it
+            step = time.perf_counter()
+            with entry.refs:
+                drained = entry.refs.wait_for(
+                    lambda: entry.in_flight.get(old_generation, 0) == 0, timeout=drain_timeout
+                )
+            report['drain_seconds'] = round(time.perf_counter() - step, 3)
+            report['drained'] = drained
+            if not drained:
+                print(f"⚠️ {spec.name}: requests still on generation {old_generation} "
+                      f"after {drain_timeout:.0f}s; they keep their reference")
+            report['status'] = 'completed'
+            entry.reload_count += 1
+            self._make_room(0, exclude=entry)
+        except Exception as e:
+            report['status'] = 'failed'
+            report['error'] = str(e)
+            entry.reload_failures += 1
+            # Remember the broken version so the watcher does not retry it in a loop
+            entry.signature = signature
+            print(f"✗ {spec.name} reload {e}; previous model kept")
+        finally:
+            total = time.perf_counter() - start
+            report['total_seconds'] = round(total, 3)
+            report['finished_at'] = datetime.now().isoformat()
+            entry.reload_seconds_total += total
+            with entry.refs:
+                entry.reloading = False
+        if report['status'] == 'completed':
+            print(f"✓ {spec.name} reloaded in {total:.2f}s (generation {report['generation']})")
+
+    def changed_models(self):
+        """Loaded models whose artifact files changed on disk since they were loaded"""
+        return [
+            name for name, entry in self._entries.items()
+            if entry.state == MODEL_STATE_WARM and not entry.reloading
+            and entry.spec.artifacts_present()
+            and entry.signature != entry.spec.artifact_signature()
+        ]
+
+    def _watch(self, interval):
+        # A file must look the same on two polls in a row before reloading,
+        # so a copy in progress is not picked up half written
+        pending = {}
+        while True:
+            time.sleep(interval)
+            changed = set(self.changed_models())
+            for name in changed:
+                signature = self._entries[name].spec.artifact_signature()
+                if pending.get(name) == signature:
+                    print(f"👀 {name} artifact changed on disk")
+                    self.reload(name)
+                    pending.pop(name)
+                else:
+                    pending[name] = signature
+            for name in list(pending):
+                if name not in changed:
+                    pending.pop(name)
+
+    def start_watcher(self, interval=None):
+        """Poll loaded models' artifacts and hot reload them when they change"""
+        if self._watcher is not None:
+            return
+        if interval is None:
+            interval = float(os.environ.get(WATCH_INTERVAL_ENV, DEFAULT_WATCH_INTERVAL))
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name='model-watcher', daemon=True
+        )
+        self._watcher.start()
+        print(f"👀 Watching model artifacts every {interval:g}s")
+
+    # ---------- Startup ----------
+    def preload_from_env(self, fork_safe_only=False):
+        """
+        Preload whatever SMART_FARM_PRELOAD lists (nothing by default).
+        With fork_safe_only, TensorFlow/YOLO models are kept for start_worker().
+        """
+        names = self.resolve(parse_name_list(os.environ.get(PRELOAD_ENV, '')))
+        if fork_safe_only:
+            self._deferred = [name for name in names if not self._entries[name].spec.fork_safe]
+            names = [name for name in names if self._entries[name].spec.fork_safe]
+            if self._deferred:
+                print(f"⏭️ Deferred to workers (not fork-safe): {', '.join(self._deferred)}")
+        if names:
+            print(f"\n🔄 Preloading models: {', '.join(names)}")
+            self.preload(names)
+        return names
+
+    def _startup(self, warmup, names=None, fork_safe_only=False):
+        try:
+            if names is None:
+                names = self.preload_from_env(fork_safe_only)
+            elif names:
+                self.preload(names)
+            if warmup and names:
+                print("\n🔥 Warming up preloaded models...")
+                self.warmup_all(names)
+        except Exception as e:
+            self.startup_error = str(e)
+            print(f"❌ Model startup failed: {e}")
+        finally:
+            self.ready = True
+
+    def start(self, warmup=None, background=None):
+        """
+        Preload (and optionally warm up) the configured models, then mark the
+        registry ready. With background=True the server starts answering
+        immediately and readiness flips once the warm-up finishes.
+        """
+        if warmup is None:
+            warmup = env_flag(WARMUP_ENV)
+        if background is None:
+            background = env_flag(BACKGROUND_STARTUP_ENV)
+        fork_safe_only = env_flag(FORK_SAFE_PRELOAD_ENV)
+        thread_config.configure_sklearn()
+        # Threads do not survive fork(): a pre-forking master loads in the
+        # foreground and each worker starts its own watcher
+        if fork_safe_only:
+            background = False
+        elif env_flag(WATCH_ENV):
+            self.start_watcher()
+        self.ready = False
+        self._run_startup(warmup, background, None, fork_safe_only)
+
+    def start_worker(self, warmup=None, background=None):
+        """In a forked worker: preload the models deferred by the master"""
+        if warmup is None:
+            warmup = env_flag(WARMUP_ENV)
+        if background is None:
+            background = env_flag(BACKGROUND_STARTUP_ENV)
+        if env_flag(WATCH_ENV):
+            self.start_watcher()
+        # threadpoolctl limits are per-process state; apply the worker's share again
+        thread_config.configure_sklearn()
+        self.ready = False
+        self._run_startup(warmup, background, list(self._deferred), False)
+
+    def _run_startup(self, warmup, background, names, fork_safe_only):
+        if background:
+            threading.Thread(
+                target=self._startup, args=(warmup, names, fork_safe_only),
+                name='model-startup', daemon=True
+            ).start()
+        else:
+            self._startup(warmup, names, fork_safe_only)
+
+    # ---------- Status ----------
+    def state(self, name):
+        return self._entries[name].state
+
+    def generation(self, name):
+        """Bumped every time the model is (re)loaded"""
+        return self._entries[name].generation
+
+    def is_available(self, name):
+        """True if the model is loaded or can still be loaded on demand"""
+        entry = self._entries[name]
+        if entry.state == MODEL_STATE_FAILED:
+            return False
+        if entry.state == MODEL_STATE_WARM:
+            return True
+        return entry.spec.artifacts_present()
+
+    def model_status(self, name):
+        # memory_mb is the RSS delta seen while loading; with parallel
+        # preloading, concurrent loads overlap so treat it as approximate
+        entry = self._entries[name]
+        memory_mb = None
+        if entry.memory_bytes is not None:
+            memory_mb = round(entry.memory_bytes / (1024 * 1024), 1)
+        return {
+            'service': entry.spec.service,
+            'framework': entry.spec.framework,
+            'state': entry.state,
+            'load_time_seconds': round(entry.load_time, 3) if entry.load_time is not None else None,
+            'memory_mb': memory_mb,
+            'loaded_at': entry.loaded_at,
+            'warmed_up': entry.warmed_up,
+            'warmup_seconds': round(entry.warmup_time, 3) if entry.warmup_time is not None else None,
+            'warmup_error': entry.warmup_error,
+            'error': entry.error,
+            'failures': entry.failures,
+            'retry_in_seconds': round(self.retry_after(name), 1) if self.retry_after(name) is not None else None,
+            'generation': entry.generation,
+            'in_flight': sum(entry.in_flight.values()),
+            'reloading': entry.reloading,
+            'last_reload': dict(entry.last_reload) if entry.last_reload else None,
+            'evictions': entry.evictions,
+            'replicas': entry.model.pool_status() if hasattr(entry.model, 'pool_status') else None
+        }
+
+    def status(self, names=None):
+        """Per-model state, load time and memory for the given (or all) models"""
+        return {name: self.model_status(name) for name in (names or self.names())}
+
+    def metrics(self):
+        """Counters for monitoring: residency, evictions, reloads and their durations per model"""
+        pinned = self.pinned()
+        models = {}
+        for name, entry in self._entries.items():
+            last = entry.last_reload or {}
+            resident = entry.state == MODEL_STATE_WARM
+            pool = entry.model.pool_status() if hasattr(entry.model, 'pool_status') else None
+            models[name] = {
+                'state': entry.state,
+                'resident': resident,
+                'resident_mb': round(entry.footprint_bytes() / 1024 / 1024, 1) if resident else 0.0,
+                'pinned': name in pinned,
+                'loads_total': entry.load_count,
+                'evictions_total': entry.evictions,
+                'generation': entry.generation,
+                'in_flight': sum(entry.in_flight.values()),
+                'reloads_total': entry.reload_count,
+                'reload_failures_total': entry.reload_failures,
+                'reload_seconds_total': round(entry.reload_seconds_total, 3),
+                'last_reload_seconds': last.get('total_seconds'),
+                'last_reload_drain_seconds': last.get('drain_seconds'),
+                'replicas': pool['replicas'] if pool else None,
+                'replica_waits_total': pool['waits'] if pool else None
+            }
+        budget = self.memory_budget_bytes
+        return {
+            'memory': {
+                'budget_mb': round(budget / 1024 / 1024, 1) if budget is not None else None,
+                'resident_mb': round(self.resident_bytes() / 1024 / 1024, 1),
+                'resident_models': sum(1 for item in models.values() if item['resident']),
+                'evictions_total': sum(item['evictions_total'] for item in models.values())
+            },
+            'process': process_memory(),
+            'threads': thread_config.describe(),
+            'models': models
+        }
+
+
+# ==================== Shared Registry ====================
+_shared_registry = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    The process-wide registry used by app.py, the cattle API server and the
+    integrated diagnosis workflow, so each artifact is loaded once per process.
+    """
+    global _shared_registry
+    if _shared_registry is None:
+        with _shared_registry_lock:
+            if _shared_registry is None:
+                _shared_registry = ModelRegistry()
+    return _shared_registry
@@ -0,0 +1,77 @@
+"""
+Model Warm-up
+Synthetic inference passes with the real input shapes, so graph tracing,
+oneDNN kernel selection and the ultralytics predictor setup happen before
+the first real request instead of during it.
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_IMG_SIZE = 224
+DEFAULT_YOLO_IMGSZ = {'classify': 224}
+DEFAULT_YOLO_DETECT_IMGSZ = 640
+
+
+def read_feature_names(path):
+    """Feature order of a tabular model, one name per line (feature_names.txt)"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def keras_input_batch(model, batch_size=1, fill_size=DEFAULT_IMG_SIZE):
+    """Zero batch shaped like the model input; unknown spatial dims use fill_size"""
+    input_shape = model.input_shape
+    if isinstance(input_shape, list):
+        input_shape = input_shape[0]
+    shape = [batch_size] + [dim if dim is not None else fill_size for dim in input_shape[1:]]
+    return np.zeros(shape, dtype=np.float32)
+
+
+def warmup_keras(model):
+    """Run one zero batch through a Keras model (DenseNet121, seg/reg, egg-hatch NN)"""
+    model.predict(keras_input_batch(model), verbose=0)
+
+
+def yolo_imgsz(model):
+    """Inference image size the YOLO model was trained with"""
+    overrides = getattr(model, 'overrides', None) or {}
+    imgsz = overrides.get('imgsz')
+    if isinstance(imgsz, (list, tuple)):
+        imgsz = max(imgsz)
+    if imgsz:
+        return int(imgsz)
+    return DEFAULT_YOLO_IMGSZ.get(getattr(model, 'task', None), DEFAULT_YOLO_DETECT_IMGSZ)
+
+
+def warmup_yolo(model):
+    """Build the ultralytics predictor and run a blank frame at the trained imgsz"""
+    imgsz = yolo_imgsz(model)
+    frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    model.predict(source=frame, imgsz=imgsz, verbose=False)
+
+
+def zero_frame(model, columns=None):
+    """One all-zero row with the model's feature names (or feature count)"""
+    columns = columns or list(getattr(model, 'feature_names_in_', []))
+    if columns:
+        return pd.DataFrame([[0.0] * len(columns)], columns=columns)
+    return np.zeros((1, model.n_features_in_))
+
+
+def warmup_sklearn(model, sample=None, columns=None):
+    """Predict one row (a representative sample or zeros) through an sklearn estimator"""
+    if sample is None:
+        sample = zero_frame(model, columns)
+    if hasattr(model, 'predict_proba'):
+        model.predict_proba(sample)
+    elif hasattr(model, 'transform') and not hasattr(model, 'predict'):
+        model.transform(sample)
+    else:
+        model.predict(sample)
+
+
+def warmup_bundle(bundle, feature_names):
+    """Scaler + model bundle (severity/treatment) using the feature_names.txt order"""
+    sample = np.zeros((1, len(feature_names)))
+    bundle['model'].predict_proba(bundle['scaler'].transform(sample))
@@ -0,0 +1,264 @@
+"""
+NumPy MLP Inference
+Small dense Keras models (egg_hatch_nn.h5: 5 scaled features -> 64 -> 32 -> 1)
+evaluated directly in NumPy. Keras Model.predict() builds a data pipeline
+and dispatches a graph on every call, which costs milliseconds for
+microseconds of matrix math.
+
+The weights and layer configuration are read from the .h5 file with h5py
+(no TensorFlow import). Supported layers: InputLayer, Dense, Activation,
+Dropout (identity at inference), Flatten and BatchNormalization over the
+last axis, in a Sequential model. Anything else raises UnsupportedModel,
+and loader() falls back to the Keras model.
+
+Models opt in at registration (loader(..., default=True)); the environment
+can override the choice:
+    SMART_FARM_NUMPY_MODELS   models served by NumPy: "egg_hatch_nn,other",
+                              or "none" to serve every model with Keras
+"""
+
+import json
+import os
+
+import numpy as np
+
+NUMPY_MODELS_ENV = 'SMART_FARM_NUMPY_MODELS'
+
+
+class UnsupportedModel(ValueError):
+    """The model can't be evaluated in NumPy; Keras serves it"""
+
+
+# Errors from a config or weight layout this reader does not know
+LAYOUT_ERRORS = (KeyError, IndexError, TypeError, ValueError, AttributeError)
+
+
+# ==================== Activations ====================
+def _sigmoid(x):
+    return np.exp(-np.logaddexp(0, -x)).astype(x.dtype)
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'relu6': lambda x: np.clip(x, 0, 6),
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+    'softmax': _softmax,
+    'softplus': lambda x: np.logaddexp(0, x).astype(x.dtype),
+    'softsign': lambda x: x / (1 + np.abs(x)),
+    'elu': lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+    'selu': lambda x: 1.0507009873554805 * np.where(x > 0, x, 1.6732632423543772 * np.expm1(np.minimum(x, 0))),
+    'swish': lambda x: x * _sigmoid(x),
+    'silu': lambda x: x * _sigmoid(x),
+    'exponential': np.exp
+}
+
+
+def activation(name):
+    if not isinstance(name, str) or name not in ACTIVATIONS:
+        raise UnsupportedModel(f"activation {name!r}")
+    return ACTIVATIONS[name]
+
+
+# ==================== Model ====================
+class NumpyMLP:
+    """Batched forward pass over a list of NumPy layer functions"""
+
+    def __init__(self, name, layers, input_shape):
+        self.name = name
+        self.layers = layers
+        self.input_shape = input_shape
+
+    def predict(self, x, verbose=0, batch_size=None):
+        """Same call and output as keras Model.predict (float32)"""
+        x = np.asarray(x, dtype=np.float32)
+        for layer in self.layers:
+            x = layer(x)
+        return x
+
+    __call__ = predict
+
+    def __repr__(self):
+        return f"NumpyMLP({self.name}, {len(self.layers)} layers, input {self.input_shape})"
+
+    @classmethod
+    def from_h5(cls, path):
+        with _h5py().File(path, 'r') as f:
+            try:
+                config, layer_configs = _layer_configs(f)
+                weights_group = f['model_weights'] if 'model_weights' in f else f
+                layers, input_shape = [], None
+                for layer_config in layer_configs:
+                    layer_type, options = layer_config['class_name'], layer_config['config']
+                    input_shape = input_shape or _input_shape(options)
+                    weights = _layer_weights(weights_group, options.get('name'))
+                    _check_layer(layer_type, options, len(weights))
+                    layer = _build_layer(layer_type, options, weights)
+                    if layer is not None:
+                        layers.append(layer)
+                if input_shape is None and isinstance(config['config'], dict):
+                    input_shape = tuple(config['config'].get('build_input_shape') or ()) or None
+            except UnsupportedModel:
+                raise
+            except LAYOUT_ERRORS as e:
+                raise UnsupportedModel(f"unexpected .h5 layout: {e!r}") from e
+        return cls(os.path.basename(path), layers, input_shape)
+
+
+def check_h5(path):
+    """
+    Raise UnsupportedModel unless from_h5 can serve the file. Reads the
+    model_config attribute and the weight names only, not the weight arrays.
+    """
+    with _h5py().File(path, 'r') as f:
+        try:
+            _, layer_configs = _layer_configs(f)
+            weights_group = f['model_weights'] if 'model_weights' in f else f
+            for layer_config in layer_configs:
+                options = layer_config['config']
+                weight_names = _weight_names(weights_group, options.get('name'))
+                missing = [name for name in weight_names if name not in weights_group[options['name']]]
+                if missing:
+                    raise KeyError(f"weights {missing}")
+                _check_layer(layer_config['class_name'], options, len(weight_names))
+        except UnsupportedModel:
+            raise
+        except LAYOUT_ERRORS as e:
+            raise UnsupportedModel(f"unexpected .h5 layout: {e!r}") from e
+
+
+def _h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise UnsupportedModel('h5py not installed')
+    return h5py
+
+
+def _layer_configs(f):
+    """(model config, layer configs) of a Sequential model's .h5"""
+    if 'model_config' not in f.attrs:
+        raise UnsupportedModel('no model_config (weights-only file)')
+    config = json.loads(_text(f.attrs['model_config']))
+    if config.get('class_name') != 'Sequential':
+        raise UnsupportedModel(f"{config.get('class_name')} model")
+    layer_configs = config['config']
+    if isinstance(layer_configs, dict):
+        layer_configs = layer_configs['layers']
+    return config, layer_configs
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _input_shape(options):
+    shape = options.get('batch_shape') or options.get('batch_input_shape')
+    return tuple(shape) if shape else None
+
+
+def _weight_names(group, name):
+    if name is None or name not in group:
+        return []
+    return [_text(weight_name) for weight_name in group[name].attrs.get('weight_names', [])]
+
+
+def _layer_weights(group, name):
+    return [np.asarray(group[name][weight_name], dtype=np.float32) for weight_name in _weight_names(group, name)]
+
+
+SKIPPED_LAYERS = ('InputLayer', 'Dropout', 'GaussianNoise', 'GaussianDropout', 'AlphaDropout')
+
+
+def _check_layer(layer_type, options, weight_count):
+    """Raise UnsupportedModel unless _build_layer can evaluate this layer with weight_count arrays"""
+    if layer_type in SKIPPED_LAYERS or layer_type == 'Flatten':
+        return
+    if layer_type == 'Dense':
+        if options.get('quantization_config'):
+            raise UnsupportedModel('quantized Dense')
+        activation(options.get('activation', 'linear'))
+        expected = 2 if options.get('use_bias', True) else 1
+    elif layer_type == 'Activation':
+        activation(options.get('activation'))
+        expected = 0
+    elif layer_type == 'BatchNormalization':
+        axis = options.get('axis', -1)
+        if axis not in (-1, [-1]):
+            raise UnsupportedModel(f"BatchNormalization axis {axis}")
+        expected = 2 + bool(options.get('scale', True)) + bool(options.get('center', True))
+    else:
+        raise UnsupportedModel(f"layer {layer_type}")
+    if weight_count < expected:
+        raise UnsupportedModel(f"{layer_type} {options.get('name')!r} has {weight_count} weight arrays, expected {expected}")
+
+
+def _build_layer(layer_type, options, weights):
+    """NumPy function for one Keras layer checked by _check_layer (None for layers that do nothing at inference)"""
+    if layer_type in SKIPPED_LAYERS:
+        return None
+    if layer_type == 'Dense':
+        kernel = weights[0]
+        bias = weights[1] if options.get('use_bias', True) else np.zeros(kernel.shape[1], dtype=np.float32)
+        act = activation(options.get('activation', 'linear'))
+        return lambda x: act(x @ kernel + bias)
+    if layer_type == 'Activation':
+        return activation(options.get('activation'))
+    if layer_type == 'Flatten':
+        return lambda x: x.reshape(len(x), -1)
+    # BatchNormalization
+    weights = list(weights)
+    gamma = weights.pop(0) if options.get('scale', True) else 1.0
+    beta = weights.pop(0) if options.get('center', True) else 0.0
+    mean, variance = weights
+    # Folded into one multiply-add
+    scale = (gamma / np.sqrt(variance + np.float32(options.get('epsilon', 1e-3)))).astype(np.float32)
+    shift = (beta - mean * scale).astype(np.float32)
+    return lambda x: x * scale + shift
+
+
+# ==================== Selection ====================
+def selected(name, default=False):
+    """Whether this model should be served by NumPy"""
+    value = os.environ.get(NUMPY_MODELS_ENV)
+    if value is None:
+        return default
+    return name in {item.strip() for item in value.split(',')}
+
+
+def framework(name, path, fallback_framework, default=False):
+    """
+    Registry framework of a model served through loader(): 'numpy' (fork-safe,
+    no TensorFlow) when NumPy will serve it, else the fallback's framework.
+    Called at registration, so it only checks the .h5 header (check_h5).
+    """
+    if selected(name, default):
+        try:
+            check_h5(path)
+            return 'numpy'
+        except (UnsupportedModel, OSError):
+            pass
+    return fallback_framework
+
+
+def loader(name, path, fallback, default=False):
+    """
+    Registry loader: the NumPy model when selected and supported, otherwise
+    whatever fallback() loads (the Keras model, or its replica pool).
+    """
+    def load():
+        if selected(name, default):
+            try:
+                model = NumpyMLP.from_h5(path)
+                print(f"⚡ {name} served by NumPy ({len(model.layers)} layers)")
+                return model
+            except UnsupportedModel as e:
+                print(f"⚠️ {name} not supported by NumPy inference ({e}), using Keras")
+        return fallback()
+    return load
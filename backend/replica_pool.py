@@ -0,0 +1,223 @@
+"""
+Model Replica Pool
+Concurrent requests must not share one Keras or YOLO object: the ultralytics
+predictor keeps per-call state, and Keras predict() is not safe to call from
+several threads at once. A pooled model hands every call its own replica,
+checked out for the call and returned afterwards.
+
+Replicas are created lazily, only when every existing one is busy, up to a
+bound sized from the cores (and each replica's thread count, thread_config.py)
+and from the memory still available. Past that bound, requests wait for a
+free replica instead of loading another copy. A replica that fails to load
+pauses growth with exponential backoff (SMART_FARM_RETRY_BASE_SECONDS,
+doubling up to SMART_FARM_RETRY_MAX_SECONDS, as for failed model loads); the
+existing replicas are shared meanwhile.
+
+The pool stands in for the model in the registry: predict(), __call__() and
+attributes such as input_shape, names or task behave like the model's own.
+
+Configuration:
+    SMART_FARM_REPLICAS          max replicas: "auto" (default), a number, or
+                                 per model "cattle_densenet=2,cattle_yolo_disease=4"
+    SMART_FARM_REPLICA_TIMEOUT   seconds a call waits for a free replica (default 120)
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import thread_config
+from model_registry import (DEFAULT_RETRY_BASE, DEFAULT_RETRY_MAX, RETRY_BASE_ENV, RETRY_MAX_ENV,
+                            current_rss_bytes)
+
+REPLICAS_ENV = 'SMART_FARM_REPLICAS'
+REPLICA_TIMEOUT_ENV = 'SMART_FARM_REPLICA_TIMEOUT'
+
+DEFAULT_REPLICA_TIMEOUT = 120.0
+# Keep this much more memory available than a replica is expected to take
+MEMORY_HEADROOM = 1.5
+
+# Thread count setting that a replica of each framework uses per call
+_THREAD_SETTING = {'tensorflow': 'intra_op_threads', 'ultralytics': 'threads'}
+
+
+class ReplicaTimeout(RuntimeError):
+    """No replica became free in time"""
+
+
+def available_memory_bytes():
+    """MemAvailable from /proc/meminfo (None where unavailable)"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def default_size(framework):
+    """One replica per group of cores a single call's thread pool uses"""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    threads = thread_config.settings(framework).get(_THREAD_SETTING.get(framework)) or 1
+    return max(1, cores // int(threads))
+
+
+def configured_size(name, framework):
+    value = os.environ.get(REPLICAS_ENV, '').strip()
+    if not value or value == 'auto':
+        return default_size(framework)
+    if value.isdigit():
+        return max(1, int(value))
+    for item in value.split(','):
+        key, _, size = item.partition('=')
+        if key.strip() == name and size.strip().isdigit():
+            return max(1, int(size))
+    return default_size(framework)
+
+
+class ReplicaPool:
+    """Bounded set of interchangeable model replicas with checkout/return"""
+
+    def __init__(self, name, primary, factory, max_size, warmup=None, replica_bytes=None, timeout=None):
+        self.name = name
+        self.primary = primary
+        self.max_size = max_size
+        self.replica_bytes = replica_bytes
+        self.timeout = float(os.environ.get(REPLICA_TIMEOUT_ENV, DEFAULT_REPLICA_TIMEOUT)) if timeout is None else timeout
+        self._factory = factory
+        self._warmup = warmup
+        self._replicas = [primary]
+        self._free = [primary]
+        self._creating = 0
+        self._cond = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.growth_refused = 0
+        self.growth_error = None
+        self.growth_failures = 0
+        self._grow_after = 0.0
+        self.retry_base = float(os.environ.get(RETRY_BASE_ENV, DEFAULT_RETRY_BASE))
+        self.retry_max = float(os.environ.get(RETRY_MAX_ENV, DEFAULT_RETRY_MAX))
+
+    def __getattr__(self, attr):
+        # Only called for attributes the pool does not have: input_shape, names, task...
+        if attr == 'primary':
+            raise AttributeError(attr)
+        return getattr(self.primary, attr)
+
+    # ---------- Checkout ----------
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Exclusive use of one replica for the duration of a with-block"""
+        replica = self._take(self.timeout if timeout is None else timeout)
+        try:
+            yield replica
+        finally:
+            with self._cond:
+                self._free.append(replica)
+                self._cond.notify()
+
+    def _take(self, timeout, count=True):
+        deadline = time.monotonic() + timeout
+        waited = not count
+        with self._cond:
+            if count:
+                self.checkouts += 1
+            while True:
+                if self._free:
+                    return self._free.pop()
+                if self._can_grow():
+                    self._creating += 1
+                    break
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ReplicaTimeout(f"{self.name}: no free replica after {timeout:g}s")
+                self._cond.wait(remaining)
+        return self._grow(deadline)
+
+    def _can_grow(self):
+        if len(self._replicas) + self._creating >= self.max_size:
+            return False
+        if time.monotonic() < self._grow_after:
+            return False  # backing off after a failed replica load
+        available = available_memory_bytes()
+        if self.replica_bytes and available is not None and available < self.replica_bytes * MEMORY_HEADROOM:
+            self.growth_refused += 1
+            return False
+        return True
+
+    def _grow(self, deadline):
+        """Create, warm up and hand out a new replica (outside the lock)"""
+        try:
+            replica = self._factory()
+            if self._warmup is not None:
+                self._warmup(replica)
+        except Exception as e:
+            with self._cond:
+                self._creating -= 1
+                # Share the replicas that exist for a while, then try again
+                self.growth_failures += 1
+                delay = min(self.retry_base * 2 ** (self.growth_failures - 1), self.retry_max)
+                self._grow_after = time.monotonic() + delay
+                self.growth_error = str(e)
+                count = len(self._replicas)
+                self._cond.notify_all()
+            print(f"⚠️ {self.name} replica could not be created, staying at {count} "
+                  f"(retry in {delay:.0f}s): {e}")
+            return self._take(max(deadline - time.monotonic(), 0), count=False)
+        with self._cond:
+            self._creating -= 1
+            self._replicas.append(replica)
+            self.growth_failures = 0
+            self.growth_error = None
+            count = len(self._replicas)
+        print(f"➕ {self.name} replica {count}/{self.max_size} ready")
+        return replica
+
+    # ---------- Model interface ----------
+    def predict(self, *args, **kwargs):
+        with self.checkout() as replica:
+            return replica.predict(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        with self.checkout() as replica:
+            return replica(*args, **kwargs)
+
+    # ---------- Status ----------
+    def replica_count(self):
+        return len(self._replicas)
+
+    def pool_status(self):
+        with self._cond:
+            return {
+                'replicas': len(self._replicas),
+                'max_replicas': self.max_size,
+                'in_use': len(self._replicas) - len(self._free),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'growth_refused': self.growth_refused,
+                'growth_error': self.growth_error,
+                'growth_retry_in_seconds': round(max(self._grow_after - time.monotonic(), 0.0), 1)
+            }
+
+
+def pooled(name, loader, framework, warmup=None):
+    """Wrap a registry loader so the model is served from a replica pool"""
+    def load():
+        rss_before = current_rss_bytes()
+        primary = loader()
+        rss_after = current_rss_bytes()
+        replica_bytes = None
+        if rss_before is not None and rss_after is not None and rss_after > rss_before:
+            replica_bytes = rss_after - rss_before
+        return ReplicaPool(
+            name, primary, loader, configured_size(name, framework),
+            warmup=warmup, replica_bytes=replica_bytes
+        )
+    return load
@@ -0,0 +1,184 @@
+"""
+Result Cache
+Responses of the single-record tabular endpoints (milk market, nutrition,
+egg hatch, manual cow feed) cached per service. Mobile clients resubmit the
+same request on every refresh; a repeat is answered from memory instead of
+running the model again.
+
+The key is the canonical form of the request body: keys sorted, numbers
+compared by value (5 == 5.0), strings stripped and title-cased the way the
+endpoints read them (nutrition keeps them as sent: its pipeline one-hot
+encodes the strings exactly as given). It also holds the registry generation
+of every model the service uses, taken from the same registry lookup as the
+models the endpoint predicts with. A reload (hot reload, or a reload after
+eviction) makes the older entries unreachable, and the cache drops them the
+next time it sees the new generation; a result computed by a request that
+still held the replaced model is not stored. Only successful results are
+stored.
+
+Each process keeps its own caches (one per gunicorn worker). The counters are
+under "result_cache" in /metrics.
+
+Configuration:
+    SMART_FARM_RESULT_CACHE=0           disable
+    SMART_FARM_RESULT_CACHE_SIZE        entries per service (default 1024)
+    SMART_FARM_RESULT_CACHE_TTL         seconds an entry stays valid (default 300)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from model_registry import env_flag
+
+RESULT_CACHE_ENV = 'SMART_FARM_RESULT_CACHE'
+RESULT_CACHE_SIZE_ENV = 'SMART_FARM_RESULT_CACHE_SIZE'
+RESULT_CACHE_TTL_ENV = 'SMART_FARM_RESULT_CACHE_TTL'
+
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 300.0
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def title_text(value):
+    return value.strip().title()
+
+
+def canonical(value, text=title_text):
+    """Hashable, order-independent form of a JSON value"""
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), canonical(item, text)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(item, text) for item in value)
+    if isinstance(value, str):
+        return text(value)
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return repr(value)
+
+
+class ResultCache:
+    """LRU cache with a TTL for one service, keyed by request and model generations"""
+
+    def __init__(self, service, models, registry, max_entries=None, ttl=None, text=title_text):
+        self.service = service
+        self.models = list(models)
+        self.registry = registry
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get(RESULT_CACHE_SIZE_ENV, DEFAULT_SIZE))
+        self.ttl = ttl if ttl is not None else float(os.environ.get(RESULT_CACHE_TTL_ENV, DEFAULT_TTL))
+        self.enabled = env_flag(RESULT_CACHE_ENV, True) and self.max_entries > 0
+        self.text = text
+        self._entries = OrderedDict()
+        self._generations = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, payload, generations=None):
+        """
+        Cache key for a request body; None when it can't be cached.
+        generations ({model: generation}) should come with the models the
+        result is computed from (registry.get_versioned()); reading them
+        here instead races with a reload finishing in between.
+        """
+        if not isinstance(payload, dict):
+            return None
+        if generations is None:
+            generations = {name: self.registry.generation(name) for name in self.models}
+        generations = tuple(generations[name] for name in self.models)
+        with self._lock:
+            # A request still holding a replaced model must not roll the cache
+            # back: its key simply never matches, and put() refuses it
+            newer = self._generations is None or all(
+                new >= old for new, old in zip(generations, self._generations))
+            if generations != self._generations and newer:
+                if self._generations is not None and self._entries:
+                    self._entries.clear()
+                    self.invalidations += 1
+                self._generations = generations
+        return generations, canonical(payload, self.text)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        with self._lock:
+            # Computed on a generation that has since been replaced
+            if key[0] != self._generations:
+                return
+            now = time.monotonic()
+            self._entries[key] = (now + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, (expires_at, _) = self._entries.popitem(last=False)
+                if expires_at > now:
+                    self.evictions += 1
+                else:
+                    self.expirations += 1
+
+    def get_or_compute(self, payload, compute, generations=None):
+        """The cached result for this request, or compute() (stored if it returns)"""
+        key = self.key(payload, generations) if self.enabled else None
+        if key is None:
+            return compute()
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits_total': self.hits,
+                'misses_total': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions_total': self.evictions,
+                'expirations_total': self.expirations,
+                'invalidations_total': self.invalidations
+            }
+
+
+def for_service(service, models, registry, **options):
+    """The process-wide cache for a service (created on first use)"""
+    cache = _caches.get(service)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(service)
+            if cache is None:
+                cache = _caches[service] = ResultCache(service, models, registry, **options)
+    return cache
+
+
+def metrics():
+    """Counters of every service cache, for /metrics"""
+    return {service: cache.metrics() for service, cache in sorted(_caches.items())}
@@ -0,0 +1,108 @@
+"""
+Startup Import Report
+Runs `python -X importtime` against a module in a fresh interpreter and
+summarizes where the import time goes, so the cold-start budget of the API
+can be tracked and capped.
+
+Usage:
+    python startup_report.py                 # report for app.py
+    python startup_report.py --budget 3.0    # exit 1 if import takes > 3s
+    python app.py --import-report --import-budget 3.0
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr_text):
+    """Parse `-X importtime` output into (package, self_us, cumulative_us, depth) rows"""
+    rows = []
+    for line in stderr_text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            continue  # header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def measure_imports(module='app', env=None):
+    """Import `module` in a child interpreter with -X importtime and return parsed rows"""
+    child_env = dict(os.environ if env is None else env)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR,
+        env=child_env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        # importtime lines are still useful, but surface the failure
+        print(result.stderr.splitlines()[-1] if result.stderr else 'import failed')
+    return parse_importtime(result.stderr), result.returncode
+
+
+def summarize(rows, top=15):
+    """Total import time plus the slowest first-level dependencies"""
+    top_level = [row for row in rows if row[3] == 0]
+    total_us = sum(row[2] for row in top_level)
+    # Depth 1 rows are the modules imported directly by a top-level import,
+    # e.g. numpy, pandas, flask or tensorflow when measuring app.py
+    dependencies = [row for row in rows if row[3] == 1]
+    slowest = sorted(dependencies, key=lambda row: row[2], reverse=True)[:top]
+    return {
+        'total_seconds': round(total_us / 1e6, 3),
+        'modules_imported': len(rows),
+        'slowest': [
+            {'module': name, 'cumulative_seconds': round(cumulative / 1e6, 3)}
+            for name, _, cumulative, _ in slowest
+        ]
+    }
+
+
+def print_report(summary, budget=None):
+    print("\n" + "=" * 60)
+    print("⏱️ Startup Import Report")
+    print("=" * 60)
+    print(f"Total import time: {summary['total_seconds']:.3f}s "
+          f"({summary['modules_imported']} modules)")
+    print("\nSlowest direct imports:")
+    for item in summary['slowest']:
+        print(f"  {item['cumulative_seconds']:8.3f}s  {item['module']}")
+    if budget is not None:
+        status = "✓ within" if summary['total_seconds'] <= budget else "✗ over"
+        print(f"\n{status} budget of {budget:.3f}s")
+    print("=" * 60 + "\n")
+
+
+def run(module='app', budget=None, top=15):
+    """Measure, print and return an exit code honouring the budget"""
+    rows, returncode = measure_imports(module)
+    summary = summarize(rows, top=top)
+    print_report(summary, budget)
+    if returncode != 0:
+        return returncode
+    if budget is not None and summary['total_seconds'] > budget:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report import time of the backend")
+    parser.add_argument('--module', default='app', help="Module to import (default: app)")
+    parser.add_argument('--budget', type=float, default=None, help="Fail if import takes longer (seconds)")
+    parser.add_argument('--top', type=int, default=15, help="Number of slow imports to list")
+    args = parser.parse_args()
+    sys.exit(run(args.module, args.budget, args.top))
@@ -0,0 +1,189 @@
+"""
+Tabular Batch Prediction
+Shared plumbing for the batch variants of the tabular endpoints: parse an
+array of records, validate every record on its own, run one vectorized
+predict per model over the valid rows, and return results aligned with the
+input, with an error for each record that could not be scored.
+
+Request body:  {"records": [{...}, {...}]}  (a bare JSON array also works)
+Response:      {"count": 3, "succeeded": 2, "failed": 1,
+                "results": [{"index": 0, ...}, {"index": 1, "error": "..."}, ...]}
+
+grid() expands a scenario sweep instead: each input is a number, a list of
+values or a range, and the rows are the cartesian product of all inputs.
+
+Sweep input:   {"month": {"start": 1, "stop": 12, "step": 1},
+                "feed_quality": [1, 2, 3], "fat_percentage": 3.8, ...}
+               (a range can also give "num" evenly spaced values instead of "step")
+
+Configuration:
+    SMART_FARM_BATCH_MAX_RECORDS   largest accepted batch (default 5000)
+    SMART_FARM_SWEEP_MAX_ROWS      largest accepted sweep grid (default 10000)
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+BATCH_MAX_RECORDS_ENV = 'SMART_FARM_BATCH_MAX_RECORDS'
+DEFAULT_BATCH_MAX_RECORDS = 5000
+SWEEP_MAX_ROWS_ENV = 'SMART_FARM_SWEEP_MAX_ROWS'
+DEFAULT_SWEEP_MAX_ROWS = 10000
+
+
+class BatchError(ValueError):
+    """The batch as a whole is unusable (not per-row); carries an HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_records():
+    return int(os.environ.get(BATCH_MAX_RECORDS_ENV, DEFAULT_BATCH_MAX_RECORDS))
+
+
+def parse_records(data):
+    """The list of records from a batch request body"""
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        raise BatchError('Expected {"records": [...]} or a JSON array of records')
+    if not records:
+        raise BatchError('No records given')
+    if len(records) > max_records():
+        raise BatchError(f"Too many records: {len(records)} (max {max_records()})", status=413)
+    return records
+
+
+def number(record, key):
+    """A required numeric field"""
+    if key not in record:
+        raise ValueError(f"missing field '{key}'")
+    try:
+        return float(record[key])
+    except (TypeError, ValueError):
+        raise ValueError(f"field '{key}' must be a number, got {record[key]!r}")
+
+
+def text(record, key):
+    """A required string field"""
+    if key not in record:
+        raise ValueError(f"missing field '{key}'")
+    if not isinstance(record[key], str):
+        raise ValueError(f"field '{key}' must be a string, got {record[key]!r}")
+    return record[key]
+
+
+def build_rows(records, build_row):
+    """
+    Validate records one by one. Returns (rows, indices, errors): the rows
+    that passed, their positions in the input, and {position: message}.
+    """
+    rows, indices, errors = [], [], {}
+    for index, record in enumerate(records):
+        try:
+            if not isinstance(record, (dict, list)):
+                raise ValueError('record must be an object')
+            rows.append(build_row(record))
+            indices.append(index)
+        except (KeyError, TypeError, ValueError) as e:
+            errors[index] = str(e)
+    return rows, indices, errors
+
+
+def predict_rows(predict, frame, indices, errors):
+    """
+    One vectorized predict over all valid rows. If it fails (e.g. one row has
+    a category the model never saw), rows are retried one at a time so only
+    the offending rows are reported as errors. Returns {position: output}.
+    """
+    if not indices:
+        return {}
+    try:
+        return dict(zip(indices, predict(frame)))
+    except Exception:
+        outputs = {}
+        for offset, index in enumerate(indices):
+            try:
+                outputs[index] = predict(frame.iloc[[offset]] if isinstance(frame, pd.DataFrame)
+                                         else frame[offset:offset + 1])[0]
+            except Exception as e:
+                errors[index] = str(e)
+        return outputs
+
+
+def respond(count, outputs, errors, format_result):
+    """Results aligned with the input records"""
+    results = []
+    for index in range(count):
+        if index in errors:
+            results.append({'index': index, 'error': errors[index]})
+            continue
+        try:
+            results.append({'index': index, **format_result(index, outputs[index])})
+        except Exception as e:
+            results.append({'index': index, 'error': str(e)})
+    failed = sum(1 for result in results if 'error' in result)
+    return {'count': count, 'succeeded': count - failed, 'failed': failed, 'results': results}
+
+
+# ==================== Scenario Grids ====================
+def sweep_max_rows():
+    return int(os.environ.get(SWEEP_MAX_ROWS_ENV, DEFAULT_SWEEP_MAX_ROWS))
+
+
+def axis_values(spec, key, limit):
+    """Values of one sweep input: a number, a list of numbers or {"start", "stop", "step" | "num"}"""
+    if isinstance(spec, dict):
+        try:
+            start, stop = number(spec, 'start'), number(spec, 'stop')
+            step = None if 'num' in spec else number(spec, 'step')
+            count = int(number(spec, 'num')) if step is None else None
+        except ValueError as e:
+            raise ValueError(f"range for '{key}': {e}")
+        if step is not None:
+            if step <= 0 or stop < start:
+                raise ValueError(f"field '{key}': range needs start <= stop and a positive step")
+            # stop is included when the steps land on it
+            count = math.floor((stop - start) / step + 1e-9) + 1
+        if count > limit:
+            raise BatchError(f"field '{key}' has {count} values (max {limit})", status=413)
+        if count < 1:
+            raise ValueError(f"field '{key}' has no values")
+        if step is None:
+            return np.linspace(start, stop, count)
+        # Rounded so 0.1 steps read 0.3, not 0.30000000000000004
+        return np.round(start + step * np.arange(count), 10)
+    values = spec if isinstance(spec, list) else [spec]
+    if not values:
+        raise ValueError(f"field '{key}' has no values")
+    if len(values) > limit:
+        raise BatchError(f"field '{key}' has {len(values)} values (max {limit})", status=413)
+    return np.array([number({key: value}, key) for value in values])
+
+
+def grid(body, keys, max_rows=None):
+    """
+    Cartesian product of the sweep inputs. Returns ({key: axis values},
+    {key: column over all rows}), the first key varying slowest.
+    """
+    if not isinstance(body, dict):
+        raise BatchError('Expected a JSON object of sweep inputs')
+    limit = max_rows or sweep_max_rows()
+    axes = {}
+    for key in keys:
+        if key not in body:
+            raise BatchError(f"missing field '{key}'")
+        try:
+            axes[key] = axis_values(body[key], key, limit)
+        except BatchError:
+            raise
+        except ValueError as e:
+            raise BatchError(str(e))
+    rows = math.prod(len(values) for values in axes.values())
+    if rows > limit:
+        raise BatchError(f"Sweep has {rows} rows (max {limit})", status=413)
+    mesh = np.meshgrid(*axes.values(), indexing='ij')
+    return axes, {key: column.reshape(-1) for key, column in zip(axes, mesh)}
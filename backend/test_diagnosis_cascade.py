@@ -0,0 +1,179 @@
+"""
+Equivalence tests for diagnosis_cascade: the batched cascade must give the
+labels and top-k confidences of the old per-case path (one-row DataFrame in
+feature order, scaler.transform, predict/predict_proba, argsort top 3).
+
+Run: python -m pytest test_diagnosis_cascade.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+import diagnosis_cascade
+import tree_runtime
+
+DISEASES = ['FMD', 'Lumpy Skin', 'Mastitis', 'Pneumonia']
+PREVIOUS = ['FMD', 'Mastitis', 'None']
+TREATMENTS = ['Antibiotics', 'Anti-inflammatory', 'Isolation', 'Rest', 'Vaccination']
+
+# Not alphabetical or in construction order: columns are stacked by name
+SEVERITY_FEATURES = [
+    'Temperature', 'Disease_Encoded', 'Has_History', 'Weight', 'Age',
+    'Weight_Age_Ratio', 'Previous_Disease_Encoded', 'Temp_Deviation'
+]
+TREATMENT_FEATURES = [
+    'Severity_Temp_Interaction', 'Disease_Encoded', 'Severity', 'Weight', 'Age', 'Temperature',
+    'Previous_Disease_Encoded', 'Temp_Deviation', 'Weight_Age_Ratio', 'Has_History'
+]
+
+RNG = np.random.default_rng(0)
+
+
+def fit_bundle(features, classes):
+    """Severity/treatment bundle like cattle_models.load_bundle builds, on random training rows"""
+    X = RNG.normal(size=(300, len(features))) * 3 + 10
+    y = np.digitize(X[:, 0] + X[:, 1] - 20, np.linspace(-4, 4, classes - 1))
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=15, max_depth=6, random_state=0)
+    model.fit(scaler.transform(X), y)
+    encoders = {
+        'Disease': LabelEncoder().fit(DISEASES),
+        'Previous_Disease': LabelEncoder().fit(PREVIOUS),
+        'Treatment': LabelEncoder().fit(TREATMENTS),
+    }
+    return {'model': tree_runtime.compile_model(model), 'scaler': scaler,
+            'encoders': encoders, 'features': features, 'original': model}
+
+
+@pytest.fixture(scope='module')
+def bundles():
+    severity, treatment = fit_bundle(SEVERITY_FEATURES, 3), fit_bundle(TREATMENT_FEATURES, len(TREATMENTS))
+    # The cascade runs the compiled trees, the old path sklearn's predict_proba
+    assert isinstance(severity['model'], tree_runtime.CompiledClassifier)
+    return severity, treatment
+
+
+def random_cases(count, diseases=DISEASES):
+    return (
+        list(RNG.choice(diseases, count)),
+        RNG.uniform(200, 700, count),
+        RNG.integers(6, 120, count).astype(float),
+        RNG.uniform(37.5, 41.5, count),
+        list(RNG.choice(PREVIOUS + [None, '', 'Anthrax'], count)),
+    )
+
+
+# ==================== Old per-case path ====================
+def old_encode(encoder, label, unknown_disease=None):
+    try:
+        return encoder.transform([label])[0]
+    except ValueError:
+        if unknown_disease is None:
+            raise
+        return unknown_disease
+
+
+def old_previous(encoder, previous):
+    if previous is None or previous in ('', 'None'):
+        return 0
+    try:
+        return encoder.transform([previous])[0]
+    except ValueError:
+        return 0
+
+
+def old_predict(bundle, row):
+    features = bundle['scaler'].transform(pd.DataFrame([row])[bundle['features']].to_numpy())
+    return bundle['original'].predict(features)[0], bundle['original'].predict_proba(features)[0]
+
+
+def old_case(severity, treatment, disease, weight, age, temperature, previous, unknown_disease=None):
+    temp_deviation = temperature - 38.5
+    weight_age_ratio = weight / (age + 1)
+
+    encoders = severity['encoders']
+    prev_encoded = old_previous(encoders['Previous_Disease'], previous)
+    row = {
+        'Disease_Encoded': old_encode(encoders['Disease'], disease, unknown_disease),
+        'Weight': weight, 'Age': age, 'Temperature': temperature,
+        'Previous_Disease_Encoded': prev_encoded, 'Temp_Deviation': temp_deviation,
+        'Weight_Age_Ratio': weight_age_ratio, 'Has_History': 1 if prev_encoded > 0 else 0
+    }
+    severity_level, severity_proba = old_predict(severity, row)
+
+    encoders = treatment['encoders']
+    prev_encoded = old_previous(encoders['Previous_Disease'], previous)
+    row.update({
+        'Disease_Encoded': old_encode(encoders['Disease'], disease, unknown_disease),
+        'Previous_Disease_Encoded': prev_encoded, 'Has_History': 1 if prev_encoded > 0 else 0,
+        'Severity': severity_level, 'Severity_Temp_Interaction': severity_level * temp_deviation
+    })
+    treatment_index, treatment_proba = old_predict(treatment, row)
+    top3 = np.argsort(treatment_proba)[-3:][::-1]
+    return severity_level, severity_proba, treatment_index, treatment_proba, top3
+
+
+# ==================== Tests ====================
+def test_run_matches_old_path(bundles):
+    severity, treatment = bundles
+    columns = random_cases(200, DISEASES)
+    results = diagnosis_cascade.run(severity, treatment, diagnosis_cascade.ClinicalCases(*columns))
+
+    names = treatment['encoders']['Treatment'].classes_
+    assert len(results) == 200
+    for result, case in zip(results, zip(*columns)):
+        level, severity_proba, index, treatment_proba, top3 = old_case(severity, treatment, *case)
+        assert result['severity'] == {
+            'level': diagnosis_cascade.SEVERITY_CLASSES[level],
+            'confidence': round(float(severity_proba[level]), 4),
+            'probabilities': {name: round(float(p), 4)
+                              for name, p in zip(diagnosis_cascade.SEVERITY_CLASSES, severity_proba)}
+        }
+        assert result['treatment'] == {
+            'primary': names[index],
+            'confidence': round(float(treatment_proba[index]), 4),
+            'alternatives': [{'treatment': names[i], 'probability': round(float(treatment_proba[i]), 4)}
+                             for i in top3]
+        }
+
+
+def test_without_treatment_bundle(bundles):
+    severity, _ = bundles
+    cases = diagnosis_cascade.ClinicalCases(*random_cases(5))
+    results = diagnosis_cascade.run(severity, None, cases)
+    assert [set(result) for result in results] == [{'severity'}] * 5
+
+
+def test_unknown_disease_fallback_matches_old_path(bundles):
+    # The integrated workflow maps an unseen disease to the first category
+    severity, treatment = bundles
+    columns = random_cases(50, DISEASES + ['Anthrax'])
+    cases = diagnosis_cascade.ClinicalCases(*columns)
+    levels, severity_proba = diagnosis_cascade.assess_severity(severity, cases, unknown_disease=0)
+    indices, treatment_proba, top = diagnosis_cascade.recommend_treatment(
+        treatment, cases, levels, unknown_disease=0
+    )
+
+    assert 'Anthrax' in columns[0]
+    for position, case in enumerate(zip(*columns)):
+        level, old_severity, index, old_treatment, top3 = old_case(severity, treatment, *case, unknown_disease=0)
+        assert levels[position] == level
+        np.testing.assert_allclose(severity_proba[position], old_severity)
+        assert indices[position] == index
+        np.testing.assert_allclose(treatment_proba[position], old_treatment)
+        assert list(top[position]) == list(top3)
+
+
+def test_unknown_disease_rejected_by_default(bundles):
+    severity, treatment = bundles
+    cases = diagnosis_cascade.ClinicalCases(['Anthrax'], [400], [30], [39.0])
+    with pytest.raises(ValueError, match='Anthrax'):
+        diagnosis_cascade.run(severity, treatment, cases)
+
+
+def test_mismatched_columns_rejected():
+    with pytest.raises(ValueError):
+        diagnosis_cascade.ClinicalCases(['FMD', 'Mastitis'], [400], [30, 40], [39.0, 39.5])
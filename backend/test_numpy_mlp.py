@@ -0,0 +1,148 @@
+"""
+Parity tests for numpy_mlp: the NumPy forward pass must match Keras.
+
+Run: python -m pytest test_numpy_mlp.py
+(the Keras comparisons are skipped when TensorFlow is not installed)
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import numpy_mlp
+
+h5py = pytest.importorskip('h5py')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EGG_HATCH_NN = os.path.join(BASE_DIR, 'egg_hatch', 'egg_hatch_nn.h5')
+RNG = np.random.default_rng(0)
+
+
+def write_sequential(path, layers, weights):
+    """Minimal Keras-style .h5: model_config plus model_weights/<layer>/<weight>"""
+    with h5py.File(path, 'w') as f:
+        f.attrs['model_config'] = json.dumps({'class_name': 'Sequential', 'config': {'layers': layers}})
+        group = f.create_group('model_weights')
+        for layer in layers:
+            name = layer['config']['name']
+            layer_group = group.create_group(name)
+            arrays = weights.get(name, [])
+            layer_group.attrs['weight_names'] = [f'{name}/w{i}'.encode() for i in range(len(arrays))]
+            for i, array in enumerate(arrays):
+                layer_group.create_dataset(f'{name}/w{i}', data=array)
+
+
+def dense(name, units, activation):
+    return {'class_name': 'Dense', 'config': {'name': name, 'units': units, 'activation': activation, 'use_bias': True}}
+
+
+def test_forward_pass_matches_weights(tmp_path):
+    w1, b1 = RNG.normal(size=(5, 8)).astype(np.float32), RNG.normal(size=8).astype(np.float32)
+    w2, b2 = RNG.normal(size=(8, 3)).astype(np.float32), RNG.normal(size=3).astype(np.float32)
+    gamma, beta = RNG.uniform(0.5, 2, 8).astype(np.float32), RNG.normal(size=8).astype(np.float32)
+    mean, variance = RNG.normal(size=8).astype(np.float32), RNG.uniform(0.5, 2, 8).astype(np.float32)
+    path = str(tmp_path / 'mlp.h5')
+    write_sequential(path, [
+        {'class_name': 'InputLayer', 'config': {'name': 'input', 'batch_shape': [None, 5]}},
+        dense('d1', 8, 'relu'),
+        {'class_name': 'BatchNormalization', 'config': {'name': 'bn', 'epsilon': 1e-3}},
+        {'class_name': 'Dropout', 'config': {'name': 'drop', 'rate': 0.5}},
+        dense('d2', 3, 'linear'),
+        {'class_name': 'Activation', 'config': {'name': 'act', 'activation': 'softmax'}}
+    ], {'d1': [w1, b1], 'bn': [gamma, beta, mean, variance], 'd2': [w2, b2]})
+
+    model = numpy_mlp.NumpyMLP.from_h5(path)
+    x = RNG.normal(size=(64, 5)).astype(np.float32)
+    hidden = np.maximum(x @ w1 + b1, 0)
+    hidden = (hidden - mean) / np.sqrt(variance + 1e-3) * gamma + beta
+    logits = hidden @ w2 + b2
+    expected = np.exp(logits - logits.max(axis=1, keepdims=True))
+    expected /= expected.sum(axis=1, keepdims=True)
+
+    actual = model.predict(x, verbose=0)
+    assert actual.dtype == np.float32 and actual.shape == (64, 3)
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
+    assert model.input_shape == (None, 5)
+    assert numpy_mlp.framework('mlp', path, 'tensorflow', default=True) == 'numpy'
+
+
+def test_unsupported_layer_falls_back(tmp_path):
+    path = str(tmp_path / 'conv.h5')
+    write_sequential(path, [{'class_name': 'Conv2D', 'config': {'name': 'conv'}}], {})
+    with pytest.raises(numpy_mlp.UnsupportedModel):
+        numpy_mlp.NumpyMLP.from_h5(path)
+    assert numpy_mlp.loader('conv', path, lambda: 'keras model', default=True)() == 'keras model'
+    assert numpy_mlp.framework('conv', path, 'tensorflow', default=True) == 'tensorflow'
+
+
+def test_unexpected_layout_falls_back(tmp_path):
+    # Dense without its kernel/bias datasets
+    path = str(tmp_path / 'missing_weights.h5')
+    write_sequential(path, [dense('d1', 4, 'relu')], {})
+    with pytest.raises(numpy_mlp.UnsupportedModel):
+        numpy_mlp.NumpyMLP.from_h5(path)
+    assert numpy_mlp.loader('d1', path, lambda: 'keras model', default=True)() == 'keras model'
+    assert numpy_mlp.framework('d1', path, 'tensorflow', default=True) == 'tensorflow'
+
+
+def test_framework_reads_header_only(monkeypatch, tmp_path):
+    path = str(tmp_path / 'mlp.h5')
+    write_sequential(path, [dense('d1', 2, 'relu')], {'d1': [np.ones((3, 2), np.float32), np.zeros(2, np.float32)]})
+
+    def no_weights(group, name):
+        raise AssertionError('weights read at registration')
+    monkeypatch.setattr(numpy_mlp, '_layer_weights', no_weights)
+    assert numpy_mlp.framework('mlp', path, 'tensorflow', default=True) == 'numpy'
+    assert numpy_mlp.framework('mlp', path, 'tensorflow') == 'tensorflow'  # not selected: file not opened
+
+
+def test_selection_from_environment(monkeypatch, tmp_path):
+    monkeypatch.delenv(numpy_mlp.NUMPY_MODELS_ENV, raising=False)
+    assert numpy_mlp.selected('egg_hatch_nn', default=True)
+    assert not numpy_mlp.selected('egg_hatch_nn')
+    monkeypatch.setenv(numpy_mlp.NUMPY_MODELS_ENV, 'none')
+    assert not numpy_mlp.selected('egg_hatch_nn', default=True)
+    monkeypatch.setenv(numpy_mlp.NUMPY_MODELS_ENV, 'other, egg_hatch_nn')
+    assert numpy_mlp.selected('egg_hatch_nn')
+
+
+# ==================== Keras parity ====================
+def keras_parity(keras_model, path, batch=256):
+    model = numpy_mlp.NumpyMLP.from_h5(path)
+    n_features = keras_model.input_shape[-1]
+    for x in (RNG.normal(size=(batch, n_features)), RNG.normal(size=(1, n_features)) * 3):
+        x = x.astype(np.float32)
+        np.testing.assert_allclose(model.predict(x), keras_model.predict(x, verbose=0), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.skipif(not os.path.exists(EGG_HATCH_NN), reason='egg hatch model not available')
+def test_egg_hatch_nn_matches_keras():
+    tf = pytest.importorskip('tensorflow')
+    keras_parity(tf.keras.models.load_model(EGG_HATCH_NN, compile=False), EGG_HATCH_NN)
+
+
+@pytest.mark.parametrize('activation', ['relu', 'sigmoid', 'tanh', 'elu', 'selu', 'softplus', 'swish'])
+def test_random_dense_model_matches_keras(tmp_path, activation):
+    tf = pytest.importorskip('tensorflow')
+    keras = tf.keras
+    model = keras.Sequential([
+        keras.Input(shape=(7,)),
+        keras.layers.Dense(16, activation=activation),
+        keras.layers.BatchNormalization(),
+        keras.layers.Dropout(0.3),
+        keras.layers.Dense(8),
+        keras.layers.Activation(activation),
+        keras.layers.Dense(2, activation='softmax')
+    ])
+    # Non-trivial batch norm statistics
+    batch_norm = model.layers[1]
+    gamma, beta, mean, variance = batch_norm.get_weights()
+    batch_norm.set_weights([
+        RNG.uniform(0.5, 2, gamma.shape), RNG.normal(size=beta.shape),
+        RNG.normal(size=mean.shape), RNG.uniform(0.5, 2, variance.shape)
+    ])
+    path = str(tmp_path / f'{activation}.h5')
+    model.save(path)
+    keras_parity(model, path)
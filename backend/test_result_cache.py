@@ -0,0 +1,136 @@
+"""
+Tests for result_cache: canonical keys, TTL expiry and invalidation when a
+model is reloaded.
+
+Run: python -m pytest test_result_cache.py
+"""
+
+import pytest
+
+import result_cache
+
+
+class StubRegistry:
+    """Just the generation counters a ResultCache reads"""
+
+    def __init__(self, **generations):
+        self.generations = generations
+
+    def generation(self, name):
+        return self.generations[name]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, 'monotonic', clock)
+    return clock
+
+
+def make_cache(registry=None, **options):
+    registry = registry or StubRegistry(model=1)
+    options.setdefault('max_entries', 8)
+    options.setdefault('ttl', 60)
+    return result_cache.ResultCache('test', ['model'], registry, **options)
+
+
+def counting(result):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return result
+    return compute, calls
+
+
+def test_hit_for_reordered_and_recased_payload():
+    cache = make_cache()
+    compute, calls = counting({'value': 1})
+    assert cache.get_or_compute({'breed': ' holstein ', 'age': 5}, compute) == {'value': 1}
+    assert cache.get_or_compute({'age': 5.0, 'breed': 'Holstein'}, compute) == {'value': 1}
+    assert len(calls) == 1
+    metrics = cache.metrics()
+    assert (metrics['hits_total'], metrics['misses_total']) == (1, 1)
+
+
+def test_exact_strings_when_text_is_kept():
+    # Nutrition: the pipeline one-hot encodes the strings as sent
+    cache = make_cache(text=str)
+    compute, calls = counting({'value': 1})
+    cache.get_or_compute({'breed': 'Friesian'}, compute)
+    cache.get_or_compute({'breed': ' Friesian'}, compute)
+    assert len(calls) == 2
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = make_cache(ttl=10)
+    compute, calls = counting({'value': 1})
+    cache.get_or_compute({'a': 1}, compute)
+    clock.now += 9
+    cache.get_or_compute({'a': 1}, compute)
+    assert len(calls) == 1
+    clock.now += 2
+    cache.get_or_compute({'a': 1}, compute)
+    assert len(calls) == 2
+    assert cache.metrics()['expirations_total'] == 1
+
+
+def test_lru_eviction():
+    cache = make_cache(max_entries=2)
+    compute, calls = counting({'value': 1})
+    for a in (1, 2, 1, 3):  # 2 is the least recently used when 3 arrives
+        cache.get_or_compute({'a': a}, compute)
+    cache.get_or_compute({'a': 1}, compute)
+    assert len(calls) == 3
+    cache.get_or_compute({'a': 2}, compute)
+    assert len(calls) == 4
+    assert cache.metrics()['evictions_total'] >= 1
+
+
+def test_generation_bump_drops_entries():
+    registry = StubRegistry(model=1)
+    cache = make_cache(registry)
+    compute, calls = counting({'value': 1})
+    cache.get_or_compute({'a': 1}, compute)
+    registry.generations['model'] = 2
+    cache.get_or_compute({'a': 1}, compute)
+    assert len(calls) == 2
+    metrics = cache.metrics()
+    assert metrics['invalidations_total'] == 1 and metrics['entries'] == 1
+
+
+def test_put_refuses_key_from_outdated_generation():
+    cache = make_cache()
+    old_key = cache.key({'a': 1}, {'model': 1})
+    cache.key({'a': 1}, {'model': 2})  # a reload finished meanwhile
+    cache.put(old_key, {'value': 'old model'})
+    assert cache.metrics()['entries'] == 0
+
+
+def test_request_holding_replaced_model_does_not_roll_back():
+    cache = make_cache(StubRegistry(model=2))
+    compute, calls = counting({'value': 'new model'})
+    cache.get_or_compute({'a': 1}, compute, {'model': 2})
+    stale, _ = counting({'value': 'old model'})
+    # Computed with the model the request leased before the reload
+    assert cache.get_or_compute({'a': 1}, stale, {'model': 1}) == {'value': 'old model'}
+    assert cache.get_or_compute({'a': 1}, compute, {'model': 2}) == {'value': 'new model'}
+    assert len(calls) == 1
+    assert cache.metrics()['invalidations_total'] == 0
+
+
+def test_disabled_by_environment(monkeypatch):
+    monkeypatch.setenv(result_cache.RESULT_CACHE_ENV, '0')
+    cache = make_cache()
+    compute, calls = counting({'value': 1})
+    cache.get_or_compute({'a': 1}, compute)
+    cache.get_or_compute({'a': 1}, compute)
+    assert len(calls) == 2
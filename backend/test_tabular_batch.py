@@ -0,0 +1,316 @@
+"""
+Tests for the batch variants of the tabular endpoints (tabular_batch.py),
+through the Flask test client with stub models on the registry.
+
+Run: python -m pytest test_tabular_batch.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+import tabular_batch
+
+MILK_COLUMNS = list(app.MILK_MARKET_COLUMNS.values())
+MILK_RECORD = {
+    'current_price': 100.0, 'monthly_milk_litres': 300.0, 'fat_percentage': 4.0, 'snf_percentage': 8.0,
+    'disease_stage': 0.0, 'feed_quality': 2.0, 'lactation_month': 3.0, 'month': 11.0
+}
+
+
+class StubRegistry:
+    """Just what the batch endpoints ask of the model registry"""
+
+    def __init__(self, **models):
+        self.models = models
+
+    def get(self, name):
+        return self.models.get(name)
+
+    def get_versioned(self, name):
+        return self.models.get(name), 1
+
+    def begin_request(self):
+        pass
+
+    def end_request(self):
+        pass
+
+
+class DaysModel:
+    """Animal birth stand-in: days to birth is the first feature; negative ones fail the whole predict"""
+    n_features_in_ = 4
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        if (X[:, 0] < 0).any():
+            raise ValueError('negative days')
+        return X[:, 0]
+
+
+class BirthClassifier:
+    """clf.pkl as animal_birth.ipynb saves it: class 1 = birth within 2 days, when the first feature is <= 2"""
+    n_features_in_ = 4
+    classes_ = np.array([0, 1])
+
+    def predict_proba(self, X):
+        positive = np.where(X[:, 0] <= 2, 0.9, 0.2)
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class MilkModel:
+    """
+    Milk market stand-in: price change = 1% of the current price plus the
+    month. Training columns in reverse order, so rows must be built by name.
+    """
+    feature_names_in_ = np.array(MILK_COLUMNS[::-1], dtype=object)
+
+    def __init__(self):
+        self.batches = []
+
+    def column(self, X, name):
+        if isinstance(X, pd.DataFrame):
+            return X[name].to_numpy(dtype=float)
+        return np.asarray(X, dtype=float)[:, list(self.feature_names_in_).index(name)]
+
+    def predict(self, X):
+        self.batches.append(len(X))
+        if (self.column(X, app.MILK_MARKET_COLUMNS['disease_stage']) > 3).any():
+            raise ValueError('unseen disease stage')
+        return (0.01 * self.column(X, app.MILK_MARKET_COLUMNS['current_price'])
+                + self.column(X, app.MILK_MARKET_COLUMNS['month']))
+
+
+@pytest.fixture
+def models(monkeypatch):
+    models = {'animal_birth': DaysModel(), 'milk_market': MilkModel()}
+    monkeypatch.setattr(app, 'model_registry', StubRegistry(**models))
+    return models
+
+
+@pytest.fixture
+def client(models):
+    return app.app.test_client()
+
+
+def post(client, url, body):
+    response = client.post(url, json=body)
+    return response.status_code, response.get_json()
+
+
+# ==================== Records ====================
+@pytest.mark.parametrize('body, message', [
+    ({'rows': []}, 'Expected'),
+    ('records', 'Expected'),
+    ({'records': []}, 'No records'),
+    ([], 'No records'),
+])
+def test_unusable_body_rejected(client, body, message):
+    status, result = post(client, '/animal-birth/predict-batch', body)
+    assert status == 400 and message in result['error']
+
+
+def test_record_cap(client, monkeypatch):
+    monkeypatch.setenv(tabular_batch.BATCH_MAX_RECORDS_ENV, '2')
+    assert post(client, '/animal-birth/predict-batch', [[1, 2, 3, 4]] * 2)[0] == 200
+    status, result = post(client, '/animal-birth/predict-batch', [[1, 2, 3, 4]] * 3)
+    assert status == 413 and 'max 2' in result['error']
+
+
+def test_results_aligned_with_invalid_records(client, models):
+    status, result = post(client, '/animal-birth/predict-batch', {'records': [
+        [1, 2, 3, 4], {'features': [5, 0, 0, 0]}, [1, 2], 'x', [1, 'a', 3, 4]
+    ]})
+    assert status == 200
+    assert (result['count'], result['succeeded'], result['failed']) == (5, 2, 3)
+    assert [r['index'] for r in result['results']] == [0, 1, 2, 3, 4]
+    assert result['results'][0]['Will Birth in Next 2 Days'] == 'Yes'
+    assert result['results'][1]['Estimated Days to Birth'] == 5.0
+    assert "list of 4 numbers" in result['results'][2]['error']
+    assert result['results'][3]['error'] == 'record must be an object'
+    assert 'error' in result['results'][4]
+    assert models['animal_birth'].calls == 1  # one predict for the whole batch
+
+
+def test_field_validation(client):
+    status, result = post(client, '/milk-market/predict-income-batch', [
+        MILK_RECORD,
+        {**MILK_RECORD, 'month': 'may'},
+        {key: value for key, value in MILK_RECORD.items() if key != 'fat_percentage'},
+    ])
+    assert status == 200
+    errors = [r.get('error') for r in result['results']]
+    assert errors == [None, "field 'month' must be a number, got 'may'", "missing field 'fat_percentage'"]
+
+
+def test_failing_predict_retried_per_row(client, models):
+    # ndarray rows (animal birth)
+    status, result = post(client, '/animal-birth/predict-batch', [[1, 0, 0, 0], [-1, 0, 0, 0], [3, 0, 0, 0]])
+    assert status == 200
+    assert [r.get('error') for r in result['results']] == [None, 'negative days', None]
+    assert result['results'][2]['Estimated Days to Birth'] == 3.0
+    assert models['animal_birth'].calls == 4  # the batch, then each row
+
+    # DataFrame rows (milk market)
+    status, result = post(client, '/milk-market/predict-income-batch', [
+        MILK_RECORD, {**MILK_RECORD, 'disease_stage': 9}
+    ])
+    assert [r.get('error') for r in result['results']] == [None, 'unseen disease stage']
+    assert result['results'][0]['predicted_price_change_lkr_per_litre'] == 12.0
+    assert models['milk_market'].batches == [2, 1, 1]
+
+
+def test_predict_rows_without_valid_rows():
+    def predict(frame):
+        raise AssertionError('predict called without rows')
+    assert tabular_batch.predict_rows(predict, np.empty((0, 4)), [], {0: 'bad'}) == {}
+
+
+def test_birth_classifier_read_as_classes(client, monkeypatch):
+    # A predicted class 0 is "No", not 0 days to birth
+    monkeypatch.setattr(app, 'model_registry', StubRegistry(animal_birth=BirthClassifier()))
+    status, result = post(client, '/animal-birth/predict-batch', [[1, 0, 0, 0], [30, 0, 0, 0]])
+    assert status == 200
+    assert [r['Will Birth in Next 2 Days'] for r in result['results']] == ['Yes', 'No']
+    assert [r['Birth Probability'] for r in result['results']] == [0.9, 0.2]
+    assert 'Estimated Days to Birth' not in result['results'][0]
+
+    single = client.post('/animal-birth/predict', json={'features': [30, 0, 0, 0]}).get_json()
+    assert single == {'Will Birth in Next 2 Days': 'No', 'Birth Probability': 0.2}
+
+
+def test_model_not_loaded(monkeypatch):
+    monkeypatch.setattr(app, 'model_registry', StubRegistry())
+    response = app.app.test_client().post('/animal-birth/predict-batch', json=[[1, 2, 3, 4]])
+    assert response.status_code == 503
+
+
+# ==================== Scenario Sweep ====================
+def test_axis_values():
+    assert tabular_batch.axis_values(3, 'x', 10).tolist() == [3.0]
+    assert tabular_batch.axis_values([1, '2'], 'x', 10).tolist() == [1.0, 2.0]
+    # stop is included when the steps land on it, and steps are rounded
+    assert tabular_batch.axis_values({'start': 1, 'stop': 12, 'step': 1}, 'x', 20).tolist() == list(range(1, 13))
+    assert tabular_batch.axis_values({'start': 0, 'stop': 0.3, 'step': 0.1}, 'x', 10).tolist() == [0, 0.1, 0.2, 0.3]
+    assert tabular_batch.axis_values({'start': 0, 'stop': 1, 'num': 5}, 'x', 10).tolist() == [0, 0.25, 0.5, 0.75, 1]
+
+
+@pytest.mark.parametrize('spec', [
+    [], {'start': 5, 'stop': 1, 'step': 1}, {'start': 1, 'stop': 5, 'step': 0},
+    {'start': 1, 'stop': 5}, {'start': 1, 'stop': 5, 'num': 0}, ['high'],
+])
+def test_axis_values_rejects(spec):
+    with pytest.raises(ValueError):
+        tabular_batch.axis_values(spec, 'x', 10)
+
+
+@pytest.mark.parametrize('spec', [list(range(11)), {'start': 0, 'stop': 10, 'step': 1}, {'start': 0, 'stop': 1, 'num': 11}])
+def test_axis_values_limit(spec):
+    with pytest.raises(tabular_batch.BatchError) as error:
+        tabular_batch.axis_values(spec, 'x', 10)
+    assert error.value.status == 413
+
+
+def test_grid_is_cartesian_product():
+    axes, columns = tabular_batch.grid({'a': [1, 2], 'b': 5, 'c': [7, 8, 9]}, ['a', 'b', 'c'])
+    assert [len(values) for values in axes.values()] == [2, 1, 3]
+    assert columns['a'].tolist() == [1, 1, 1, 2, 2, 2]  # first key varies slowest
+    assert columns['b'].tolist() == [5] * 6
+    assert columns['c'].tolist() == [7, 8, 9] * 2
+
+
+def test_grid_row_limit():
+    with pytest.raises(tabular_batch.BatchError) as error:
+        tabular_batch.grid({'a': list(range(4)), 'b': list(range(3))}, ['a', 'b'], max_rows=10)
+    assert error.value.status == 413
+
+
+def test_sweep(client, models):
+    status, result = post(client, '/milk-market/sweep', {
+        **MILK_RECORD, 'month': {'start': 1, 'stop': 12, 'step': 1}, 'current_price': [90, 110]
+    })
+    assert status == 200
+    assert (result['rows'], result['axes'], result['shape']) == (24, ['current_price', 'month'], [2, 12])
+    assert models['milk_market'].batches == [24]
+    # price change = 1% of the price + month
+    assert result['predicted_price_change_lkr_per_litre'][1][0] == 2.1
+    assert result['best']['current_price'] == 110 and result['best']['month'] == 12
+    assert result['best']['predicted_next_month_income_lkr'] == round((110 + 1.1 + 12) * 300, 2)
+
+
+def test_sweep_limits(client, monkeypatch):
+    monkeypatch.setenv(tabular_batch.SWEEP_MAX_ROWS_ENV, '10')
+    status, result = post(client, '/milk-market/sweep', {**MILK_RECORD, 'month': [1, 2, 3, 4], 'feed_quality': [1, 2, 3]})
+    assert status == 413 and 'max 10' in result['error']
+    status, result = post(client, '/milk-market/sweep', {**MILK_RECORD, 'month': {'start': 1, 'stop': 100, 'step': 1}})
+    assert status == 413 and "'month'" in result['error']
+
+
+@pytest.mark.parametrize('body', [
+    [MILK_RECORD],
+    {key: value for key, value in MILK_RECORD.items() if key != 'month'},
+    {**MILK_RECORD, 'month': {'start': 12, 'stop': 1, 'step': 1}},
+])
+def test_sweep_bad_input(client, body):
+    assert post(client, '/milk-market/sweep', body)[0] == 400
+
+
+# ==================== Forecast ====================
+def expected_trajectory(record, horizon):
+    """The recurrence one month at a time, as the stub model defines it"""
+    price, month, lactation = record['current_price'], record['month'], record['lactation_month']
+    months = []
+    for _ in range(horizon):
+        change = 0.01 * price + month
+        price, month, lactation = price + change, month % 12 + 1, lactation + 1
+        months.append((month, lactation, round(change, 2), round(price, 2),
+                       round(price * record['monthly_milk_litres'], 2)))
+    return months
+
+
+def test_forecast_recurrence(client, models):
+    records = [MILK_RECORD, {**MILK_RECORD, 'current_price': 80, 'month': 2, 'lactation_month': 1}]
+    status, result = post(client, '/milk-market/forecast', {'records': records, 'horizon': 4})
+    assert status == 200
+    assert models['milk_market'].batches == [2] * 4  # one predict per month for all records
+    for record, output in zip(records, result['results']):
+        months = [(m['month'], m['lactation_month'], m['predicted_price_change_lkr_per_litre'],
+                   m['predicted_price_lkr_per_litre'], m['predicted_income_lkr']) for m in output['months']]
+        assert months == expected_trajectory(record, 4)
+        assert output['horizon'] == 4
+    # November start wraps to January
+    assert [m['month'] for m in result['results'][0]['months']] == [12, 1, 2, 3]
+
+
+def test_forecast_default_horizon(client):
+    status, result = post(client, '/milk-market/forecast', [MILK_RECORD])
+    assert status == 200 and len(result['results'][0]['months']) == app.MILK_MARKET_DEFAULT_HORIZON
+
+
+@pytest.mark.parametrize('horizon', [0, -1, app.MILK_MARKET_MAX_HORIZON + 1, 2.5, '3', True])
+def test_forecast_horizon_bounds(client, models, horizon):
+    status, result = post(client, '/milk-market/forecast', {'records': [MILK_RECORD], 'horizon': horizon})
+    assert status == 400 and 'horizon' in result['error']
+    assert models['milk_market'].batches == []
+
+
+def test_forecast_longest_horizon(client):
+    status, result = post(client, '/milk-market/forecast', {'records': [MILK_RECORD], 'horizon': app.MILK_MARKET_MAX_HORIZON})
+    assert status == 200 and len(result['results'][0]['months']) == app.MILK_MARKET_MAX_HORIZON
+
+
+def test_forecast_invalid_records(client, models):
+    status, result = post(client, '/milk-market/forecast', {'records': [{**MILK_RECORD, 'month': None}, MILK_RECORD]})
+    assert [r.get('error') for r in result['results']] == ["field 'month' must be a number, got None", None]
+    assert result['results'][1]['months'][0]['month'] == 12
+
+    status, result = post(client, '/milk-market/forecast', {'records': [{}]})
+    assert status == 200 and result['failed'] == 1
+    assert models['milk_market'].batches == [1] * app.MILK_MARKET_DEFAULT_HORIZON
@@ -0,0 +1,142 @@
+"""
+Equivalence tests for tree_runtime: compiled ensembles must predict exactly
+what sklearn predicts.
+
+Run: python -m pytest test_tree_runtime.py
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import make_column_transformer
+from sklearn.ensemble import (
+    ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingClassifier,
+    GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+)
+from sklearn.linear_model import LinearRegression
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+import tree_runtime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COW_FEED_MODEL = os.path.join(BASE_DIR, 'cow_daily_feed', 'models', 'cow_feed_predictor.pkl')
+
+RNG = np.random.default_rng(0)
+X_TRAIN = RNG.normal(size=(400, 8))
+X_TEST = np.vstack([RNG.normal(size=(200, 8)), X_TRAIN[:50]])
+TARGET = X_TRAIN[:, 0] + X_TRAIN[:, 1] ** 2
+THREE_CLASSES = np.digitize(TARGET, [0.0, 1.5])
+TWO_CLASSES = (TARGET > 1.0).astype(int)
+TWO_TARGETS = np.column_stack([TARGET, X_TRAIN[:, 2]])
+
+REGRESSORS = [
+    (RandomForestRegressor(n_estimators=30, random_state=0), TARGET),
+    (RandomForestRegressor(n_estimators=10, random_state=0), TWO_TARGETS),
+    (ExtraTreesRegressor(n_estimators=20, random_state=0), TARGET),
+    (DecisionTreeRegressor(random_state=0), TARGET),
+    (GradientBoostingRegressor(n_estimators=40, random_state=0), TARGET),
+    (MultiOutputRegressor(GradientBoostingRegressor(n_estimators=20, random_state=0)), TWO_TARGETS),
+    (MultiOutputRegressor(RandomForestRegressor(n_estimators=10, random_state=0)), TWO_TARGETS),
+]
+
+CLASSIFIERS = [
+    (RandomForestClassifier(n_estimators=30, random_state=0), THREE_CLASSES),
+    (ExtraTreesClassifier(n_estimators=20, random_state=0), TWO_CLASSES),
+    (DecisionTreeClassifier(random_state=0), THREE_CLASSES),
+    (GradientBoostingClassifier(n_estimators=40, random_state=0), THREE_CLASSES),
+    (GradientBoostingClassifier(n_estimators=40, random_state=0), TWO_CLASSES),
+]
+
+
+def names(cases):
+    return [type(model).__name__ for model, _ in cases]
+
+
+@pytest.mark.parametrize('model,target', REGRESSORS, ids=names(REGRESSORS))
+def test_regressor_matches_sklearn(model, target):
+    model.fit(X_TRAIN, target)
+    compiled = tree_runtime.compile_model(model)
+    assert isinstance(compiled, tree_runtime.CompiledRegressor)
+    expected = model.predict(X_TEST)
+    actual = compiled.predict(X_TEST)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(compiled.predict(X_TEST[:1]), model.predict(X_TEST[:1]), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('model,target', CLASSIFIERS, ids=names(CLASSIFIERS))
+def test_classifier_matches_sklearn(model, target):
+    model.fit(X_TRAIN, target)
+    compiled = tree_runtime.compile_model(model)
+    assert isinstance(compiled, tree_runtime.CompiledClassifier)
+    np.testing.assert_allclose(compiled.predict_proba(X_TEST), model.predict_proba(X_TEST), rtol=1e-10, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X_TEST), model.predict(X_TEST))
+
+    labels, proba, top = tree_runtime.classify(compiled, X_TEST, top_k=2)
+    np.testing.assert_array_equal(labels, model.predict(X_TEST))
+    np.testing.assert_allclose(proba, model.predict_proba(X_TEST), rtol=1e-10, atol=1e-12)
+    for row, expected in zip(top, model.predict_proba(X_TEST)):
+        np.testing.assert_array_equal(row, np.argsort(expected)[-2:][::-1])
+
+
+def test_classify_plain_sklearn_model():
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X_TRAIN, THREE_CLASSES)
+    labels, proba, top = tree_runtime.classify(model, X_TEST[:3], top_k=3)
+    np.testing.assert_array_equal(labels, model.predict(X_TEST[:3]))
+    assert proba.shape == (3, 3) and top.shape == (3, 3)
+
+
+def test_pipeline_compiles_final_step():
+    # Like the nutrition model: string columns one-hot encoded by name
+    frame = pd.DataFrame({
+        'Breed': RNG.choice(['Friesian', 'Jersey', 'Sahiwal'], size=len(X_TRAIN)),
+        'Weight_kg': X_TRAIN[:, 0] * 50 + 450,
+        'Age_Months': X_TRAIN[:, 1] * 10 + 48
+    })
+    model = make_pipeline(
+        make_column_transformer((OneHotEncoder(handle_unknown='ignore'), ['Breed']), remainder='passthrough'),
+        MultiOutputRegressor(RandomForestRegressor(n_estimators=10, random_state=0))
+    ).fit(frame, TWO_TARGETS)
+    compiled = tree_runtime.compile_model(model)
+    assert isinstance(compiled, tree_runtime.CompiledRegressor)
+    np.testing.assert_allclose(compiled.predict(frame), model.predict(frame), rtol=1e-12, atol=1e-12)
+    assert list(compiled.feature_names_in_) == list(model.feature_names_in_)
+
+
+def test_dataframe_columns_follow_training_order():
+    frame = pd.DataFrame(X_TRAIN[:, :3], columns=['a', 'b', 'c'])
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(frame, TARGET)
+    compiled = tree_runtime.compile_model(model)
+    shuffled = frame[['c', 'a', 'b']]
+    np.testing.assert_allclose(compiled.predict(shuffled), model.predict(frame), rtol=1e-12)
+
+
+def test_unsupported_model_is_returned_unchanged():
+    model = LinearRegression().fit(X_TRAIN, TARGET)
+    assert tree_runtime.compile_model(model) is model
+
+
+def test_disabled_by_environment(monkeypatch):
+    monkeypatch.setenv(tree_runtime.TREE_RUNTIME_ENV, '0')
+    model = RandomForestRegressor(n_estimators=2, random_state=0).fit(X_TRAIN, TARGET)
+    assert tree_runtime.compile_model(model) is model
+
+
+@pytest.mark.skipif(not os.path.exists(COW_FEED_MODEL), reason='cow feed model not available')
+def test_cow_feed_model_matches_sklearn():
+    model = joblib.load(COW_FEED_MODEL)
+    compiled = tree_runtime.compile_model(model)
+    frame = pd.DataFrame({
+        'Cow Breed': RNG.integers(0, 3, 300),
+        'Cow Age (months)': RNG.uniform(20, 120, 300),
+        'Cow Weight (kg)': RNG.uniform(300, 700, 300),
+        'Milk Yield (L/day)': RNG.uniform(5, 30, 300),
+        'Activity Level': RNG.integers(0, 3, 300)
+    })[list(model.feature_names_in_)]
+    np.testing.assert_allclose(compiled.predict(frame), model.predict(frame), rtol=1e-12)
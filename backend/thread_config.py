@@ -0,0 +1,199 @@
+"""
+CPU Thread and Affinity Configuration
+Sizes the thread pools of TensorFlow, PyTorch (under ultralytics) and
+sklearn/BLAS, and optionally pins inference to CPU sets per framework or per
+model, so concurrent requests stop oversubscribing the cores.
+
+Settings come from a JSON file named by SMART_FARM_THREAD_CONFIG:
+
+    {
+      "tensorflow":  {"intra_op_threads": 4, "inter_op_threads": 1, "cpus": "0-3"},
+      "ultralytics": {"threads": 2, "cpus": "4-5"},
+      "sklearn":     {"threads": 1},
+      "models": {
+        "cattle_yolo_behavior": {"cpus": "6-7"},
+        "milk_market": {"threads": 2}
+      }
+    }
+
+Framework thread counts can also be set (and overridden) from the environment:
+    SMART_FARM_TF_INTRA_OP_THREADS / SMART_FARM_TF_INTER_OP_THREADS
+    SMART_FARM_TORCH_THREADS
+    SMART_FARM_SKLEARN_THREADS
+
+Where each setting applies:
+    - TF intra/inter-op sizes are process-wide and fixed before the first op,
+      so they are framework settings only.
+    - "threads" for ultralytics sets torch's intra-op threads, which are also
+      process-wide (framework setting only).
+    - "threads" for sklearn caps the BLAS/OpenMP pools (threadpoolctl); per
+      model it sets n_jobs on estimators that have one (e.g. random forests).
+    - "cpus" pins the thread that loads, warms up or holds a model (for the
+      rest of the request, or the registry.use() block). Framework pools
+      created from that thread inherit the set.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+THREAD_CONFIG_ENV = 'SMART_FARM_THREAD_CONFIG'
+TF_INTRA_OP_ENV = 'SMART_FARM_TF_INTRA_OP_THREADS'
+TF_INTER_OP_ENV = 'SMART_FARM_TF_INTER_OP_THREADS'
+TORCH_THREADS_ENV = 'SMART_FARM_TORCH_THREADS'
+SKLEARN_THREADS_ENV = 'SMART_FARM_SKLEARN_THREADS'
+
+# Environment overrides: framework -> {setting: variable}
+ENV_OVERRIDES = {
+    'tensorflow': {'intra_op_threads': TF_INTRA_OP_ENV, 'inter_op_threads': TF_INTER_OP_ENV},
+    'ultralytics': {'threads': TORCH_THREADS_ENV},
+    'sklearn': {'threads': SKLEARN_THREADS_ENV}
+}
+
+AFFINITY_SUPPORTED = hasattr(os, 'sched_setaffinity')
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def parse_cpus(value):
+    """CPU set from "0-3,6", a list of ints or None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return {int(cpu) for cpu in value}
+    cpus = set()
+    for part in str(value).split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+def load_config(path=None):
+    """Read the JSON configuration (empty without SMART_FARM_THREAD_CONFIG)"""
+    path = path or os.environ.get(THREAD_CONFIG_ENV)
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def config():
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = load_config()
+    return _config
+
+
+def settings(framework, name=None):
+    """Effective settings for a framework, overlaid with a model's own entry"""
+    merged = dict(config().get(framework) or {})
+    for key, env_name in ENV_OVERRIDES.get(framework, {}).items():
+        value = os.environ.get(env_name)
+        if value:
+            merged[key] = int(value)
+    if name is not None:
+        merged.update(config().get('models', {}).get(name) or {})
+    return merged
+
+
+def model_settings(name):
+    """A model's own entry only (no framework defaults)"""
+    return dict(config().get('models', {}).get(name) or {})
+
+
+def describe():
+    """Effective configuration, for /metrics and the benchmark report"""
+    return {
+        'config_file': os.environ.get(THREAD_CONFIG_ENV),
+        'frameworks': {framework: settings(framework) for framework in ENV_OVERRIDES},
+        'models': config().get('models', {}),
+        'affinity_supported': AFFINITY_SUPPORTED,
+        'cpus_available': sorted(os.sched_getaffinity(0)) if AFFINITY_SUPPORTED else None
+    }
+
+
+# ==================== Framework Thread Pools ====================
+def configure_tensorflow(tf):
+    """Must run before the TF runtime creates its thread pools (first op)"""
+    current = settings('tensorflow')
+    if current.get('intra_op_threads'):
+        tf.config.threading.set_intra_op_parallelism_threads(int(current['intra_op_threads']))
+    if current.get('inter_op_threads'):
+        tf.config.threading.set_inter_op_parallelism_threads(int(current['inter_op_threads']))
+
+
+def configure_torch():
+    threads = settings('ultralytics').get('threads')
+    if threads:
+        import torch
+        torch.set_num_threads(int(threads))
+
+
+def configure_sklearn():
+    """Cap the BLAS/OpenMP pools used by numpy and sklearn"""
+    threads = settings('sklearn').get('threads')
+    if not threads:
+        return
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        print("⚠️ threadpoolctl not installed, SMART_FARM_SKLEARN_THREADS ignored")
+        return
+    threadpool_limits(limits=int(threads))
+
+
+def apply_model_threads(model, name, framework):
+    """Per-model sklearn thread count: set n_jobs wherever the estimator has it"""
+    threads = model_settings(name).get('threads')
+    if not threads or framework != 'sklearn':
+        return
+    estimators = model.values() if isinstance(model, dict) else [model]
+    for estimator in estimators:
+        get_params = getattr(estimator, 'get_params', None)
+        if get_params is None:
+            continue
+        keys = [key for key in get_params() if key == 'n_jobs' or key.endswith('__n_jobs')]
+        if keys:
+            estimator.set_params(**{key: int(threads) for key in keys})
+
+
+# ==================== CPU Affinity ====================
+def pin_current_thread(name, framework):
+    """
+    Pin the calling thread to the model's (or framework's) CPU set.
+    Returns the previous set to restore, or None if nothing changed.
+    """
+    if not AFFINITY_SUPPORTED:
+        return None
+    cpus = parse_cpus(settings(framework, name).get('cpus'))
+    if not cpus:
+        return None
+    previous = os.sched_getaffinity(0)
+    if previous == cpus:
+        return None
+    os.sched_setaffinity(0, cpus)
+    return previous
+
+
+def restore_current_thread(previous):
+    if previous is not None:
+        os.sched_setaffinity(0, previous)
+
+
+@contextmanager
+def pinned(name, framework):
+    """Run a block on the model's CPU set"""
+    previous = pin_current_thread(name, framework)
+    try:
+        yield
+    finally:
+        restore_current_thread(previous)
+
@@ -0,0 +1,268 @@
+"""
+Tree Ensemble Runtime
+Compiled stand-ins for the sklearn tree ensembles (severity/treatment
+gradient boosting, milk price and cow feed random forests, the multi-output
+nutrition model). sklearn's predict/predict_proba validate the input and
+dispatch tree by tree, which dominates the cost of a one-row request.
+
+Every tree of an ensemble is flattened into contiguous node arrays (split
+feature, threshold, children, leaf values), and a batch walks all trees at
+once: one vectorized step per tree level. Leaves point to themselves, so the
+walk is a fixed number of steps (the deepest tree's depth) with no per-row
+branching.
+
+    model = tree_runtime.compile_model(joblib.load(path))
+    model.predict(X)                                   # same as sklearn
+    labels, proba, top = tree_runtime.classify(model, X, top_k=3)
+
+compile_model() returns the model unchanged when it is not a supported
+ensemble (or SMART_FARM_TREE_RUNTIME=0), and the compiled model passes every
+other attribute (classes_, feature_names_in_, ...) through to the original.
+Pipelines keep their preprocessing steps in sklearn; only the final
+estimator is compiled.
+
+Supported: DecisionTree, RandomForest and ExtraTrees (regressor, and
+single-output classifier), GradientBoosting (regressor, classifier with the
+default prior init) and MultiOutputRegressor over any of these.
+"""
+
+import numpy as np
+import pandas as pd
+
+from model_registry import env_flag
+
+TREE_RUNTIME_ENV = 'SMART_FARM_TREE_RUNTIME'
+
+
+class UnsupportedModel(TypeError):
+    """The estimator can't be compiled; sklearn keeps serving it"""
+
+
+# ==================== Flattened Trees ====================
+class TreeArrays:
+    """All trees of an ensemble in contiguous node arrays"""
+
+    def __init__(self, trees, values):
+        sizes = [tree.node_count for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        self.roots = offsets
+        self.depth = max(int(tree.max_depth) for tree in trees)
+
+        feature, threshold, children, missing_left = [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            leaf = tree.children_left == -1
+            nodes = np.arange(tree.node_count) + offset
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            children.append(np.stack([
+                np.where(leaf, nodes, tree.children_left + offset),
+                np.where(leaf, nodes, tree.children_right + offset)
+            ]))
+            missing = getattr(tree, 'missing_go_to_left', None)
+            missing_left.append(np.zeros(tree.node_count, dtype=bool) if missing is None
+                                else np.asarray(missing, dtype=bool) & ~leaf)
+        self.feature = np.ascontiguousarray(np.concatenate(feature), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(threshold), dtype=np.float64)
+        self.children = np.ascontiguousarray(np.concatenate(children, axis=1), dtype=np.intp)
+        missing_left = np.concatenate(missing_left)
+        self.missing_left = missing_left if missing_left.any() else None
+        # (total nodes, outputs): only leaf rows are ever read
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaves(self, X):
+        """Leaf node of every (row, tree); X is float32 (n_samples, n_features)"""
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        has_nan = self.missing_left is not None and np.isnan(X).any()
+        for _ in range(self.depth):
+            # float32 X against float64 thresholds, as sklearn compares them
+            x = X[rows, self.feature[nodes]]
+            go_right = ~(x <= self.threshold[nodes])
+            if has_nan:
+                go_right &= ~(np.isnan(x) & self.missing_left[nodes])
+            nodes = self.children[go_right.view(np.int8), nodes]
+        return nodes
+
+    def leaf_values(self, X):
+        """(n_samples, n_trees, outputs)"""
+        return self.value[self.leaves(X)]
+
+
+def _tree_values(tree, normalize=False):
+    value = tree.value.reshape(tree.node_count, -1).astype(np.float64)
+    if normalize:
+        totals = value.sum(axis=1, keepdims=True)
+        value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+    return value
+
+
+# ==================== Evaluators ====================
+def _forest_regressor(estimators):
+    trees = [estimator.tree_ for estimator in estimators]
+    arrays = TreeArrays(trees, [_tree_values(tree) for tree in trees])
+    n_outputs = trees[0].n_outputs
+
+    def evaluate(X):
+        prediction = arrays.leaf_values(X).mean(axis=1)
+        return prediction[:, 0] if n_outputs == 1 else prediction
+    return evaluate
+
+
+def _forest_proba(estimators):
+    trees = [estimator.tree_ for estimator in estimators]
+    if trees[0].n_outputs != 1:
+        raise UnsupportedModel('multi-output classifier')
+    arrays = TreeArrays(trees, [_tree_values(tree, normalize=True) for tree in trees])
+    return lambda X: arrays.leaf_values(X).mean(axis=1)
+
+
+def _boosting_raw(model):
+    """Raw scores: prior + learning_rate * sum of the stage trees, per class column"""
+    from sklearn.dummy import DummyClassifier, DummyRegressor
+    if not (model.init_ == 'zero' or isinstance(model.init_, (DummyClassifier, DummyRegressor))):
+        raise UnsupportedModel(f'init={type(model.init_).__name__}')
+    n_stages, n_columns = model.estimators_.shape
+    trees = [estimator.tree_ for estimator in model.estimators_.ravel()]
+    arrays = TreeArrays(trees, [_tree_values(tree) * model.learning_rate for tree in trees])
+    # The prior does not depend on the input
+    init = np.asarray(model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32)),
+                      dtype=np.float64).reshape(1, n_columns)
+
+    def raw(X):
+        stages = arrays.leaf_values(X)[..., 0].reshape(len(X), n_stages, n_columns)
+        return init + stages.sum(axis=1)
+    return raw
+
+
+def _boosting_proba(model):
+    raw = _boosting_raw(model)
+    if len(model.classes_) == 2:
+        def evaluate(X):
+            positive = 1.0 / (1.0 + np.exp(-raw(X)[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+    else:
+        def evaluate(X):
+            scores = raw(X)
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+            return scores / scores.sum(axis=1, keepdims=True)
+    return evaluate
+
+
+def _compile_estimator(estimator):
+    """(is_classifier, evaluate) for a bare (non-pipeline) estimator"""
+    from sklearn.ensemble import (
+        ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingClassifier,
+        GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+    )
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.tree import BaseDecisionTree, DecisionTreeClassifier
+
+    if isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor)):
+        return False, _forest_regressor(estimator.estimators_)
+    if isinstance(estimator, (RandomForestClassifier, ExtraTreesClassifier)):
+        return True, _forest_proba(estimator.estimators_)
+    if isinstance(estimator, DecisionTreeClassifier):
+        return True, _forest_proba([estimator])
+    if isinstance(estimator, BaseDecisionTree):
+        return False, _forest_regressor([estimator])
+    if isinstance(estimator, GradientBoostingClassifier):
+        return True, _boosting_proba(estimator)
+    if isinstance(estimator, GradientBoostingRegressor):
+        raw = _boosting_raw(estimator)
+        return False, lambda X: raw(X)[:, 0]
+    if isinstance(estimator, MultiOutputRegressor):
+        parts = []
+        for sub_estimator in estimator.estimators_:
+            is_classifier, evaluate = _compile_estimator(sub_estimator)
+            if is_classifier or getattr(sub_estimator, 'n_outputs_', 1) != 1:
+                raise UnsupportedModel('MultiOutputRegressor over a multi-output estimator')
+            parts.append(evaluate)
+        return False, lambda X: np.column_stack([evaluate(X) for evaluate in parts])
+    raise UnsupportedModel(type(estimator).__name__)
+
+
+# ==================== Compiled Models ====================
+class CompiledRegressor:
+    """Drop-in predict() for a compiled ensemble; other attributes come from the original"""
+
+    def __init__(self, estimator, evaluate, preprocess=None):
+        self.estimator = estimator
+        self._evaluate = evaluate
+        self._preprocess = preprocess
+
+    def __getattr__(self, attr):
+        # Only called for attributes not set here: classes_, feature_names_in_, get_params...
+        if attr == 'estimator':
+            raise AttributeError(attr)
+        return getattr(self.estimator, attr)
+
+    def __repr__(self):
+        return f"Compiled({self.estimator!r})"
+
+    def _input(self, X):
+        if self._preprocess is not None:
+            X = self._preprocess.transform(X)
+            if hasattr(X, 'toarray'):
+                X = X.toarray()
+        elif isinstance(X, pd.DataFrame) and hasattr(self.estimator, 'feature_names_in_'):
+            X = X[self.estimator.feature_names_in_]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Expected a 2D array, got shape {X.shape}")
+        return X
+
+    def predict(self, X):
+        return self._evaluate(self._input(X))
+
+
+class CompiledClassifier(CompiledRegressor):
+    """predict/predict_proba, plus classify() for label, probabilities and top-k in one pass"""
+
+    def predict_proba(self, X):
+        return self._evaluate(self._input(X))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def classify(self, X, top_k=1):
+        return _classify_proba(self.classes_, self.predict_proba(X), top_k)
+
+
+def compile_model(model):
+    """Compiled stand-in for a supported tree ensemble (or pipeline ending in one), else the model itself"""
+    if not env_flag(TREE_RUNTIME_ENV, True):
+        return model
+    from sklearn.pipeline import Pipeline
+    try:
+        preprocess, estimator = None, model
+        if isinstance(model, Pipeline):
+            estimator = model.steps[-1][1]
+            preprocess = model[:-1] if len(model.steps) > 1 else None
+        is_classifier, evaluate = _compile_estimator(estimator)
+    except UnsupportedModel as e:
+        print(f"⚠️ {type(model).__name__} not compiled ({e}), using sklearn predict")
+        return model
+    compiled_type = CompiledClassifier if is_classifier else CompiledRegressor
+    return compiled_type(model, evaluate, preprocess)
+
+
+# ==================== Classification ====================
+def _classify_proba(classes, proba, top_k):
+    labels = np.asarray(classes)[np.argmax(proba, axis=1)]
+    # Same order as np.argsort(proba)[-k:][::-1] per row, ties included
+    top = np.argsort(proba, axis=1)[:, -top_k:][:, ::-1]
+    return labels, proba, top
+
+
+def classify(model, X, top_k=1):
+    """
+    (labels, probabilities, top-k class indices by probability) from a single
+    pass, for compiled and plain sklearn classifiers alike.
+    """
+    if isinstance(model, CompiledClassifier):
+        return model.classify(X, top_k)
+    return _classify_proba(model.classes_, model.predict_proba(X), top_k)
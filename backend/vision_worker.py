@@ -0,0 +1,577 @@
+"""
+Vision Inference Worker
+A dedicated local process that owns DenseNet121 and the YOLO models, so web
+workers stay lightweight and never run heavy vision inference themselves.
+
+Pixels are handed over through shared memory (no pickling of frames); only
+small request/result messages travel over a local Unix socket. Requests that
+arrive together are batched into one forward pass per model.
+
+Enable it for app.py with SMART_FARM_VISION_WORKER=1 and start the worker:
+    export SMART_FARM_VISION_AUTHKEY=$(python -c 'import secrets; print(secrets.token_hex(32))')
+    python vision_worker.py
+(gunicorn.conf.py starts and stops it automatically when enabled, with a
+fresh random key per launch.)
+
+Messages are pickles, so only holders of the key may connect: the worker and
+the clients refuse to run without SMART_FARM_VISION_AUTHKEY, and the socket
+lives in a directory only the current user can enter (0700).
+
+Configuration:
+    SMART_FARM_VISION_AUTHKEY       shared secret of worker and web processes (required)
+    SMART_FARM_VISION_SOCKET        socket path (default <tmp>/smart_farm_vision-<uid>/vision.sock)
+    SMART_FARM_VISION_MAX_BATCH     largest batch per forward pass (default 8)
+    SMART_FARM_VISION_MAX_WAIT_MS   how long a batch waits to fill up (default 5)
+    SMART_FARM_VISION_TIMEOUT       client-side seconds per request (default 120)
+    SMART_FARM_VISION_CHANNELS      connections/frame buffers per web process (default 8)
+    SMART_FARM_VISION_PRELOAD       models the worker loads at start (default all)
+"""
+
+import itertools
+import os
+import queue
+import stat
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+import heavy_imports
+import model_warmup
+import replica_pool
+import thread_config
+from model_registry import ModelRegistry, env_flag, parse_name_list
+
+VISION_WORKER_ENV = 'SMART_FARM_VISION_WORKER'
+SOCKET_ENV = 'SMART_FARM_VISION_SOCKET'
+AUTHKEY_ENV = 'SMART_FARM_VISION_AUTHKEY'
+MAX_BATCH_ENV = 'SMART_FARM_VISION_MAX_BATCH'
+MAX_WAIT_ENV = 'SMART_FARM_VISION_MAX_WAIT_MS'
+TIMEOUT_ENV = 'SMART_FARM_VISION_TIMEOUT'
+CHANNELS_ENV = 'SMART_FARM_VISION_CHANNELS'
+
+DEFAULT_CHANNELS = 8
+
+KIND_FRAMEWORKS = {'keras': 'tensorflow', 'yolo': 'ultralytics'}
+FRAMEWORK_KINDS = {framework: kind for kind, framework in KIND_FRAMEWORKS.items()}
+
+
+def enabled():
+    return env_flag(VISION_WORKER_ENV)
+
+
+def socket_path():
+    default = os.path.join(tempfile.gettempdir(), f"smart_farm_vision-{os.getuid()}", 'vision.sock')
+    return os.environ.get(SOCKET_ENV, default)
+
+
+def authkey():
+    """The shared connection secret; there is deliberately no default"""
+    key = os.environ.get(AUTHKEY_ENV)
+    if not key:
+        raise RuntimeError(f"{AUTHKEY_ENV} is not set: the vision worker and the web processes "
+                           f"need the same random key (gunicorn.conf.py generates one)")
+    return key.encode()
+
+
+def private_socket_dir(address):
+    """Create the socket's directory as 0700, or refuse one other users can enter"""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise RuntimeError(f"{directory} must be owned by this user with mode 0700 "
+                           f"(is {stat.S_IMODE(info.st_mode):o}); pick another {SOCKET_ENV}")
+
+
+# ==================== Result Serialization ====================
+def _serialize_yolo_result(result):
+    """Plain-data form of an ultralytics Results object"""
+    data = {'names': dict(result.names), 'probs': None, 'boxes': None}
+    probs = getattr(result, 'probs', None)
+    if probs is not None:
+        data['probs'] = {
+            'top1': int(probs.top1),
+            'top1conf': float(probs.top1conf),
+            'top5': [int(i) for i in probs.top5],
+            'top5conf': [float(c) for c in probs.top5conf]
+        }
+    boxes = getattr(result, 'boxes', None)
+    if boxes is not None:
+        data['boxes'] = {
+            'cls': boxes.cls.cpu().numpy().tolist(),
+            'conf': boxes.conf.cpu().numpy().tolist(),
+            'xyxy': boxes.xyxy.cpu().numpy().tolist()
+        }
+    return data
+
+
+class _HostArray(np.ndarray):
+    """numpy array that also answers the torch-style .cpu().numpy() used on ultralytics results"""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+def _host(values, dtype=np.float32):
+    return np.asarray(values, dtype=dtype).view(_HostArray)
+
+
+class RemoteProbs:
+    def __init__(self, data):
+        self.top1 = data['top1']
+        self.top1conf = _host(data['top1conf'])
+        self.top5 = data['top5']
+        self.top5conf = _host(data['top5conf'])
+
+
+class RemoteBox:
+    def __init__(self, cls_id, conf, xyxy):
+        self.cls = _host([cls_id])
+        self.conf = _host([conf])
+        self.xyxy = _host([xyxy])
+
+
+class RemoteBoxes:
+    def __init__(self, data):
+        self.cls = _host(data['cls'])
+        self.conf = _host(data['conf'])
+        self.xyxy = _host(data['xyxy']).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __iter__(self):
+        for i in range(len(self.cls)):
+            yield RemoteBox(self.cls[i], self.conf[i], self.xyxy[i])
+
+
+class RemoteResult:
+    """The parts of an ultralytics Results object the endpoints read"""
+
+    def __init__(self, data):
+        self.names = {int(k): v for k, v in data['names'].items()}
+        self.probs = RemoteProbs(data['probs']) if data['probs'] else None
+        self.boxes = RemoteBoxes(data['boxes']) if data['boxes'] else None
+
+
+# ==================== Server ====================
+class _Request:
+    def __init__(self, frames, options, reply):
+        self.frames = frames
+        self.options = options
+        self.reply = reply
+
+
+class _Batcher(threading.Thread):
+    """Collects requests for one model and runs them as batched forward passes"""
+
+    def __init__(self, server, name, kind):
+        super().__init__(name=f'vision-batch-{name}', daemon=True)
+        self.server = server
+        self.model_name = name
+        self.kind = kind
+        self.queue = queue.Queue()
+
+    def run(self):
+        # One thread per model: its CPU set (thread_config.py) applies for good
+        thread_config.pin_current_thread(self.model_name, KIND_FRAMEWORKS[self.kind])
+        while True:
+            batch = [self.queue.get()]
+            frames = len(batch[0].frames)
+            deadline = time.perf_counter() + self.server.max_wait
+            while frames < self.server.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                frames += len(request.frames)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        # Requests can only share a pass with identical options (and shapes for Keras)
+        groups = {}
+        for request in batch:
+            key = tuple(sorted(request.options.items()))
+            if self.kind == 'keras':
+                key += (request.frames[0].shape,)
+            groups.setdefault(key, []).append(request)
+
+        with self.server.registry.use(self.model_name) as model:
+            for requests in groups.values():
+                try:
+                    if model is None:
+                        raise RuntimeError(f"{self.model_name} not loaded")
+                    outputs = self._infer(model, requests)
+                except Exception as e:
+                    for request in requests:
+                        request.reply({'ok': False, 'error': str(e)})
+                    continue
+                start = 0
+                for request in requests:
+                    count = len(request.frames)
+                    request.reply({'ok': True, 'outputs': outputs[start:start + count]})
+                    start += count
+                self.server.batches += 1
+                self.server.frames += start
+
+    def _infer(self, model, requests):
+        frames = [frame for request in requests for frame in request.frames]
+        if self.kind == 'keras':
+            return model.predict(np.stack(frames), verbose=0)
+        options = dict(requests[0].options)
+        results = model(frames, verbose=False, **options)
+        return [_serialize_yolo_result(result) for result in results]
+
+
+class VisionServer:
+    """Accepts local connections and dispatches frames to per-model batchers"""
+
+    def __init__(self, address=None, max_batch=None, max_wait_ms=None):
+        self.address = address or socket_path()
+        self.max_batch = max_batch or int(os.environ.get(MAX_BATCH_ENV, 8))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else float(os.environ.get(MAX_WAIT_ENV, 5))) / 1000.0
+        self.registry = ModelRegistry()
+        self.batchers = {}
+        self.batches = 0
+        self.frames = 0
+        # Deferred: cattle_models imports this module to register its proxies
+        import cattle_models
+        for name, (_, path, framework) in cattle_models.VISION_MODELS.items():
+            loader, warmup = cattle_models.vision_loader(name)
+            self.registry.register(name, loader, service='vision', paths=[path],
+                                   framework=framework, warmup=warmup)
+            self.batchers[name] = _Batcher(self, name, FRAMEWORK_KINDS[framework])
+
+    def describe(self, name):
+        """What a client proxy needs to mimic the model locally"""
+        kind = self.batchers[name].kind
+        with self.registry.use(name) as model:
+            if model is None:
+                raise RuntimeError(self.registry.model_status(name)['error'] or f"{name} not loaded")
+            if kind == 'keras':
+                return {'kind': kind, 'input_shape': list(model.input_shape),
+                        'output_shape': list(model.output_shape)}
+            return {'kind': kind, 'names': dict(model.names), 'task': model.task,
+                    'imgsz': model_warmup.yolo_imgsz(model)}
+
+    def _serve_connection(self, conn):
+        attached = {}
+        send_lock = threading.Lock()
+
+        def reply(message, request_id):
+            message['id'] = request_id
+            with send_lock:
+                try:
+                    conn.send(message)
+                except OSError:
+                    pass  # the client gave up on this request and closed the connection
+
+        try:
+            while True:
+                message = conn.recv()
+                request_id = message.get('id')
+                op = message.get('op')
+                try:
+                    if op == 'describe':
+                        reply({'ok': True, 'model': self.describe(message['model'])}, request_id)
+                    elif op == 'status':
+                        reply({'ok': True, 'status': self.status()}, request_id)
+                    elif op == 'infer':
+                        frames = self._read_frames(message, attached)
+                        self.batchers[message['model']].queue.put(_Request(
+                            frames, message.get('options', {}),
+                            lambda result, request_id=request_id: reply(result, request_id)
+                        ))
+                    else:
+                        reply({'ok': False, 'error': f"unknown op: {op}"}, request_id)
+                except Exception as e:
+                    reply({'ok': False, 'error': str(e)}, request_id)
+        except (EOFError, OSError):
+            pass
+        finally:
+            for shm in attached.values():
+                shm.close()
+            conn.close()
+
+    @staticmethod
+    def _read_frames(message, attached):
+        name = message['shm']
+        shm = attached.get(name)
+        if shm is None or shm.size < message['nbytes']:
+            if shm is not None:
+                shm.close()
+            shm = shared_memory.SharedMemory(name=name)
+            # The client owns the segment; stop this process's tracker from unlinking it
+            resource_tracker.unregister(shm._name, 'shared_memory')
+            attached[name] = shm
+        batch = np.ndarray(message['shape'], dtype=message['dtype'], buffer=shm.buf)
+        # Copy out so the client can reuse its buffer as soon as it gets the reply
+        return list(np.array(batch))
+
+    def status(self):
+        return {'batches': self.batches, 'frames': self.frames,
+                'models': self.registry.status()}
+
+    def _preload(self, names):
+        self.registry.preload(names)
+        self.registry.warmup_all(names)
+        print("👁️ Vision models ready")
+
+    def serve_forever(self, preload=None):
+        key = authkey()
+        private_socket_dir(self.address)
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        for batcher in self.batchers.values():
+            batcher.start()
+        # Listen first: clients connecting during the preload simply wait for their model
+        listener = Listener(self.address, family='AF_UNIX', authkey=key)
+        os.chmod(self.address, 0o600)
+        print(f"👁️ Vision worker listening on {self.address} "
+              f"(batch ≤ {self.max_batch}, wait ≤ {self.max_wait * 1000:.0f}ms)")
+        names = preload if preload is not None else list(self.batchers)
+        if names:
+            threading.Thread(target=self._preload, args=(names,), name='vision-preload', daemon=True).start()
+        try:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+
+# ==================== Client ====================
+class _Channel:
+    """A connection to the worker and the shared-memory frame buffer sent over it"""
+
+    def __init__(self):
+        self.conn = None
+        self.shm = None
+
+    def drop_connection(self):
+        # Closed, not just forgotten: a late reply must not land on a leaked fd
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+            self.conn = None
+
+    def close(self):
+        self.drop_connection()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class VisionClient:
+    """
+    Bounded pool of channels (connection + shared-memory frame buffer) to the
+    vision worker. A call checks one out and returns it, so request threads
+    reuse a few segments and sockets instead of opening their own.
+    """
+
+    def __init__(self, address=None, timeout=None, max_channels=None):
+        self.address = address or socket_path()
+        self.timeout = timeout or float(os.environ.get(TIMEOUT_ENV, 120))
+        self.max_channels = max_channels or int(os.environ.get(CHANNELS_ENV, DEFAULT_CHANNELS))
+        self._idle = []
+        self._channels = []
+        self._available = threading.Semaphore(self.max_channels)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _checkout(self):
+        if not self._available.acquire(timeout=self.timeout):
+            raise TimeoutError(f"no free vision worker channel within {self.timeout:.0f}s")
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            channel = _Channel()
+            self._channels.append(channel)
+            return channel
+
+    def _checkin(self, channel):
+        with self._lock:
+            self._idle.append(channel)
+        self._available.release()
+
+    def _connect(self, channel, connect_timeout=10.0):
+        if channel.conn is None:
+            # The worker may still be starting up next to the web server
+            deadline = time.perf_counter() + connect_timeout
+            while True:
+                try:
+                    channel.conn = Client(self.address, family='AF_UNIX', authkey=authkey())
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if time.perf_counter() > deadline:
+                        raise
+                    time.sleep(0.2)
+        return channel.conn
+
+    @staticmethod
+    def _buffer(channel, nbytes):
+        shm = channel.shm
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            # Grow geometrically so a stream of frames reuses one segment
+            channel.shm = shm = shared_memory.SharedMemory(
+                create=True, size=max(nbytes, 2 * (shm.size if shm else 0)))
+        return shm
+
+    def _call(self, message, channel):
+        message['id'] = next(self._ids)
+        try:
+            conn = self._connect(channel)
+            conn.send(message)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"vision worker did not answer within {self.timeout:.0f}s")
+            reply = conn.recv()
+            if reply.get('id') != message['id']:
+                raise OSError(f"vision worker answered request {reply.get('id')} instead of {message['id']}")
+        except (EOFError, OSError, TimeoutError):
+            # Reconnect on the next call; the worker may have restarted
+            channel.drop_connection()
+            raise
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error'))
+        return reply
+
+    def _request(self, message, frames=None):
+        channel = self._checkout()
+        try:
+            if frames is not None:
+                shm = self._buffer(channel, frames.nbytes)
+                np.ndarray(frames.shape, dtype=frames.dtype, buffer=shm.buf)[...] = frames
+                message.update({'shm': shm.name, 'nbytes': frames.nbytes,
+                                'shape': frames.shape, 'dtype': frames.dtype.str})
+            return self._call(message, channel)
+        finally:
+            self._checkin(channel)
+
+    def describe(self, name):
+        return self._request({'op': 'describe', 'model': name})['model']
+
+    def status(self):
+        return self._request({'op': 'status'})['status']
+
+    def infer(self, name, frames, **options):
+        """Run a batch (N, ...) array through a worker model; returns one output per frame"""
+        frames = np.ascontiguousarray(frames)
+        return self._request({'op': 'infer', 'model': name, 'options': options}, frames)['outputs']
+
+    def close(self):
+        with self._lock:
+            channels, self._channels, self._idle = self._channels, [], []
+        for channel in channels:
+            channel.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            import atexit
+            _client = VisionClient()
+            atexit.register(_client.close)
+        return _client
+
+
+# ==================== Model Proxies ====================
+class RemoteKerasModel:
+    """Stands in for a Keras model; predict() runs in the vision worker"""
+
+    def __init__(self, name, info):
+        self.name = name
+        self.input_shape = tuple(info['input_shape'])
+        self.output_shape = tuple(info['output_shape'])
+
+    def predict(self, x, verbose=0, batch_size=None):
+        outputs = client().infer(self.name, np.asarray(x, dtype=np.float32))
+        return np.asarray(outputs)
+
+
+class RemoteYOLO:
+    """Stands in for an ultralytics YOLO model; inference runs in the vision worker"""
+
+    def __init__(self, name, info):
+        self.name = name
+        self.names = {int(k): v for k, v in info['names'].items()}
+        self.task = info['task']
+        self.overrides = {'imgsz': info['imgsz']}
+
+    def _frames(self, source):
+        sources = source if isinstance(source, list) else [source]
+        frames = []
+        for item in sources:
+            if isinstance(item, str):
+                item = heavy_imports.cv2().imread(item)  # BGR, as ultralytics reads files
+                if item is None:
+                    raise FileNotFoundError(f"cannot read image: {source}")
+            frames.append(np.asarray(item, dtype=np.uint8))
+        return frames
+
+    def __call__(self, source, verbose=False, **options):
+        options.pop('stream', None)
+        groups = []
+        # Frames of the same size go to the worker as one batch
+        for frame in self._frames(source):
+            if groups and groups[-1][0].shape == frame.shape:
+                groups[-1].append(frame)
+            else:
+                groups.append([frame])
+        outputs = []
+        for group in groups:
+            outputs += client().infer(self.name, np.stack(group), **options)
+        return [RemoteResult(output) for output in outputs]
+
+    def predict(self, source=None, verbose=False, **options):
+        return self(source, verbose=verbose, **options)
+
+
+def remote_model(name):
+    """Proxy for a model served by the vision worker (loads it there if needed)"""
+    info = client().describe(name)
+    if info['kind'] == 'keras':
+        return RemoteKerasModel(name, info)
+    return RemoteYOLO(name, info)
+
+
+def register_model(registry, name, loader, service, path, framework, warmup):
+    """
+    Register a vision model locally (as a replica pool, so concurrent requests
+    never share one Keras/YOLO object), or as a worker proxy when the worker
+    is enabled; the worker's batchers already run one call per model at a time.
+    """
+    if enabled():
+        # Inference runs in the vision worker process; the registry only holds a proxy
+        loader, framework, warmup = (lambda: remote_model(name)), 'vision_worker', None
+    else:
+        loader = replica_pool.pooled(name, loader, framework, warmup)
+    return registry.register(name, loader, service=service, paths=[path], framework=framework, warmup=warmup)
+
+
+if __name__ == '__main__':
+    server = VisionServer()
+    preload = parse_name_list(os.environ.get('SMART_FARM_VISION_PRELOAD', ','.join(server.batchers)))
+    server.serve_forever(preload=preload)